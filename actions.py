@@ -12,7 +12,7 @@ from apscheduler.jobstores.base import JobLookupError
 from config import TIME_REMOVAL_AFTER_SKIP, MIN_FAST_TURN_TIME
 from errors import DeckEmptyError, NotEnoughPlayersError
 from internationalization import __, _
-from shared_vars import gm
+from shared_vars import gm, executor
 from user_setting import UserSetting
 from utils import send_async, display_name, game_is_running
 
@@ -113,7 +113,7 @@ def do_play_card(bot, player, result_id):
             if game.players_won is 0:
                 us.first_places += 1
 
-        game.players_won += 1
+        game.add_winner()
 
         try:
             gm.leave_game(user, chat)
@@ -209,7 +209,15 @@ def start_player_countdown(bot, game, job_queue):
 
 def skip_job(context: CallbackContext):
     player = context.job.context.player
+    executor.submit(player.game.chat.id, _skip, context.bot, player,
+                    context.job.context.job_queue, context.job)
+
+
+def _skip(bot, player, job_queue, job):
+    # Runs on the chat's queue, so the game may have ended or moved on in the
+    # meantime. A move queued before this replaced the countdown.
     game = player.game
-    if game_is_running(game):
-        job_queue = context.job.context.job_queue
-        do_skip(context.bot, player, job_queue)
+    if game_is_running(game) and job is game.job and \
+            player is game.current_player:
+        do_skip(bot, player, job_queue)
+        gm.publish_game(game)
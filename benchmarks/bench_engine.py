@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Simulates random games with the functional rules engine and reports the
+number of steps per second.
+Run from the repository root with: python -m benchmarks.bench_engine
+"""
+
+import random
+import time
+
+import engine
+
+GAMES = 2000
+MAX_STEPS = 500
+
+
+def simulate(seed, players, mode):
+    rnd = random.Random(seed)
+    state, _ = engine.new_state(seed, players, mode)
+    steps = 0
+
+    while not state.finished and steps < MAX_STEPS:
+        actions = engine.legal_actions(state)
+        plays = [action for action in actions if action[0] == 'play']
+        if plays and rnd.random() < 0.8:
+            action = rnd.choice(plays)
+        else:
+            action = rnd.choice(actions)
+
+        state, _ = engine.step(state, action)
+        steps += 1
+
+    return steps
+
+
+def main():
+    for mode in ('classic', 'wild'):
+        start = time.perf_counter()
+        steps = sum(simulate(seed, 2 + seed % 5, mode)
+                    for seed in range(GAMES))
+        elapsed = time.perf_counter() - start
+
+        print('%-8s %6d games %8d steps %10.0f steps/s' %
+              (mode, GAMES, steps, steps / elapsed))
+
+
+if __name__ == '__main__':
+    main()
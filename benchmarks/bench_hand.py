@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Micro-benchmark for rendering a hand in the inline query path.
+Run from the repository root with: python -m benchmarks.bench_hand
+"""
+
+import random
+import timeit
+
+import card as c
+from hand import Hand
+
+SIZES = (7, 30, 100)
+
+
+def render_list(cards, playable):
+    """The old path: sort the list and detect duplicates by string id"""
+    rendered = list()
+    added_ids = list()
+    for card in sorted(cards):
+        rendered.append((card, card in playable and
+                         str(card) not in added_ids))
+        added_ids.append(str(card))
+    return rendered
+
+
+def render_hand(hand, playable):
+    """The new path: walk the cached, grouped view of the hand"""
+    rendered = list()
+    for card, count in hand.groups():
+        rendered.append((card, card in playable))
+        for _ in range(count - 1):
+            rendered.append((card, False))
+    return rendered
+
+
+def main():
+    rnd = random.Random(0)
+    print('%6s %14s %14s' % ('cards', 'list (us)', 'hand (us)'))
+
+    for size in SIZES:
+        cards = rnd.choices(c.CARDS, k=size)
+        hand = Hand(cards)
+        playable = set(rnd.sample(cards, k=min(size, 5)))
+
+        assert render_list(cards, list(playable)) == \
+            render_hand(hand, playable)
+
+        number = 2000
+        old = timeit.timeit(lambda: render_list(cards, list(playable)),
+                            number=number)
+        new = timeit.timeit(lambda: render_hand(hand, playable),
+                            number=number)
+        print('%6d %14.2f %14.2f' % (size, old / number * 1e6,
+                                     new / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
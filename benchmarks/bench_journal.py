@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Measures what the journal adds to the turn critical path: the cost of a
+single journal.record call, and the time per simulated turn with the
+journal closed and open. Group commits run on their own thread.
+Run from the repository root with: python -m benchmarks.bench_journal
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from telegram import Chat, User
+
+from errors import DeckEmptyError
+from game_manager import GameManager
+from journal import journal
+import card as c
+
+GAMES = 200
+TURNS = 100
+RECORDS = 100000
+
+
+def play(game, rnd):
+    player = game.current_player
+
+    if game.choosing_color:
+        game.choose_color(rnd.choice(c.COLORS))
+        return
+
+    playable = player.playable_cards()
+    if playable:
+        player.play(rnd.choice(playable))
+    else:
+        try:
+            player.draw()
+        except DeckEmptyError:
+            pass
+        game.turn()
+
+
+def simulate():
+    gm = GameManager()
+    rnd = random.Random(0)
+    turns = 0
+
+    start = time.perf_counter()
+    for i in range(GAMES):
+        chat = Chat(-i - 1, 'group', title='Chat %d' % i)
+        game = gm.new_game(chat)
+        for j in range(4):
+            gm.join_game(User(i * 4 + j, 'User', False), chat)
+        game.start()
+        game.deal()
+
+        for _ in range(TURNS):
+            play(game, rnd)
+            turns += 1
+            if any(not player.cards for player in game.players):
+                break
+
+    return (time.perf_counter() - start) / turns
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        closed = simulate()
+
+        journal.open(os.path.join(directory, 'uno.journal'))
+        opened = simulate()
+
+        game = GameManager().new_game(Chat(-1, 'group', title='Chat'))
+        start = time.perf_counter()
+        for _ in range(RECORDS):
+            journal.record(game, 'play', 0, 17)
+        record = (time.perf_counter() - start) / RECORDS
+
+        journal.close()
+    finally:
+        shutil.rmtree(directory)
+
+    print('record          %7.2f us' % (record * 1e6))
+    print('turn, closed    %7.2f us' % (closed * 1e6))
+    print('turn, open      %7.2f us' % (opened * 1e6))
+    print('added per turn  %7.2f us' % ((opened - closed) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
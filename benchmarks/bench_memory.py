@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Reports the memory retained per idle lobby and per running 4-player game,
+measured with tracemalloc, at 10k and 100k games. Chats and users are
+fresh Telegram objects for every game, like the ones updates carry.
+Run from the repository root with: python -m benchmarks.bench_memory
+"""
+
+import gc
+import tracemalloc
+
+from telegram import Chat, User
+
+from game_manager import GameManager
+
+SIZES = (10000, 100000)
+PLAYERS = 4
+
+
+def lobby(gm, i):
+    """A game after /new and its creator's /join"""
+    chat = Chat(-i - 1, 'group', title='Chat %d' % i)
+    user = User(i * PLAYERS, 'User %d' % i, False, username='user%d' % i)
+    game = gm.new_game(chat)
+    game.starter = user
+    game.owner.append(user.id)
+    game.set_mode('classic')
+    gm.join_game(user, chat)
+    return game
+
+
+def running(gm, i):
+    """A dealt game with all players joined"""
+    game = lobby(gm, i)
+    for j in range(1, PLAYERS):
+        user = User(i * PLAYERS + j, 'User %d' % j, False,
+                    username='user%d' % j)
+        gm.join_game(user, game.chat)
+    game.start()
+    game.deal()
+    return game
+
+
+def measure(build, size):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    gm = GameManager()
+    for i in range(size):
+        build(gm, i)
+
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del gm
+    return retained / size
+
+
+def main():
+    for size in SIZES:
+        for name, build in (('idle lobby', lobby), ('4-player game', running)):
+            print('%7d x %-14s %8.0f bytes each' %
+                  (size, name, measure(build, size)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Compares the time to serialize an answerInlineQuery request the way
+python-telegram-bot does it with the pre-encoded fragments of payload.py,
+for hands of 7, 30 and 60 cards. Fragments are built once per view and then
+served from the result cache, so both building and reusing them is timed.
+Run from the repository root with: python -m benchmarks.bench_payload
+"""
+
+import json
+import random
+import time
+
+from telegram import InputTextMessageContent, \
+    InlineQueryResultCachedSticker as Sticker
+
+import card as c
+import payload
+
+HANDS = (7, 30, 60)
+ROUNDS = 2000
+
+
+def results(size, rnd):
+    """A hand like build_results makes it, a third of it playable"""
+    info = InputTextMessageContent('轮到： User 0\n上一张牌： ❤️5\n'
+                                   '玩家： User 0 (7 张牌) -> User 1 (7 张牌)')
+    hand = sorted(rnd.choice(c.CARDS) for _ in range(size))
+    results = list()
+    for card in hand:
+        if rnd.random() < 1 / 3:
+            results.append(Sticker('%s:12' % card, card.sticker))
+        else:
+            results.append(Sticker('~%d:12' % len(results), card.sticker_grey,
+                                   input_message_content=info))
+    return results
+
+
+def current(results):
+    # What Bot.answer_inline_query and Request.post do with the results
+    data = {'inline_query_id': '1234567890',
+            'results': [payload.plain(result.to_dict())
+                        for result in results],
+            'cache_time': 0, 'switch_pm_parameter': 'select'}
+    data['results'] = json.dumps(data['results'])
+    return json.dumps(data).encode('utf-8')
+
+
+def fresh(results):
+    return payload.body('1234567890', payload.fragments(results),
+                        cache_time=0, switch_pm_parameter='select')
+
+
+def cached(fragments):
+    return payload.body('1234567890', fragments,
+                        cache_time=0, switch_pm_parameter='select')
+
+
+def timed(func, arg):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(arg)
+    return (time.perf_counter() - start) / ROUNDS * 1e6
+
+
+def main():
+    rnd = random.Random(0)
+    print('cards   current    fresh   cached   (us per answer)')
+    for size in HANDS:
+        hand = results(size, rnd)
+        fragments = payload.fragments(hand)
+        print('%5d  %8.1f %8.1f %8.1f' %
+              (size, timed(current, hand), timed(fresh, hand),
+               timed(cached, fragments)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Snapshots a manager with 50k running games on their chats' queues, then
+restores it the way the bot starts up: from the snapshot file and the
+journal written since, with a few hundred games played on in between.
+Reports the time of both, of the next snapshot while the games are still
+deferred, the snapshot size and the time until all deferred games are
+built. Restoring must stay below a second.
+Run from the repository root with: python -m benchmarks.bench_snapshot
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from telegram import Chat, User
+
+from errors import DeckEmptyError
+from executor import ChatExecutor
+from game_manager import GameManager
+from journal import journal
+import snapshot
+
+GAMES = 50000
+PLAYERS = 4
+# Games played on after the snapshot, which the journal replays
+JOURNALED = 500
+BUDGET = 1.0
+
+
+def build():
+    gm = GameManager()
+    users = [User(i, 'User %d' % i, False, username='user%d' % i)
+             for i in range(GAMES * PLAYERS)]
+
+    for i in range(GAMES):
+        chat = Chat(-i - 1, 'group', title='Chat %d' % i)
+        game = gm.new_game(chat)
+        for user in users[i * PLAYERS:(i + 1) * PLAYERS]:
+            gm.join_game(user, chat)
+        game.start()
+        game.deal()
+
+    return gm
+
+
+def play(gm):
+    for i in range(JOURNALED):
+        game = gm.chatid_current[-i - 1]
+        player = game.current_player
+        playable = player.playable_cards()
+        if playable:
+            player.play(playable[0])
+        else:
+            try:
+                player.draw()
+            except DeckEmptyError:
+                pass
+        game.turn()
+
+
+def main():
+    gm = build()
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'uno.snapshot')
+    journal_path = os.path.join(directory, 'uno.journal')
+
+    executor = ChatExecutor(4)
+
+    try:
+        journal.open(journal_path)
+        start = time.perf_counter()
+        snapshot.save(gm, path, journal, executor.call)
+        dumped = time.perf_counter() - start
+        play(gm)
+        journal.close()
+
+        restored = GameManager()
+        start = time.perf_counter()
+        applied = snapshot.restore(restored, path, journal_path)
+        loaded = time.perf_counter() - start
+
+        # Copies the games that are still deferred
+        start = time.perf_counter()
+        snapshot.save(restored, path, None, executor.call)
+        redumped = time.perf_counter() - start
+
+        start = time.perf_counter()
+        restored.thaw_all()
+        thawed = time.perf_counter() - start
+        size = os.path.getsize(path)
+    finally:
+        executor.shutdown()
+        shutil.rmtree(directory)
+
+    print('%d games, %d players, %.1f MB, %d journal entries' %
+          (GAMES, GAMES * PLAYERS, size / 1e6, applied))
+    print('dump    %6.3f s' % dumped)
+    print('restore %6.3f s' % loaded)
+    print('redump  %6.3f s' % redumped)
+    print('thaw    %6.3f s' % thawed)
+    assert loaded < BUDGET, 'restoring took %.3f s' % loaded
+
+
+if __name__ == '__main__':
+    main()
@@ -18,30 +18,35 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import logging
+import threading
 from datetime import datetime
 
 from telegram import ParseMode, InlineKeyboardMarkup, \
     InlineKeyboardButton, Update
 from telegram.ext import InlineQueryHandler, ChosenInlineResultHandler, \
     CommandHandler, MessageHandler, Filters, CallbackQueryHandler, CallbackContext
-from telegram.ext.dispatcher import run_async
+from apscheduler.jobstores.base import JobLookupError
 
 import card as c
+import payload
 import settings
 import simple_commands
+import snapshot
 from actions import do_skip, do_play_card, do_draw, do_call_bluff, start_player_countdown
-from config import WAITING_TIME, DEFAULT_GAMEMODE, MIN_PLAYERS
+from config import (WAITING_TIME, DEFAULT_GAMEMODE, MIN_PLAYERS, SNAPSHOT_FILE,
+                    SNAPSHOT_INTERVAL, JOURNAL_FILE, REAP_NOTICE)
 from errors import (NoGameInChatError, LobbyClosedError, AlreadyJoinedError,
                     NotEnoughPlayersError, DeckEmptyError)
-from internationalization import _, __, user_locale, game_locales
-from results import (add_call_bluff, add_choose_color, add_draw, add_gameinfo,
-                     add_no_game, add_not_started, add_other_cards, add_pass,
-                     add_card, add_mode_classic, add_mode_fast, add_mode_wild, add_mode_text)
-from shared_vars import gm, updater, dispatcher
+from internationalization import _, __, user_locale, game_locales, locales_of, \
+    published_locales, view_locales
+from journal import journal
+from results import add_no_game, build_results, parse_result_id
+from shared_vars import gm, updater, dispatcher, executor, intake, pool, \
+    reaper, result_cache
 from simple_commands import help_handler
 from start_bot import start_bot
 from utils import display_name
-from utils import send_async, answer_async, error, TIMEOUT, user_is_creator_or_admin, user_is_creator, game_is_running
+from utils import send_async, answer_async, error, TIMEOUT, user_is_creator_or_admin, game_is_running, serialized, pooled
 
 
 logging.basicConfig(
@@ -51,6 +56,10 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 logging.getLogger('apscheduler').setLevel(logging.WARNING)
 
+# Held while a snapshot is saved, so two never overlap
+snapshot_lock = threading.Lock()
+
+
 @user_locale
 def notify_me(update: Update, context: CallbackContext):
     """Handler for /notify_me command, pm people for next game"""
@@ -85,10 +94,9 @@ def new_game(update: Update, context: CallbackContext):
 
             del gm.remind_dict[update.message.chat_id]
 
-        game = gm.new_game(update.message.chat)
-        game.starter = update.message.from_user
-        game.owner.append(update.message.from_user.id)
-        game.mode = DEFAULT_GAMEMODE
+        game = gm.new_game(update.message.chat,
+                           starter=update.message.from_user)
+        game.set_mode(DEFAULT_GAMEMODE)
         send_async(context.bot, chat_id,
                    text=_("创建新游戏成功！请使用 /join 加入游戏，然后使用 /start 开始游戏"))
 
@@ -98,19 +106,17 @@ def kill_game(update: Update, context: CallbackContext):
     """Handler for the /kill command"""
     chat = update.message.chat
     user = update.message.from_user
-    games = gm.chatid_games.get(chat.id)
+    game = gm.chatid_current.get(chat.id)
 
     if update.message.chat.type == 'private':
         help_handler(update, context)
         return
 
-    if not games:
+    if not game:
             send_async(context.bot, chat.id,
                        text=_("这个群中并没有正在运行的游戏。"))
             return
 
-    game = games[-1]
-
     if user_is_creator_or_admin(user, game, context.bot, chat):
 
         try:
@@ -218,9 +224,9 @@ def kick_player(update: Update, context: CallbackContext):
     user = update.message.from_user
 
     try:
-        game = gm.chatid_games[chat.id][-1]
+        game = gm.chatid_current[chat.id]
 
-    except (KeyError, IndexError):
+    except KeyError:
             send_async(context.bot, chat.id,
                    text=_("这个群并没有运行中的游戏。请使用 /new 创建新游戏"),
                    reply_to_message_id=update.message.message_id)
@@ -307,7 +313,7 @@ def select_game(update: Update, context: CallbackContext):
                             parse_mode=ParseMode.HTML,
                             timeout=TIMEOUT)
 
-    dispatcher.run_async(selected)
+    pool.submit(selected)
 
 
 @game_locales
@@ -343,8 +349,8 @@ def start_game(update: Update, context: CallbackContext):
         chat = update.message.chat
 
         try:
-            game = gm.chatid_games[chat.id][-1]
-        except (KeyError, IndexError):
+            game = gm.chatid_current[chat.id]
+        except KeyError:
             send_async(context.bot, chat.id,
                        text=_("这个群并没有运行中的游戏。请使用 /new 创建新游戏"))
             return
@@ -352,16 +358,15 @@ def start_game(update: Update, context: CallbackContext):
         if game.started:
             send_async(context.bot, chat.id, text=_("游戏已经开始"))
 
-        elif len(game.players) < MIN_PLAYERS:
+        elif game.player_count < MIN_PLAYERS:
             send_async(context.bot, chat.id,
                        text=__("至少需要 {minplayers} 个人 /join 加入游戏，才能开始游戏").format(minplayers=MIN_PLAYERS))
 
         else:
             # Starting a game
             game.start()
+            game.deal()
 
-            for player in game.players:
-                player.draw_first_hand()
             choice = [[InlineKeyboardButton(text=_("点击查看手牌！"), switch_inline_query_current_chat='')]]
             first_message = (
                 __("第一个出牌的玩家： {name}\n"
@@ -374,7 +379,7 @@ def start_game(update: Update, context: CallbackContext):
                 """Send the first card and player"""
 
                 context.bot.sendSticker(chat.id,
-                                sticker=c.STICKERS[str(game.last_card)],
+                                sticker=game.last_card.sticker,
                                 timeout=TIMEOUT)
 
                 context.bot.sendMessage(chat.id,
@@ -382,7 +387,7 @@ def start_game(update: Update, context: CallbackContext):
                                 reply_markup=InlineKeyboardMarkup(choice),
                                 timeout=TIMEOUT)
 
-            dispatcher.run_async(send_first)
+            pool.submit(send_first)
             start_player_countdown(context.bot, game, context.job_queue)
 
     elif len(context.args) and context.args[0] == 'select':
@@ -413,15 +418,13 @@ def close_game(update: Update, context: CallbackContext):
     """Handler for the /close command"""
     chat = update.message.chat
     user = update.message.from_user
-    games = gm.chatid_games.get(chat.id)
+    game = gm.chatid_current.get(chat.id)
 
-    if not games:
+    if not game:
         send_async(context.bot, chat.id,
                    text=_("这个群中并没有正在运行的游戏。"))
         return
 
-    game = games[-1]
-
     if user.id in game.owner:
         game.open = False
         send_async(context.bot, chat.id, text=_("游戏已设置成不允许中途加入，玩家将不允许加入游戏。"))
@@ -440,15 +443,13 @@ def open_game(update: Update, context: CallbackContext):
     """Handler for the /open command"""
     chat = update.message.chat
     user = update.message.from_user
-    games = gm.chatid_games.get(chat.id)
+    game = gm.chatid_current.get(chat.id)
 
-    if not games:
+    if not game:
         send_async(context.bot, chat.id,
                    text=_("这个群中并没有正在运行的游戏。"))
         return
 
-    game = games[-1]
-
     if user.id in game.owner:
         game.open = True
         send_async(context.bot, chat.id, text=_("游戏已设置成允许中途加入，新玩家现在可以使用 /join 加入游戏。"))
@@ -466,15 +467,13 @@ def enable_translations(update: Update, context: CallbackContext):
     """Handler for the /enable_translations command"""
     chat = update.message.chat
     user = update.message.from_user
-    games = gm.chatid_games.get(chat.id)
+    game = gm.chatid_current.get(chat.id)
 
-    if not games:
+    if not game:
         send_async(context.bot, chat.id,
                    text=_("这个群中并没有正在运行的游戏。"))
         return
 
-    game = games[-1]
-
     if user.id in game.owner:
         game.translate = True
         send_async(context.bot, chat.id, text=_("游戏翻译已启用，使用 /disable_translations 可以停用该功能"))
@@ -493,15 +492,13 @@ def disable_translations(update: Update, context: CallbackContext):
     """Handler for the /disable_translations command"""
     chat = update.message.chat
     user = update.message.from_user
-    games = gm.chatid_games.get(chat.id)
+    game = gm.chatid_current.get(chat.id)
 
-    if not games:
+    if not game:
         send_async(context.bot, chat.id,
                    text=_("这个群中并没有正在运行的游戏。"))
         return
 
-    game = games[-1]
-
     if user.id in game.owner:
         game.translate = False
         send_async(context.bot, chat.id, text=_("游戏翻译已停用，使用 /enable_translations 可以启用该功能"))
@@ -549,78 +546,50 @@ def skip_player(update: Update, context: CallbackContext):
         do_skip(context.bot, player)
 
 
-@game_locales
 @user_locale
 def reply_to_query(update: Update, context: CallbackContext):
     """
     Handler for inline queries.
-    Builds the result list for inline queries and answers to the client.
+    Answers with the result list of the user's selected game.
     """
-    results = list()
-    switch = None
-
-    try:
-        user = update.inline_query.from_user
-        user_id = user.id
-        players = gm.userid_players[user_id]
-        player = gm.userid_current[user_id]
-        game = player.game
-    except KeyError:
-        add_no_game(results)
-    else:
-
-        # The game has not started.
-        # The creator may change the game mode, other users just get a "game has not started" message.
-        if not game.started:
-            if user_is_creator(user, game):
-                add_mode_classic(results)
-                add_mode_fast(results)
-                add_mode_wild(results)
-                add_mode_text(results)
-            else:
-                add_not_started(results)
-
-
-        elif user_id == game.current_player.user.id:
-            if game.choosing_color:
-                add_choose_color(results, game)
-                add_other_cards(player, results, game)
-            else:
-                if not player.drew:
-                    add_draw(player, results)
-
-                else:
-                    add_pass(results, game)
-
-                if game.last_card.special == c.DRAW_FOUR and game.draw_counter:
-                    add_call_bluff(results, game)
+    if not intake.current(update):
+        return
 
-                playable = player.playable_cards()
-                added_ids = list()  # Duplicates are not allowed
+    switch = None
 
-                for card in sorted(player.cards):
-                    add_card(game, card, results,
-                             can_play=(card in playable and
-                                            str(card) not in added_ids))
-                    added_ids.append(str(card))
+    user = update.inline_query.from_user
+    user_id = user.id
+    players = gm.userid_players.get(user_id)
+    selected = gm.userid_current.get(user_id)
 
-                add_gameinfo(game, results)
+    # A single read of the latest view, the game's queue is never waited on
+    game = selected.game.view if selected is not None else None
+    player = game.player(user_id) if game is not None else None
 
-        elif user_id != game.current_player.user.id or not game.started:
-            for card in sorted(player.cards):
-                add_card(game, card, results, can_play=False)
+    if player is None:
+        results = list()
+        add_no_game(results)
+        fragments = payload.fragments(results)
+    else:
+        with published_locales(game):
+            # The view covers the player's hand and anti cheat counter
+            stamp = (game, tuple(_.locale_stack))
+            fragments = result_cache.lookup(user_id, stamp, build_fragments,
+                                            user, game, player)
 
-        else:
-            add_gameinfo(game, results)
+            if players and len(players) > 1:
+                switch = _('当前游戏： {game}').format(game=game.chat.title)
 
-        for result in results:
-            result.id += ':%d' % player.anti_cheat
+    fragments, next_offset = payload.page(fragments,
+                                          update.inline_query.offset)
+    answer_async(context.bot, update.inline_query.id, fragments, cache_time=0,
+                 next_offset=next_offset, switch_pm_text=switch,
+                 switch_pm_parameter='select')
 
-        if players and game and len(players) > 1:
-            switch = _('当前游戏： {game}').format(game=game.chat.title)
 
-    answer_async(context.bot, update.inline_query.id, results, cache_time=0,
-                 switch_pm_text=switch, switch_pm_parameter='select')
+def build_fragments(user, game, player):
+    """Builds the result list of a player and encodes it, see payload.py"""
+    return payload.fragments(build_results(user, game, player))
 
 
 @game_locales
@@ -641,7 +610,7 @@ def process_result(update: Update, context: CallbackContext):
 
     logger.debug("Selected result: " + result_id)
 
-    result_id, anti_cheat = result_id.split(':')
+    result_id, anti_cheat = parse_result_id(result_id)
     last_anti_cheat = player.anti_cheat
     player.anti_cheat += 1
 
@@ -654,13 +623,16 @@ def process_result(update: Update, context: CallbackContext):
         logger.info("游戏模式已切换为 {mode}".format(mode = mode))
         send_async(context.bot, chat.id, text=__("游戏模式已切换为 {mode}".format(mode = mode)))
         return
-    elif len(result_id) == 36:  # UUID result
+    elif result_id.startswith('~'):  # Card that can not be played
         return
     elif int(anti_cheat) != last_anti_cheat:
         send_async(context.bot, chat.id,
                    text=__("{name} 试图作弊", multi=game.translate)
                    .format(name=display_name(player.user)))
         return
+    elif player is not game.current_player:
+        # Chosen from a view of an earlier turn
+        return
     elif result_id == 'call_bluff':
         reset_waiting_time(context.bot, player)
         do_call_bluff(context.bot, player)
@@ -697,28 +669,118 @@ def reset_waiting_time(bot, player):
                    .format(name=display_name(player.user), time=WAITING_TIME))
 
 
+def save_snapshot(context=None):
+    """
+    Snapshots all games. The games of each chat are serialized on the
+    chat's queue, between its handlers, so no other chat has to wait.
+    """
+    with snapshot_lock:
+        try:
+            snapshot.save(gm, SNAPSHOT_FILE, journal, executor.call)
+        except OSError:
+            logger.exception("Could not save the snapshot")
+
+
+def save_snapshots(context: CallbackContext):
+    """Job that saves a snapshot on the worker pool, unless one still runs"""
+    if not snapshot_lock.locked():
+        pool.submit(save_snapshot)
+
+
+def restore_snapshot():
+    """
+    Restores the games of the last run from the snapshot and the journal
+    written since. The games of a chat are built on first use and then
+    re-armed, the rest are built in the background.
+    """
+    gm.on_thaw = restored_game
+    applied = snapshot.restore(gm, SNAPSHOT_FILE, JOURNAL_FILE)
+    if JOURNAL_FILE:
+        logger.info("Replayed %d journal entries", applied)
+        journal.open(JOURNAL_FILE)
+    pool.submit(thaw_games)
+
+
+def restored_game(game):
+    """Re-arms the countdown of a restored game"""
+    if game.started and game.mode == 'fast':
+        start_player_countdown(updater.bot, game, updater.job_queue)
+
+
+def thaw_games():
+    """Builds the games the snapshot deferred, see GameManager.defer"""
+    for chat_id in gm.deferred_chats():
+        gm.thaw(chat_id)
+
+
+def reap_games(context: CallbackContext):
+    """Job that hands idle games to their chat's queue to be reaped"""
+    for game in reaper.due():
+        executor.submit(game.chat.id, reap_game, context.bot, game)
+
+
+def reap_game(bot, game):
+    """Ends an idle game, unless it saw activity in the meantime"""
+    if not reaper.reap(game):
+        return
+
+    if game.job:
+        try:
+            game.job.schedule_removal()
+        except JobLookupError:
+            pass
+
+    if REAP_NOTICE:
+        # Jobs run outside of any update, so there are no locales yet
+        with locales_of(game):
+            send_async(bot, game.chat.id,
+                       text=__("游戏长时间无人操作，已自动结束。",
+                               multi=game.translate))
+
+
+def watch_games():
+    """
+    Lets the reaper watch every new and restored game, so it has to come
+    before restore_snapshot
+    """
+    gm.reaper = reaper
+    updater.job_queue.run_repeating(reap_games, reaper.wheel.resolution)
+
+
 # Add all handlers to the dispatcher and run the bot
-dispatcher.add_handler(InlineQueryHandler(reply_to_query))
-dispatcher.add_handler(ChosenInlineResultHandler(process_result, pass_job_queue=True))
-dispatcher.add_handler(CallbackQueryHandler(select_game))
-dispatcher.add_handler(CommandHandler('start', start_game, pass_args=True, pass_job_queue=True))
-dispatcher.add_handler(CommandHandler('new', new_game))
-dispatcher.add_handler(CommandHandler('kill', kill_game))
-dispatcher.add_handler(CommandHandler('join', join_game))
-dispatcher.add_handler(CommandHandler('leave', leave_game))
-dispatcher.add_handler(CommandHandler('kick', kick_player))
-dispatcher.add_handler(CommandHandler('open', open_game))
-dispatcher.add_handler(CommandHandler('close', close_game))
+dispatcher.add_handler(InlineQueryHandler(pooled(reply_to_query)))
+dispatcher.add_handler(ChosenInlineResultHandler(serialized(process_result), pass_job_queue=True))
+dispatcher.add_handler(CallbackQueryHandler(serialized(select_game)))
+dispatcher.add_handler(CommandHandler('start', serialized(start_game), pass_args=True, pass_job_queue=True))
+dispatcher.add_handler(CommandHandler('new', serialized(new_game)))
+dispatcher.add_handler(CommandHandler('kill', serialized(kill_game)))
+dispatcher.add_handler(CommandHandler('join', serialized(join_game)))
+dispatcher.add_handler(CommandHandler('leave', serialized(leave_game)))
+dispatcher.add_handler(CommandHandler('kick', serialized(kick_player)))
+dispatcher.add_handler(CommandHandler('open', serialized(open_game)))
+dispatcher.add_handler(CommandHandler('close', serialized(close_game)))
 dispatcher.add_handler(CommandHandler('enable_translations',
-                                      enable_translations))
+                                      serialized(enable_translations)))
 dispatcher.add_handler(CommandHandler('disable_translations',
-                                      disable_translations))
-dispatcher.add_handler(CommandHandler('skip', skip_player))
-dispatcher.add_handler(CommandHandler('notify_me', notify_me))
+                                      serialized(disable_translations)))
+dispatcher.add_handler(CommandHandler('skip', serialized(skip_player)))
+dispatcher.add_handler(CommandHandler('notify_me', serialized(notify_me)))
 simple_commands.register()
 settings.register()
-dispatcher.add_handler(MessageHandler(Filters.status_update, status_update))
+dispatcher.add_handler(MessageHandler(Filters.status_update, serialized(status_update)))
 dispatcher.add_error_handler(error)
 
+gm.locales_of = view_locales
+watch_games()
+
+if SNAPSHOT_FILE:
+    restore_snapshot()
+    updater.job_queue.run_repeating(save_snapshots, SNAPSHOT_INTERVAL,
+                                    first=SNAPSHOT_INTERVAL)
+
 start_bot(updater)
 updater.idle()
+
+if SNAPSHOT_FILE:
+    save_snapshot()
+journal.close()
@@ -310,41 +310,117 @@ STICKERS_GREY = {
 
 
 class Card(object):
-    """This class represents an UNO card"""
+    """
+    This class represents an UNO card.
 
-    def __init__(self, color, value, special=None):
-        self.color = color
-        self.value = value
-        self.special = special
+    Cards are flyweights: there is exactly one shared, immutable instance per
+    card identity, so calling Card(color, value, special) returns that
+    instance instead of building a new object. Every card has a small integer
+    code, which is also its index in CARDS, and equality, hashing and sorting
+    use this code only.
 
-    def __str__(self):
-        if self.special:
-            return self.special
+    A special card whose color has been chosen is a separate shared instance
+    that keeps the code of the plain special card, so the chosen color is
+    carried without mutating the card that goes back into the deck.
+    """
+
+    __slots__ = ('color', 'value', 'special', 'code', 'base', 'sticker',
+                 'sticker_grey', '_str', '_repr')
+
+    _registry = dict()
+
+    def __new__(cls, color, value=None, special=None):
+        if special:
+            value = None
+        try:
+            return cls._registry[(color, value, special)]
+        except KeyError:
+            raise ValueError('Invalid card: %r %r %r' %
+                             (color, value, special)) from None
+
+    @classmethod
+    def _intern(cls, color, value, special, code, base=None):
+        card = object.__new__(cls)
+        setattr_ = object.__setattr__
+        setattr_(card, 'color', color)
+        setattr_(card, 'value', value)
+        setattr_(card, 'special', special)
+        setattr_(card, 'code', code)
+        setattr_(card, 'base', base or card)
+        setattr_(card, '_str', special or '%s_%s' % (color, value))
+        setattr_(card, 'sticker', STICKERS[card._str])
+        setattr_(card, 'sticker_grey', STICKERS_GREY[card._str])
+
+        if special:
+            setattr_(card, '_repr',
+                     '%s%s%s' % (COLOR_ICONS.get(color, ''),
+                                 COLOR_ICONS[BLACK],
+                                 ' '.join([s.capitalize()
+                                           for s in special.split('_')])))
         else:
-            return '%s_%s' % (self.color, self.value)
+            setattr_(card, '_repr',
+                     '%s%s' % (COLOR_ICONS[color], value.capitalize()))
+
+        cls._registry[(color, value, special)] = card
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Cards are immutable')
+
+    def __reduce__(self):
+        return Card, (self.color, self.value, self.special)
+
+    def __str__(self):
+        return self._str
 
     def __repr__(self):
-        if self.special:
-            return '%s%s%s' % (COLOR_ICONS.get(self.color, ''),
-                               COLOR_ICONS[BLACK],
-                               ' '.join([s.capitalize()
-                                         for s in self.special.split('_')]))
-        else:
-            return '%s%s' % (COLOR_ICONS[self.color], self.value.capitalize())
+        return self._repr
+
+    def __hash__(self):
+        return self.code
 
     def __eq__(self, other):
         """Needed for sorting the cards"""
-        return str(self) == str(other)
+        if not isinstance(other, Card):
+            return NotImplemented
+        return self.code == other.code
 
     def __lt__(self, other):
         """Needed for sorting the cards"""
-        return str(self) < str(other)
+        return self.code < other.code
+
+    def with_color(self, color):
+        """Returns the shared instance of this special card with a chosen
+        color"""
+        return Card(color, None, self.special)
+
+
+def _build_cards():
+    # Codes follow the string order of the cards, so sorting by code gives
+    # the same order as the old string comparison
+    identities = [(color, value, None) for color in COLORS for value in VALUES]
+    identities += [(None, None, special) for special in SPECIALS]
+    identities.sort(key=lambda i: i[2] or '%s_%s' % (i[0], i[1]))
+
+    cards = tuple(Card._intern(color, value, special, code)
+                  for code, (color, value, special) in enumerate(identities))
+
+    for card in cards:
+        if card.special:
+            for color in COLORS:
+                Card._intern(color, None, card.special, card.code, card)
+
+    return cards
+
+
+# All distinct cards, indexed by their code
+CARDS = _build_cards()
+CARDS_BY_STR = {str(card): card for card in CARDS}
 
 
 def from_str(string):
     """Decodes a Card object from a string"""
-    if string not in SPECIALS:
-        color, value = string.split('_')
-        return Card(color, value)
-    else:
-        return Card(None, None, string)
+    try:
+        return CARDS_BY_STR[string]
+    except KeyError:
+        raise ValueError('Invalid card: %r' % string) from None
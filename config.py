@@ -19,12 +19,24 @@
 
 
 import json
+import os
 
-with open("config.json","r") as f:
-    config = json.loads(f.read())
+# Each deployment keeps its own config.json, see config.json.example. Without
+# one, as in the tests, every setting has its default.
+CONFIG_FILE = os.getenv('UNO_CONFIG', 'config.json')
+
+try:
+    with open(CONFIG_FILE, "r") as f:
+        config = json.loads(f.read())
+except FileNotFoundError:
+    config = dict()
 
 TOKEN=config.get("token")
 WORKERS=config.get("workers", 32)
+MIN_WORKERS = config.get("min_workers", 4)
+WORKER_GROW_BACKLOG = config.get("worker_grow_backlog", 4)
+WORKER_GROW_QUEUED = config.get("worker_grow_queued", 32)
+WORKER_IDLE_TIMEOUT = config.get("worker_idle_timeout", 60)
 ADMIN_LIST = config.get("admin_list", None)
 OPEN_LOBBY = config.get("open_lobby", True)
 ENABLE_TRANSLATIONS = config.get("enable_translations", False)
@@ -33,3 +45,15 @@ WAITING_TIME = config.get("waiting_time", 120)
 TIME_REMOVAL_AFTER_SKIP = config.get("time_removal_after_skip", 20)
 MIN_FAST_TURN_TIME = config.get("min_fast_turn_time", 15)
 MIN_PLAYERS = config.get("min_players", 2)
+TRACE = config.get("trace", False)
+ACTION_LOG = config.get("action_log", False)
+TRACE_BUFFER_SIZE = config.get("trace_buffer_size", 10000)
+SNAPSHOT_FILE = config.get("snapshot_file", "uno.snapshot")
+SNAPSHOT_INTERVAL = config.get("snapshot_interval", 60)
+JOURNAL_FILE = config.get("journal_file", "uno.journal")
+JOURNAL_COMMIT_INTERVAL = config.get("journal_commit_interval", 0.01)
+REAP_LOBBY_TIMEOUT = config.get("reap_lobby_timeout", 3600)
+REAP_GAME_TIMEOUT = config.get("reap_game_timeout", 6 * 3600)
+REAP_NOTICE = config.get("reap_notice", True)
+INLINE_QUERY_MAX_AGE = config.get("inline_query_max_age", 5)
+RESULT_CACHE_SIZE = config.get("result_cache_size", 10000)
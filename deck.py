@@ -18,71 +18,134 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 
-from random import shuffle
+from array import array
 import logging
+import random
 
 import card as c
-from card import Card
 from errors import DeckEmptyError
 
+logger = logging.getLogger(__name__)
+
 
 class Deck(object):
-    """ This class represents a deck of cards """
+    """
+    This class represents a deck of cards.
+    The draw pile and the graveyard are compact arrays of card codes, the top
+    of the pile is the end of its array.
+    """
+
+    __slots__ = ('_rng', '_seed', 'codes', 'graveyard')
+
+    def __init__(self, rng=None, seed=None):
+        self._rng = rng
+        self._seed = seed
+        self.codes = array('B')
+        self.graveyard = array('B')
 
-    def __init__(self):
-        self.cards = list()
-        self.graveyard = list()
-        self.logger = logging.getLogger(__name__)
+    @property
+    def rng(self):
+        """
+        The random stream of this deck. Without a given one, it is created
+        from the seed on first use, as seeding is costly compared to
+        restoring a game that might never draw again.
+        """
+        if self._rng is None:
+            self._rng = random.Random(self._seed)
+        return self._rng
 
-        self.logger.debug(self.cards)
+    def __len__(self):
+        """Number of cards that can still be drawn, including the graveyard"""
+        return len(self.codes) + len(self.graveyard)
+
+    @property
+    def cards(self):
+        """The cards in the draw pile, top card last"""
+        return [c.CARDS[code] for code in self.codes]
 
     def shuffle(self):
         """Shuffles the deck"""
-        self.logger.debug("Shuffling Deck")
-        shuffle(self.cards)
+        logger.debug("Shuffling Deck")
+        self.rng.shuffle(self.codes)
+
+    def _recycle(self):
+        """Turns the graveyard into the new draw pile"""
+        if not self.graveyard:
+            raise DeckEmptyError()
+
+        self.codes, self.graveyard = self.graveyard, self.codes
+        self.shuffle()
 
     def draw(self):
         """Draws a card from this deck"""
-        try:
-            card = self.cards.pop()
-            self.logger.debug("Drawing card " + str(card))
-            return card
-        except IndexError:
-            if len(self.graveyard):
-                while len(self.graveyard):
-                    self.cards.append(self.graveyard.pop())
-                self.shuffle()
-                return self.draw()
-            else:
-                raise DeckEmptyError()
+        if not self.codes:
+            self._recycle()
+
+        return c.CARDS[self.codes.pop()]
+
+    def draw_many(self, n):
+        """
+        Draws n cards from this deck, in the same order as n calls to draw.
+        Raises DeckEmptyError without drawing anything if there are not
+        enough cards left.
+        """
+        if n > len(self):
+            raise DeckEmptyError()
+
+        drawn = array('B')
+        while len(drawn) < n:
+            if not self.codes:
+                self._recycle()
+
+            take = min(n - len(drawn), len(self.codes))
+            chunk = self.codes[-take:]
+            del self.codes[-take:]
+            chunk.reverse()
+            drawn.extend(chunk)
+
+        return [c.CARDS[code] for code in drawn]
 
     def dismiss(self, card):
         """Returns a card to the deck"""
-        if card.special:
-            card.color = None
-        self.graveyard.append(card)
-
-    def _fill_classic_(self):
-        # Fill deck with the classic card set
-        self.cards.clear()
-        for color in c.COLORS:
-            for value in c.VALUES:
-                self.cards.append(Card(color, value))
-                if not value == c.ZERO:
-                    self.cards.append(Card(color, value))
-        for special in c.SPECIALS:
-            for _ in range(4):
-                self.cards.append(Card(None, None, special=special))
-        self.shuffle()
+        self.graveyard.append(card.code)
 
-    def _fill_wild_(self):
-        # Fill deck with a wild card set
-        self.cards.clear()
-        for color in c.COLORS:
-            for value in c.WILD_VALUES:
-                for _ in range(4):
-                    self.cards.append(Card(color, value))
-        for special in c.SPECIALS:
-            for _ in range(6):
-                self.cards.append(Card(None, None, special=special))
+    def fill(self, mode):
+        """Fills the deck with a copy of the template of a game mode"""
+        template = TEMPLATES.get(mode, TEMPLATES[DEFAULT_COMPOSITION])
+        self.codes = array('B', template)
+        del self.graveyard[:]
         self.shuffle()
+
+
+# The cards each game mode plays with. Values are played in every color,
+# the numbers are the copies of each card.
+COMPOSITIONS = {
+    'classic': {
+        'values': {c.ZERO: 1, c.ONE: 2, c.TWO: 2, c.THREE: 2, c.FOUR: 2,
+                   c.FIVE: 2, c.SIX: 2, c.SEVEN: 2, c.EIGHT: 2, c.NINE: 2,
+                   c.DRAW_TWO: 2, c.REVERSE: 2, c.SKIP: 2},
+        'specials': {c.CHOOSE: 4, c.DRAW_FOUR: 4},
+    },
+    'wild': {
+        'values': dict.fromkeys(c.WILD_VALUES, 4),
+        'specials': dict.fromkeys(c.SPECIALS, 6),
+    },
+}
+
+# Modes without a composition of their own play with this one
+DEFAULT_COMPOSITION = 'classic'
+
+
+def _build_template(composition):
+    codes = array('B')
+    for color in c.COLORS:
+        for value, copies in composition['values'].items():
+            codes.extend([c.Card(color, value).code] * copies)
+    for special, copies in composition['specials'].items():
+        codes.extend([c.Card(None, None, special).code] * copies)
+    return codes.tobytes()
+
+
+# Unshuffled card codes of every composition, built once at import
+TEMPLATES = {mode: _build_template(composition)
+             for mode, composition in COMPOSITIONS.items()}
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Pure functional UNO rules engine.
+
+A game is an immutable State value and step(state, action) returns the next
+state together with a list of events, without any I/O. It follows the same
+rules, card order and random stream as Game and Player, so a seed and a list
+of actions give the same game in both.
+
+This is a simulation-only model for benchmarks and fuzzing, the bot does not
+use it: games in chats run on Game and Player. Both apply the same card
+effects, draw amount and bluff rule from rules.py, but the turn flow around
+them (drawing before a pass, bluff calls, leaving, winning) is modelled again
+here after actions.py and GameManager. test_engine.py plays both side by side
+to keep that part in step.
+
+Actions are tuples and are always made by the current player, except leave:
+    ('play', code)      play a card from the hand
+    ('draw',)           draw the pending amount, or one card
+    ('pass',)           end the turn after drawing
+    ('color', color)    choose the color of a played special card
+    ('bluff',)          call the bluff of a +4
+    ('skip',)           skipped by a timeout: draw and end the turn
+    ('leave', player)   a player leaves the game
+
+Events are tuples as well:
+    ('played', player, code), ('drew', player, amount), ('deck_empty',),
+    ('choose_color', player), ('color', color), ('uno', player),
+    ('bluff', caller, target, caught), ('won', player), ('left', player),
+    ('turn', player), ('game_over',)
+"""
+
+import random
+from collections import namedtuple
+
+import card as c
+import rules
+from deck import TEMPLATES, DEFAULT_COMPOSITION
+from errors import DeckEmptyError, IllegalActionError
+from player import HAND_SIZE
+
+State = namedtuple('State', 'seats hands pile graveyard rng last draw_counter '
+                            'current direction drew choosing bluffing '
+                            'finished')
+State.__doc__ = """
+Immutable game state. seats holds the player numbers in seating order and
+hands the card codes of each seat in draw order. pile and graveyard are card
+codes with the top of the pile last, rng is the state of the random stream
+and last is the last played card, with its chosen color. bluffing is set when
+the last +4 was played while holding a card of the last color.
+"""
+
+
+class _Turn(object):
+    """Mutable scratch copy of a state while a step is computed"""
+
+    def __init__(self, state):
+        self.seats = list(state.seats)
+        self.hands = list(state.hands)
+        self.pile = state.pile
+        self.graveyard = state.graveyard
+        self.rng = state.rng
+        self.last = state.last
+        self.draw_counter = state.draw_counter
+        self.current = state.current
+        self.direction = state.direction
+        self.drew = state.drew
+        self.choosing = state.choosing
+        self.bluffing = state.bluffing
+        self.finished = state.finished
+        self.events = list()
+
+    def freeze(self):
+        return State(tuple(self.seats), tuple(self.hands), self.pile,
+                     self.graveyard, self.rng, self.last, self.draw_counter,
+                     self.current, self.direction, self.drew, self.choosing,
+                     self.bluffing, self.finished)
+
+    def _shuffle(self, codes):
+        rng = random.Random()
+        rng.setstate(self.rng)
+        codes = bytearray(codes)
+        rng.shuffle(codes)
+        self.rng = rng.getstate()
+        return bytes(codes)
+
+    def draw_cards(self, n):
+        """
+        Draws n cards like Deck.draw_many, returns them in draw order.
+        Raises DeckEmptyError without drawing anything if there are not
+        enough cards left.
+        """
+        if n > len(self.pile) + len(self.graveyard):
+            raise DeckEmptyError()
+
+        drawn = bytearray()
+        while len(drawn) < n:
+            if not self.pile:
+                self.pile = self._shuffle(self.graveyard)
+                self.graveyard = b''
+
+            take = min(n - len(drawn), len(self.pile))
+            drawn += self.pile[-take:][::-1]
+            self.pile = self.pile[:-take]
+        return bytes(drawn)
+
+    def dismiss(self, code):
+        self.graveyard += bytes((code,))
+
+    def next_seat(self, seat):
+        return (seat + self.direction) % len(self.seats)
+
+    def turn(self):
+        self.current = self.next_seat(self.current)
+        self.drew = False
+        self.choosing = False
+        self.events.append(('turn', self.seats[self.current]))
+
+    def draw(self, seat):
+        """Draws the pending amount for a seat, like Player.draw"""
+        available = len(self.pile) + len(self.graveyard)
+        amount, short = rules.draw_amount(self.draw_counter, available)
+        drawn = self.draw_cards(amount)
+
+        self.hands[seat] += drawn
+        self.draw_counter = 0
+        if seat == self.current:
+            self.drew = True
+        self.events.append(('drew', self.seats[seat], len(drawn)))
+
+        if short:
+            self.events.append(('deck_empty',))
+
+    def play_card(self, card):
+        """Plays a card and triggers its effects, like Game.play_card"""
+        if self.last is not None:
+            self.dismiss(self.last.code)
+        self.last = card
+
+        effect = rules.effect(card, len(self.seats))
+        self.draw_counter += effect.draw
+        if effect.reverse:
+            self.direction = -self.direction
+        for _ in range(effect.turns):
+            self.turn()
+
+        if effect.choose:
+            self.choosing = True
+            self.events.append(('choose_color', self.seats[self.current]))
+
+    def remove_seat(self, seat):
+        for code in self.hands[seat]:
+            self.dismiss(code)
+
+        player = self.seats.pop(seat)
+        del self.hands[seat]
+        if seat < self.current:
+            self.current -= 1
+        self.current %= len(self.seats)
+        self.events.append(('left', player))
+
+    def leave(self, seat):
+        """Removes a seat like GameManager.leave_game"""
+        if len(self.seats) < 3:
+            self.finished = True
+            self.events.append(('game_over',))
+            return
+
+        if seat == self.current:
+            self.turn()
+        self.remove_seat(seat)
+
+
+def new_state(seed, players, mode=None):
+    """Starts a game like Game.start followed by Game.deal"""
+    rng = random.Random(seed)
+    pile = bytearray(TEMPLATES.get(mode, TEMPLATES[DEFAULT_COMPOSITION]))
+    rng.shuffle(pile)
+
+    turn = _Turn(State(seats=tuple(range(players)), hands=(b'',) * players,
+                       pile=bytes(pile), graveyard=b'', rng=rng.getstate(),
+                       last=None, draw_counter=0, current=0, direction=1,
+                       drew=False, choosing=False, bluffing=False,
+                       finished=False))
+
+    # The first card should not be a special card
+    card = c.CARDS[turn.draw_cards(1)[0]]
+    while card.special:
+        turn.dismiss(card.code)
+        card = c.CARDS[turn.draw_cards(1)[0]]
+    turn.play_card(card)
+
+    # Deal to every seat starting with the current one
+    drawn = turn.draw_cards(HAND_SIZE * players)
+    seat = turn.current
+    for i in range(players):
+        turn.hands[seat] = drawn[i * HAND_SIZE:(i + 1) * HAND_SIZE]
+        seat = turn.next_seat(seat)
+
+    return turn.freeze(), turn.events
+
+
+def _playable_mask(state):
+    hand = state.hands[state.current]
+    if state.drew:
+        hand = hand[-1:]
+
+    mask = rules.playable_mask(state.last, state.draw_counter) & \
+        rules.mask_of(c.CARDS[code] for code in hand)
+    return mask, hand
+
+
+def playable(state):
+    """Returns the codes of the cards the current player can play"""
+    hand = state.hands[state.current]
+
+    # You may not play a chooser or +4 as your last card
+    if len(hand) == 1 and c.CARDS[hand[0]].special:
+        return list()
+
+    mask, hand = _playable_mask(state)
+    return [code for code in hand if mask >> code & 1]
+
+
+def legal_actions(state):
+    """Returns all actions the current player can take"""
+    if state.finished:
+        return list()
+    if state.choosing:
+        return [('color', color) for color in c.COLORS]
+
+    actions = [('play', code) for code in sorted(set(playable(state)))]
+    actions.append(('pass',) if state.drew else ('draw',))
+    if state.last.special == c.DRAW_FOUR and state.draw_counter:
+        actions.append(('bluff',))
+    return actions
+
+
+def step(state, action):
+    """Applies an action to a state, returns the new state and the events"""
+    if state.finished:
+        raise IllegalActionError('The game is over')
+
+    name = action[0]
+    turn = _Turn(state)
+    seat = state.current
+    player = state.seats[seat]
+
+    if name == 'color':
+        if not state.choosing or action[1] not in c.COLORS:
+            raise IllegalActionError(action)
+
+        turn.last = state.last.with_color(action[1])
+        turn.events.append(('color', action[1]))
+        turn.turn()
+
+    elif name == 'leave':
+        if action[1] not in state.seats:
+            raise IllegalActionError(action)
+        turn.leave(state.seats.index(action[1]))
+
+    elif name == 'skip':
+        # A timeout can also hit a player who is choosing a color
+        turn.draw(seat)
+        turn.turn()
+
+    elif state.choosing:
+        raise IllegalActionError(action)
+
+    elif name == 'play':
+        code = action[1]
+        if code not in playable(state):
+            raise IllegalActionError(action)
+
+        card = c.CARDS[code]
+        mask, _ = _playable_mask(state)
+        if card.special == c.DRAW_FOUR:
+            turn.bluffing = rules.bluffing(mask, state.last)
+
+        hand = state.hands[seat]
+        index = hand.index(code)
+        turn.hands[seat] = hand[:index] + hand[index + 1:]
+        turn.events.append(('played', player, code))
+        if len(turn.hands[seat]) == 1:
+            turn.events.append(('uno', player))
+        elif not turn.hands[seat]:
+            turn.events.append(('won', player))
+
+        turn.play_card(card)
+        if not turn.hands[seat]:
+            turn.leave(seat)
+
+    elif name == 'draw':
+        if state.drew:
+            raise IllegalActionError(action)
+
+        turn.draw(seat)
+        if (state.last.value == c.DRAW_TWO or
+                state.last.special == c.DRAW_FOUR) and state.draw_counter:
+            turn.turn()
+
+    elif name == 'pass':
+        if not state.drew:
+            raise IllegalActionError(action)
+        turn.turn()
+
+    elif name == 'bluff':
+        if state.last.special != c.DRAW_FOUR or not state.draw_counter:
+            raise IllegalActionError(action)
+
+        target = (seat - state.direction) % len(state.seats)
+        turn.events.append(('bluff', player, state.seats[target],
+                            state.bluffing))
+        if state.bluffing:
+            turn.draw(target)
+        else:
+            turn.draw_counter += 2
+            turn.draw(seat)
+        turn.turn()
+
+    else:
+        raise IllegalActionError(action)
+
+    return turn.freeze(), turn.events
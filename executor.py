@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class ChatExecutor(object):
+    """
+    Runs submitted callables one at a time per key, in submission order,
+    while different keys run in parallel on a shared thread pool.
+
+    Every key with pending work owns a queue. Only one pool thread drains a
+    queue at a time; after `batch` tasks it yields the thread back to the
+    pool so a busy chat can not starve the others.
+    """
+
+    def __init__(self, workers=None, batch=16, pool=None):
+        self.batch = batch
+        # Any pool with submit and shutdown, like pool.WorkerPool
+        if pool is None:
+            pool = ThreadPoolExecutor(max_workers=workers,
+                                      thread_name_prefix='chat')
+        self._pool = pool
+        self._lock = threading.Lock()
+        self._queues = dict()
+        self._idle = threading.Condition(self._lock)
+        self._running = 0
+        self._paused = False
+        self._parked = list()
+
+    def submit(self, key, func, *args, **kwargs):
+        """Queues func(*args, **kwargs) behind all earlier tasks of key"""
+        task = (func, args, kwargs)
+
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is not None:
+                queue.append(task)
+                return
+
+            self._queues[key] = deque((task,))
+
+            if self._paused:
+                self._parked.append(key)
+                return
+            self._running += 1
+
+        self._pool.submit(self._drain, key)
+
+    def call(self, key, func, *args, **kwargs):
+        """Like submit, but returns a Future of the result of func"""
+        future = Future()
+
+        def run():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+        self.submit(key, run)
+        return future
+
+    def _drain(self, key):
+        with self._lock:
+            queue = self._queues[key]
+
+        for _ in range(self.batch):
+            with self._lock:
+                if self._paused:
+                    self._parked.append(key)
+                    self._stopped()
+                    return
+
+            func, args, kwargs = queue[0]
+
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception("Task for %s failed", key)
+
+            with self._lock:
+                queue.popleft()
+                if not queue:
+                    del self._queues[key]
+                    self._stopped()
+                    return
+
+        # Still busy, go to the back of the pool's line
+        self._pool.submit(self._drain, key)
+
+    def _stopped(self):
+        # Called with the lock held when a drain gives up its thread
+        self._running -= 1
+        self._idle.notify_all()
+
+    @contextmanager
+    def quiesce(self):
+        """
+        Waits for all running tasks to finish and holds back all others
+        until the block is left, so it sees every chat at rest.
+        """
+        with self._lock:
+            self._paused = True
+            self._idle.wait_for(lambda: not self._running)
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._paused = False
+                parked, self._parked = self._parked, list()
+                self._running += len(parked)
+
+            for key in parked:
+                self._pool.submit(self._drain, key)
+
+    def depth(self, key):
+        """Number of queued tasks for key, including a running one"""
+        with self._lock:
+            queue = self._queues.get(key)
+            return len(queue) if queue else 0
+
+    def depths(self):
+        """Snapshot of the queue depth of every key with pending work"""
+        with self._lock:
+            return {key: len(queue) for key, queue in self._queues.items()}
+
+    def join(self, timeout=None):
+        """Blocks until all queues are drained, returns False on timeout"""
+        with self._lock:
+            return self._idle.wait_for(lambda: not self._queues, timeout)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -19,87 +19,260 @@
 
 
 import logging
+import random
+import time
+from collections import namedtuple
 from config import ADMIN_LIST, OPEN_LOBBY, DEFAULT_GAMEMODE, ENABLE_TRANSLATIONS
+from config import ACTION_LOG
 from datetime import datetime
 
 from deck import Deck
-import card as c
+from journal import journal
+from player import HAND_SIZE
+from tracing import tracer
+from views import GameView
+import rules
+
+logger = logging.getLogger(__name__)
+
+# The parts of a Telegram chat a game keeps
+ChatRecord = namedtuple('ChatRecord', 'id type title')
+
+
+def chat_record(chat):
+    """Returns the record of a Telegram chat, or anything with its fields"""
+    if chat is None or isinstance(chat, ChatRecord):
+        return chat
+    return ChatRecord(chat.id, getattr(chat, 'type', None),
+                      getattr(chat, 'title', None))
+
 
 class Game(object):
-    """ This class represents a game of UNO """
-    current_player = None
-    reversed = False
-    choosing_color = False
-    started = False
-    draw_counter = 0
-    players_won = 0
-    starter = None
-    mode = DEFAULT_GAMEMODE
-    job = None
-    owner = ADMIN_LIST
-    open = OPEN_LOBBY
-    translate = ENABLE_TRANSLATIONS
-
-    def __init__(self, chat):
-        self.chat = chat
+    """
+    This class represents a game of UNO.
+    The players sit in an array in clockwise order, the direction of play is
+    a sign that is flipped on reverse.
+    """
+
+    __slots__ = ('chat', 'last_card', 'seed', 'actions', 'last_active',
+                 'deck', '_seats', '_current', 'direction', '_seats_version',
+                 '_players', 'choosing_color', 'started', 'draw_counter',
+                 'players_won', 'starter', 'mode', 'job', 'owner', 'open',
+                 'translate', 'joined', 'view')
+
+    def __init__(self, chat, seed=None, log=ACTION_LOG):
+        self.chat = chat_record(chat)
         self.last_card = None
+        self.choosing_color = False
+        self.started = False
+        self.draw_counter = 0
+        self.players_won = 0
+        self.starter = None
+        self.mode = DEFAULT_GAMEMODE
+        self.job = None
+        self.owner = list(ADMIN_LIST or ())
+        self.open = OPEN_LOBBY
+        self.translate = ENABLE_TRANSLATIONS
+        self.joined = 0
+
+        # Every game shuffles with its own random stream. The seed and the
+        # recorded actions are enough to replay the game, see replay.py.
+        # The bot keeps them in the journal, a game only holds its own log
+        # for debugging and replay tests.
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        self.seed = seed
+        self.actions = list() if log else None
+        # Monotonic time of the last action, see reaper.py
+        self.last_active = time.monotonic()
 
-        self.deck = Deck()
+        self.deck = Deck(seed=seed)
 
-        self.logger = logging.getLogger(__name__)
+        self._seats = list()
+        self._current = 0
+        self.direction = 1
+        self._seats_version = 0
+        self._players = (None, ())
+
+        # The latest published view for inline queries, see views.py
+        self.view = None
+
+    @property
+    def rng(self):
+        """The random stream of this game, shared with its deck"""
+        return self.deck.rng
 
     @property
     def players(self):
-        """Returns a list of all players in this game"""
-        players = list()
-        if not self.current_player:
-            return players
-
-        current_player = self.current_player
-        itplayer = current_player.next
-        players.append(current_player)
-        while itplayer and itplayer is not current_player:
-            players.append(itplayer)
-            itplayer = itplayer.next
-        return players
+        """
+        Returns all players in this game, starting with the current player
+        in the direction of play. The tuple is cached until the seating, the
+        current player or the direction changes.
+        """
+        # Read once, so the tuple always matches its stamp
+        version = self._seats_version
+        current = self._current
+        direction = self.direction
+        stamp = (version, current, direction)
+        if self._players[0] != stamp:
+            seats = self._seats
+            if direction > 0:
+                players = seats[current:] + seats[:current]
+            else:
+                players = seats[current::-1] + seats[:current:-1]
+            self._players = (stamp, tuple(players))
+        return self._players[1]
 
-    def start(self):
-        if self.mode == None or self.mode != "wild":
-            self.deck._fill_classic_()
+    @property
+    def player_count(self):
+        return len(self._seats)
+
+    def has_player(self, player):
+        """Checks if a player is seated in this game"""
+        return player.game is self and player.seat is not None
+
+    @property
+    def current_player(self):
+        return self._seats[self._current] if self._seats else None
+
+    @current_player.setter
+    def current_player(self, player):
+        self._current = player.seat
+
+    @property
+    def reversed(self):
+        return self.direction < 0
+
+    def next_player(self, player):
+        """Returns the player after this one in the direction of play"""
+        seats = self._seats
+        return seats[(player.seat + self.direction) % len(seats)]
+
+    def prev_player(self, player):
+        """Returns the player before this one in the direction of play"""
+        seats = self._seats
+        return seats[(player.seat - self.direction) % len(seats)]
+
+    def add_player(self, player):
+        """Seats a new player right before the current player"""
+        if not self._seats:
+            index = 0
+        elif self.direction > 0:
+            index = self._current
+            self._current += 1
         else:
-            self.deck._fill_wild_()
+            index = self._current + 1
+
+        self._seats.insert(index, player)
+        self._reseat(index)
+
+    def remove_player(self, player):
+        """Removes a player from the seats and closes the gap"""
+        index = player.seat
+        del self._seats[index]
+        player.seat = None
+
+        if index < self._current:
+            self._current -= 1
+        if self._current >= len(self._seats):
+            self._current = 0
+        self._reseat(index)
+
+    def restore_seats(self, players, current, direction):
+        """Replaces all seats with these players, used by snapshot.py"""
+        self._seats = list(players)
+        self._current = current
+        self.direction = direction
+        self._reseat(0)
+
+    def _reseat(self, start):
+        for index in range(start, len(self._seats)):
+            self._seats[index].seat = index
+        self._seats_version += 1
+
+    def record(self, *action):
+        """Records a state-changing action in the action log and journal"""
+        if self.actions is not None:
+            self.actions.append(action)
+        self.last_active = time.monotonic()
+        if tracer.enabled:
+            tracer.emit(self, *action)
+        if journal.enabled:
+            journal.record(self, *action)
+
+    def publish(self, locales=()):
+        """
+        Publishes a new immutable view of this game for the readers, with
+        the locales of its players, see GameManager.publish_game
+        """
+        version = self.view.version + 1 if self.view is not None else 1
+        self.view = GameView(self, version, locales)
+        return self.view
+
+    def reseed(self):
+        """
+        Continues the random stream from a fresh seed drawn from it, so the
+        state of the stream fits into 64 bits, see snapshot.py
+        """
+        seed = self.rng.getrandbits(64)
+        self.record('reseed', seed)
+        self.rng.seed(seed)
+        return seed
+
+    def start(self):
+        self.record('start')
+        self.deck.fill(self.mode)
 
         self._first_card_()
         self.started = True
 
+    def deal(self):
+        """Deals the opening hands to all players with a single draw"""
+        self.record('deal')
+        players = self.players
+        cards = self.deck.draw_many(HAND_SIZE * len(players))
+
+        for i, player in enumerate(players):
+            player.cards.extend(cards[i * HAND_SIZE:(i + 1) * HAND_SIZE])
+
+    def add_winner(self):
+        """Counts a player who got rid of all cards"""
+        self.record('won')
+        self.players_won += 1
+
     def set_mode(self, mode):
+        self.record('mode', mode)
         self.mode = mode
 
     def reverse(self):
         """Reverses the direction of game"""
-        self.reversed = not self.reversed
+        self.direction = -self.direction
 
     def turn(self):
         """Marks the turn as over and change the current player"""
-        self.logger.debug("Next Player")
-        self.current_player = self.current_player.next
+        self.record('turn')
+        self._turn()
+
+    def _turn(self):
+        logger.debug("Next Player")
+        self._current = (self._current + self.direction) % len(self._seats)
         self.current_player.drew = False
         self.current_player.turn_started = datetime.now()
         self.choosing_color = False
 
     def _first_card_(self):
         # In case that the player did not select a game mode
-        if not self.deck.cards:
+        if not self.deck.codes:
             self.set_mode(DEFAULT_GAMEMODE)
 
         # The first card should not be a special card
-        while not self.last_card or self.last_card.special:
-            self.last_card = self.deck.draw()
+        card = self.deck.draw()
+        while card.special:
             # If the card drawn was special, return it to the deck and loop again
-            if self.last_card.special:
-                self.deck.dismiss(self.last_card)
+            self.deck.dismiss(card)
+            card = self.deck.draw()
 
-        self.play_card(self.last_card)
+        self.play_card(card)
 
     def play_card(self, card):
         """
@@ -107,33 +280,26 @@ class Game(object):
         Should be called only from Player.play or on game start to play the
         first card
         """
-        self.deck.dismiss(self.last_card)
+        if self.last_card:
+            self.deck.dismiss(self.last_card)
         self.last_card = card
 
-        self.logger.info("Playing card " + repr(card))
-        if card.value == c.SKIP:
-            self.turn()
-        elif card.special == c.DRAW_FOUR:
-            self.draw_counter += 4
-            self.logger.debug("Draw counter increased by 4")
-        elif card.value == c.DRAW_TWO:
-            self.draw_counter += 2
-            self.logger.debug("Draw counter increased by 2")
-        elif card.value == c.REVERSE:
-            # Special rule for two players
-            if self.current_player is self.current_player.next.next:
-                self.turn()
-            else:
-                self.reverse()
+        effect = rules.effect(card, len(self._seats))
+        if effect.draw:
+            self.draw_counter += effect.draw
+            logger.debug("Draw counter increased by %d", effect.draw)
+        if effect.reverse:
+            self.reverse()
+        for _ in range(effect.turns):
+            self._turn()
 
         # Don't turn if the current player has to choose a color
-        if card.special not in (c.CHOOSE, c.DRAW_FOUR):
-            self.turn()
-        else:
-            self.logger.debug("Choosing Color...")
+        if effect.choose:
+            logger.debug("Choosing Color...")
             self.choosing_color = True
 
     def choose_color(self, color):
         """Carries out the color choosing and turns the game"""
-        self.last_card.color = color
-        self.turn()
+        self.record('color', color)
+        self.last_card = self.last_card.with_color(color)
+        self._turn()
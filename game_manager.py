@@ -19,42 +19,129 @@
 
 
 import logging
+import threading
+from contextlib import contextmanager
 
 from game import Game
-from player import Player
-from errors import (AlreadyJoinedError, LobbyClosedError, NoGameInChatError,
-                    NotEnoughPlayersError)
+from journal import journal
+from player import Player, user_record
+from errors import (AlreadyJoinedError, DeckEmptyError, LobbyClosedError,
+                    NoGameInChatError, NotEnoughPlayersError)
+
+
+class _Index(dict):
+    """
+    An index of a GameManager that restores the deferred games a key refers
+    to before it is looked up, and all of them before it is iterated
+    """
+
+    __slots__ = ('_thaw', '_thaw_all')
+
+    def __init__(self, thaw, thaw_all):
+        dict.__init__(self)
+        self._thaw = thaw
+        self._thaw_all = thaw_all
+
+    def __getitem__(self, key):
+        self._thaw(key)
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        self._thaw(key)
+        return dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        self._thaw(key)
+        return dict.get(self, key, default)
+
+    def setdefault(self, key, default=None):
+        self._thaw(key)
+        return dict.setdefault(self, key, default)
+
+    def pop(self, key, *default):
+        self._thaw(key)
+        return dict.pop(self, key, *default)
+
+    def __iter__(self):
+        self._thaw_all()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._thaw_all()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._thaw_all()
+        return dict.keys(self)
+
+    def values(self):
+        self._thaw_all()
+        return dict.values(self)
+
+    def items(self):
+        self._thaw_all()
+        return dict.items(self)
 
 
 class GameManager(object):
     """ Manages all running games by using a confusing amount of dicts """
 
     def __init__(self):
-        self.chatid_games = dict()
-        self.userid_players = dict()
-        self.userid_current = dict()
+        self.chatid_games = _Index(self.thaw, self.thaw_all)
+        self.chatid_current = _Index(self.thaw, self.thaw_all)
+        self.userid_players = _Index(self.thaw_user, self.thaw_all)
+        self.userid_current = _Index(self.thaw_user, self.thaw_all)
+        self.userchat_player = _Index(self._thaw_user_chat, self.thaw_all)
         self.remind_dict = dict()
+        # Watches new games for idleness if set, see reaper.py
+        self.reaper = None
+
+        # Games of a snapshot that are restored on first use, see defer
+        self.deferred = None
+        # Called with every game restored from the deferred ones
+        self.on_thaw = None
+        # Returns the locales of a game's players for its views
+        self.locales_of = None
+        self._thaw_lock = threading.RLock()
+        self._thawing = False
+        # Restored games waiting for the end of a recovery, see hold
+        self._held = None
 
         self.logger = logging.getLogger(__name__)
 
-    def new_game(self, chat):
+    def new_game(self, chat, seed=None, starter=None):
         """
-        Create a new game in this chat
+        Create a new game in this chat, owned by the user who started it
         """
         chat_id = chat.id
 
         self.logger.debug("Creating new game in chat " + str(chat_id))
-        game = Game(chat)
+        game = Game(chat, seed)
+        entry = ('new', chat.type, chat.title)
+        if starter is not None:
+            game.starter = user_record(starter)
+            game.owner.append(starter.id)
+            entry += (starter.id, starter.first_name, starter.username)
+        if journal.enabled:
+            journal.record(game, *entry)
 
         if chat_id not in self.chatid_games:
             self.chatid_games[chat_id] = list()
 
         # remove old games
         for g in list(self.chatid_games[chat_id]):
-            if not g.players:
+            if not g.player_count:
                 self.chatid_games[chat_id].remove(g)
 
         self.chatid_games[chat_id].append(game)
+        self.chatid_current[chat_id] = game
+
+        if self._held is not None:
+            self._held.append(game)
+        else:
+            if self.reaper is not None:
+                self.reaper.watch(game)
+            self.publish_game(game)
         return game
 
     def join_game(self, user, chat):
@@ -62,23 +149,18 @@ class GameManager(object):
         self.logger.info("Joining game with id " + str(chat.id))
 
         try:
-            game = self.chatid_games[chat.id][-1]
-        except (KeyError, IndexError):
+            game = self.chatid_current[chat.id]
+        except KeyError:
             raise NoGameInChatError()
 
         if not game.open:
             raise LobbyClosedError()
 
-        if user.id not in self.userid_players:
-            self.userid_players[user.id] = list()
-
-        players = self.userid_players[user.id]
-
         # Don not re-add a player and remove the player from previous games in
         # this chat, if he is in one of them
-        for player in players:
-            if player in game.players:
-                raise AlreadyJoinedError()
+        player = self.userchat_player.get((user.id, chat.id))
+        if player and player.game is game:
+            raise AlreadyJoinedError()
 
         try:
             self.leave_game(user, chat)
@@ -87,55 +169,45 @@ class GameManager(object):
         except NotEnoughPlayersError:
             self.end_game(chat, user)
 
-            if user.id not in self.userid_players:
-                self.userid_players[user.id] = list()
-
-            players = self.userid_players[user.id]
+        if journal.enabled:
+            journal.record(game, 'user', user.id, user.first_name,
+                           user.username)
 
         player = Player(game, user)
         if game.started:
-            player.draw_first_hand()
+            try:
+                player.draw_first_hand()
+            except DeckEmptyError:
+                player.leave()
+                raise
+
+        self.index_player(player)
 
-        players.append(player)
-        self.userid_current[user.id] = player
+    def index_player(self, player):
+        """Adds a player to the user indexes as the user's current one"""
+        user_id = player.user.id
+        self.userid_players.setdefault(user_id, list()).append(player)
+        self.userid_current[user_id] = player
+        self.userchat_player[(user_id, player.game.chat.id)] = player
 
     def leave_game(self, user, chat):
         """ Remove a player from its current game """
 
         player = self.player_for_user_in_chat(user, chat)
-        players = self.userid_players.get(user.id, list())
 
         if not player:
-            games = self.chatid_games[chat.id]
-            for g in games:
-                for p in g.players:
-                    if p.user.id == user.id:
-                        if p is g.current_player:
-                            g.turn()
-
-                        p.leave()
-                        return
-
             raise NoGameInChatError
 
         game = player.game
 
-        if len(game.players) < 3:
+        if game.player_count < 3:
             raise NotEnoughPlayersError()
 
         if player is game.current_player:
             game.turn()
 
         player.leave()
-        players.remove(player)
-
-        # If this is the selected game, switch to another
-        if self.userid_current.get(user.id, None) is player:
-            if players:
-                self.userid_current[user.id] = players[0]
-            else:
-                del self.userid_current[user.id]
-                del self.userid_players[user.id]
+        self.forget_player(player)
 
     def end_game(self, chat, user):
         """
@@ -150,41 +222,220 @@ class GameManager(object):
         if not player:
             raise NoGameInChatError
 
-        game = player.game
+        self.remove_game(player.game)
+
+    def remove_game(self, game):
+        """Removes a game and all of its players from the indexes"""
+        if journal.enabled:
+            journal.record(game, 'end')
 
         # Clear game
         for player_in_game in game.players:
-            this_users_players = \
-                self.userid_players.get(player_in_game.user.id, list())
+            self.forget_player(player_in_game)
+
+        chat_id = game.chat.id
+        games = self.chatid_games[chat_id]
+        games.remove(game)
+        if games:
+            self.chatid_current[chat_id] = games[-1]
+        else:
+            del self.chatid_games[chat_id]
+            del self.chatid_current[chat_id]
+
+    def forget_player(self, player):
+        """Removes a player from the user indexes"""
+        user_id = player.user.id
+        players = self.userid_players.get(user_id, list())
 
-            try:
-                this_users_players.remove(player_in_game)
-            except ValueError:
-                pass
-
-            if this_users_players:
-                try:
-                    self.userid_current[player_in_game.user.id] = this_users_players[0]
-                except KeyError:
-                    pass
-            else:
-                try:
-                    del self.userid_players[player_in_game.user.id]
-                except KeyError:
-                    pass
+        try:
+            players.remove(player)
+        except ValueError:
+            pass
 
-                try:
-                    del self.userid_current[player_in_game.user.id]
-                except KeyError:
-                    pass
+        if self.userchat_player.get((user_id, player.game.chat.id)) is player:
+            del self.userchat_player[(user_id, player.game.chat.id)]
 
-        self.chatid_games[chat.id].remove(game)
-        if not self.chatid_games[chat.id]:
-            del self.chatid_games[chat.id]
+        # If this is the selected game, switch to another
+        if players:
+            if self.userid_current.get(user_id) is player:
+                self.userid_current[user_id] = players[0]
+        else:
+            self.userid_players.pop(user_id, None)
+            self.userid_current.pop(user_id, None)
+
+    def defer(self, deferred):
+        """
+        Restores the games of a snapshot only when a chat or a user they
+        belong to is first looked up, or when an index is iterated. The
+        deferred games provide their chat ids in chats, the user ids in
+        users, chats_of(user_id) and restore(gm, chat_id), see snapshot.py.
+        """
+        self.deferred = deferred
+
+    def thaw(self, chat_id):
+        """Restores the deferred games of a chat, if there are any"""
+        deferred = self.deferred
+        if deferred is None or chat_id not in deferred.chats:
+            return
+
+        with self._thaw_lock:
+            # Restoring writes the indexes of the chat, which must not thaw
+            if self._thawing or chat_id not in deferred.chats:
+                return
+            self._thawing = True
+            try:
+                games = deferred.restore(self, chat_id)
+            finally:
+                self._thawing = False
+                del deferred.chats[chat_id]
+                if not deferred.chats:
+                    self.deferred = None
+
+            # Published before other threads can find them, which is the
+            # first use instead of all at startup
+            if self._held is not None:
+                self._held.extend(games)
+            else:
+                for game in games:
+                    self._restored(game)
+
+    def _restored(self, game):
+        self.publish_game(game)
+        if self.reaper is not None:
+            self.reaper.watch(game)
+        if self.on_thaw is not None:
+            self.on_thaw(game)
+
+    @contextmanager
+    def hold(self):
+        """
+        Holds back the games restored or created in this block, which are
+        published, watched and handed to on_thaw at its end if they still
+        run. Replaying the journal on top of a snapshot runs in such a block,
+        so the hooks see the recovered state instead of the snapshot's.
+        """
+        with self._thaw_lock:
+            self._held = list()
+            try:
+                yield
+            finally:
+                held, self._held = self._held, None
+                for game in held:
+                    if game in dict.get(self.chatid_games, game.chat.id, ()):
+                        self._restored(game)
+
+    def thaw_user(self, user_id):
+        """Restores the deferred games of all chats of a user"""
+        deferred = self.deferred
+        if deferred is None or user_id not in deferred.users:
+            return
+
+        with self._thaw_lock:
+            if self._thawing:
+                return
+            for chat_id in deferred.chats_of(user_id):
+                self.thaw(chat_id)
+            deferred.users.pop(user_id, None)
+
+    def _thaw_user_chat(self, key):
+        self.thaw(key[1])
+
+    def thaw_all(self):
+        """Restores all deferred games"""
+        deferred = self.deferred
+        if deferred is None:
+            return
+
+        with self._thaw_lock:
+            if self._thawing:
+                return
+            for chat_id in list(deferred.chats):
+                self.thaw(chat_id)
+
+    def chats(self):
+        """
+        The ids of the chats with restored games, the deferred games and
+        their chats with the start, end and number of their games, see
+        snapshot.Deferred. Taken together, so no chat is in both or neither,
+        and without restoring any.
+        """
+        with self._thaw_lock:
+            deferred = self.deferred
+            return (list(dict.keys(self.chatid_games)), deferred,
+                    dict(deferred.chats) if deferred is not None else dict())
+
+    def deferred_chats(self):
+        """The ids of the chats with deferred games"""
+        deferred = self.deferred
+        return list(deferred.chats) if deferred is not None else list()
+
+    def publish(self, chat_id):
+        """Publishes new views of all games in a chat, see views.py"""
+        for game in self.chatid_games.get(chat_id, ()):
+            self.publish_game(game)
+
+    def publish_game(self, game):
+        """Publishes a new view of a game with the locales of its players"""
+        if self.locales_of is None:
+            return game.publish()
+        return game.publish(self.locales_of(game))
 
     def player_for_user_in_chat(self, user, chat):
-        players = self.userid_players.get(user.id, list())
-        for player in players:
-            if player.game.chat.id == chat.id:
-                return player
-        return None
+        if user is None or chat is None:
+            return None
+        return self.userchat_player.get((user.id, chat.id))
+
+    def check_consistency(self):
+        """
+        Cross-checks all indexes against the games and their players.
+        Returns a list of the problems found, which is empty if all is well.
+        """
+        problems = list()
+
+        for chat_id, games in self.chatid_games.items():
+            if not games:
+                problems.append("chat %s has an empty game list" % chat_id)
+            elif self.chatid_current.get(chat_id) is not games[-1]:
+                problems.append("chat %s: current game is not the newest"
+                                % chat_id)
+
+            for game in games:
+                for player in game.players:
+                    key = (player.user.id, chat_id)
+                    if self.userchat_player.get(key) is not player:
+                        problems.append("player %s in chat %s is not indexed"
+                                        % key)
+
+        for chat_id in self.chatid_current:
+            if chat_id not in self.chatid_games:
+                problems.append("chat %s: current game without games"
+                                % chat_id)
+
+        indexed = 0
+        for user_id, players in self.userid_players.items():
+            if self.userid_current.get(user_id) not in players:
+                problems.append("user %s: current player is not listed"
+                                % user_id)
+
+            for player in players:
+                key = (user_id, player.game.chat.id)
+                if self.userchat_player.get(key) is not player:
+                    problems.append("user %s in chat %s: index mismatch" % key)
+                elif player.game not in self.chatid_games.get(key[1], ()):
+                    problems.append("user %s in chat %s: game is not running"
+                                    % key)
+                elif not player.game.has_player(player):
+                    problems.append("user %s in chat %s: player is not seated"
+                                    % key)
+                indexed += 1
+
+        if indexed != len(self.userchat_player):
+            problems.append("%d indexed players, %d listed players"
+                            % (len(self.userchat_player), indexed))
+
+        for user_id in self.userid_current:
+            if user_id not in self.userid_players:
+                problems.append("user %s: current player without players"
+                                % user_id)
+
+        return problems
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+from array import array
+
+import card as c
+
+_COLOR_INDEX = {color: index for index, color in enumerate(c.COLORS)}
+# The color index of every card code, None for special cards
+_CODE_COLORS = tuple(_COLOR_INDEX.get(card.color) for card in c.CARDS)
+
+
+class Hand(object):
+    """
+    This class represents the cards in a player's hand.
+
+    The cards are stored as an array of card codes in the order they were
+    added, next to a count vector over all distinct cards, a count per color
+    and a bit mask of the distinct cards it holds. Membership, counting and
+    color checks are O(1), adding a card is an append and removing one is a
+    memmove over a small byte array. It behaves like the list of cards it
+    replaces.
+    """
+
+    __slots__ = ('_codes', '_counts', '_colors', '_groups', 'mask')
+
+    def __init__(self, cards=()):
+        self._codes = array('B')
+        self._counts = bytearray(len(c.CARDS))
+        self._colors = bytearray(len(c.COLORS))
+        self.mask = 0
+        self._groups = ()
+        self.extend(cards)
+
+    def append(self, card):
+        """Adds a card to the hand"""
+        card = card.base
+        self._codes.append(card.code)
+        self._counts[card.code] += 1
+        self.mask |= 1 << card.code
+        self._groups = None
+        if card.color:
+            self._colors[_COLOR_INDEX[card.color]] += 1
+
+    def extend(self, cards):
+        """Adds several cards to the hand"""
+        for card in cards:
+            self.append(card)
+
+    def remove(self, card):
+        """Removes a card from the hand"""
+        card = card.base
+        if not self._counts[card.code]:
+            raise ValueError('%r is not in hand' % card)
+
+        self._codes.remove(card.code)
+        self._counts[card.code] -= 1
+        if not self._counts[card.code]:
+            self.mask &= ~(1 << card.code)
+        self._groups = None
+        if card.color:
+            self._colors[_COLOR_INDEX[card.color]] -= 1
+
+    def clear(self):
+        """Removes all cards from the hand"""
+        del self._codes[:]
+        self._counts[:] = bytes(len(c.CARDS))
+        self.mask = 0
+        self._groups = ()
+        self._colors[:] = bytes(len(c.COLORS))
+
+    def codes(self):
+        """Returns the card codes in insertion order as bytes"""
+        return self._codes.tobytes()
+
+    def extend_codes(self, codes):
+        """Adds cards by their codes, the bulk inverse of codes()"""
+        start = len(self._codes)
+        self._codes.frombytes(codes)
+
+        counts = self._counts
+        colors = self._colors
+        mask = self.mask
+        for code in self._codes[start:]:
+            counts[code] += 1
+            mask |= 1 << code
+            color = _CODE_COLORS[code]
+            if color is not None:
+                colors[color] += 1
+        self.mask = mask
+        self._groups = None
+
+    def count(self, card):
+        """Returns how many copies of a card are in the hand"""
+        return self._counts[card.code]
+
+    def has_color(self, color):
+        """Checks if there is at least one card of this color in the hand"""
+        index = _COLOR_INDEX.get(color)
+        return index is not None and self._colors[index] > 0
+
+    def groups(self):
+        """Returns the distinct cards in sorted order with their counts"""
+        if self._groups is None:
+            counts = self._counts
+            self._groups = tuple((card, counts[card.code]) for card in c.CARDS
+                                 if counts[card.code])
+        return self._groups
+
+    def sorted(self):
+        """Returns the cards in sorted order"""
+        return [card for card, count in self.groups() for _ in range(count)]
+
+    def __contains__(self, card):
+        return isinstance(card, c.Card) and self._counts[card.code] > 0
+
+    def __len__(self):
+        return len(self._codes)
+
+    def __iter__(self):
+        cards = c.CARDS
+        return (cards[code] for code in self._codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [c.CARDS[code] for code in self._codes[index]]
+        return c.CARDS[self._codes[index]]
+
+    def __repr__(self):
+        return repr(list(self))
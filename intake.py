@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Orders incoming updates before the dispatcher sees them.
+
+Telegram only takes the answer to an inline query for a short while, and a
+user typing sends one query per keystroke. The intake hands out game actions
+first, then other updates, then inline queries. It keeps only the newest
+pending query of every user and drops queries that waited too long to be
+answered in time.
+
+Inline queries keep waiting after the intake, for a thread to handle them,
+so their handler asks the intake again whether they are still current.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from queue import Empty
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+ACTION, OTHER, INLINE = range(3)
+
+
+def rank(update):
+    """Returns the rank of an update, lower ranks are handed out first"""
+    if not isinstance(update, Update):
+        # Errors the updater passes on to the dispatcher
+        return ACTION
+    if update.inline_query is not None:
+        return INLINE
+    if update.chosen_inline_result is not None or \
+            update.callback_query is not None:
+        return ACTION
+
+    message = update.message
+    if message is not None and message.text and message.text.startswith('/'):
+        return ACTION
+    return OTHER
+
+
+class Intake(object):
+    """
+    A drop-in for the update queue shared by the updater and the dispatcher.
+    Inline queries older than `max_age` seconds are dropped, if it is set.
+    """
+
+    def __init__(self, max_age=None, clock=time.monotonic):
+        self.max_age = max_age
+        self.clock = clock
+        self._ready = threading.Condition()
+        self._queues = (deque(), deque())
+        self._inline = OrderedDict()
+        # User id to the update id and arrival of the user's newest query,
+        # oldest first, see current
+        self._latest = OrderedDict()
+        self.counts = Counter()
+
+    def __len__(self):
+        with self._ready:
+            return sum(map(len, self._queues)) + len(self._inline)
+
+    def put(self, update, block=True, timeout=None):
+        """Queues an update, replacing an older inline query of its user"""
+        level = rank(update)
+
+        with self._ready:
+            if level == INLINE:
+                user_id = update.inline_query.from_user.id
+                now = self.clock()
+                if self._inline.pop(user_id, None) is not None:
+                    self.counts['superseded'] += 1
+                self._inline[user_id] = (now, update)
+                self._latest.pop(user_id, None)
+                self._latest[user_id] = (update.update_id, now)
+                self._forget(now)
+                self.counts['inline'] += 1
+            else:
+                self._queues[level].append(update)
+                self.counts['action' if level == ACTION else 'other'] += 1
+            self._ready.notify()
+
+    def get(self, block=True, timeout=None):
+        """Returns the next update, see queue.Queue.get"""
+        with self._ready:
+            if timeout is not None:
+                deadline = time.monotonic() + timeout
+
+            while True:
+                update = self._next()
+                if update is not None:
+                    return update
+                if not block:
+                    raise Empty
+
+                if timeout is None:
+                    self._ready.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Empty
+                    self._ready.wait(remaining)
+
+    def task_done(self):
+        pass
+
+    def current(self, update):
+        """
+        Tells whether an inline query is still worth answering, which is
+        when no newer query of its user arrived and it is not older than
+        max_age. Queries that are not are counted as superseded or stale.
+        """
+        with self._ready:
+            latest = self._latest.get(update.inline_query.from_user.id)
+            if latest is None:
+                # Forgotten once older than max_age, see _forget
+                current = not self.max_age
+                reason = 'stale'
+            elif latest[0] != update.update_id:
+                current = False
+                reason = 'superseded'
+            else:
+                current = not self.max_age or \
+                    self.clock() - latest[1] <= self.max_age
+                reason = 'stale'
+
+            if not current:
+                self.counts[reason] += 1
+            return current
+
+    def _forget(self, now):
+        """Forgets the newest queries of users that are stale by now"""
+        if not self.max_age:
+            return
+        while self._latest:
+            user_id, (_, queued) = next(iter(self._latest.items()))
+            if now - queued <= self.max_age:
+                break
+            del self._latest[user_id]
+
+    def _next(self):
+        for queue in self._queues:
+            if queue:
+                return queue.popleft()
+
+        now = self.clock()
+        while self._inline:
+            _, (queued, update) = self._inline.popitem(last=False)
+            if self.max_age and now - queued > self.max_age:
+                self.counts['stale'] += 1
+                logger.debug("Dropped an inline query after %.1fs",
+                             now - queued)
+                continue
+            return update
+        return None
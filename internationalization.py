@@ -19,31 +19,53 @@
 
 
 import gettext
+import logging
+import threading
+from contextlib import contextmanager
 from functools import wraps
 
 from locales import available_locales
 from pony.orm import db_session
 from user_setting import UserSetting
-from shared_vars import gm
 
 GETTEXT_DOMAIN = 'unobot'
 GETTEXT_DIR = 'locales'
 
+logger = logging.getLogger(__name__)
+
 
 class _Underscore(object):
     """Class to emulate flufl.i18n behaviour, but with plural support"""
     def __init__(self):
-        self.translators = {
-            locale: gettext.GNUTranslations(
-                open(gettext.find(
-                    GETTEXT_DOMAIN, GETTEXT_DIR, languages=[locale]
-                ), 'rb')
-            )
-            for locale
-            in available_locales.keys()
-            if locale != 'en_US'  # No translation file for en_US
-        }
-        self.locale_stack = list()
+        self.translators = dict()
+        missing = list()
+        for locale in available_locales.keys():
+            if locale == 'en_US':  # No translation file for en_US
+                continue
+
+            path = gettext.find(GETTEXT_DOMAIN, GETTEXT_DIR,
+                                languages=[locale])
+            if path is None:
+                missing.append(locale)
+                continue
+
+            with open(path, 'rb') as f:
+                self.translators[locale] = gettext.GNUTranslations(f)
+
+        # Not compiled, as in the tests, their texts stay untranslated
+        if missing:
+            logger.warning("No compiled translations for %s",
+                           ', '.join(missing))
+        self._local = threading.local()
+
+    @property
+    def locale_stack(self):
+        """Handlers run on several threads, so each one gets its own stack"""
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = list()
+            return self._local.stack
 
     def push(self, locale):
         self.locale_stack.append(locale)
@@ -118,28 +140,75 @@ def user_locale(func):
     return wrapped
 
 
+def _locales_of(game):
+    """The distinct locales of the players of a game, in seating order"""
+    locales = list()
+
+    for player in game.players:
+        us = UserSetting.get(id=player.user.id)
+
+        if us and us.lang != 'en':
+            loc = us.lang
+        else:
+            loc = 'en_US'
+
+        if loc not in locales:
+            locales.append(loc)
+
+    return locales
+
+
+@contextmanager
+def locales_of(game):
+    """Translates into the locales of a game's players within the block"""
+    with db_session:
+        locales = _locales_of(game) or ['en_US']
+
+    for loc in locales:
+        _.push(loc)
+    try:
+        yield
+    finally:
+        for loc in locales:
+            _.pop()
+
+
+def view_locales(game):
+    """The locales of a game's players, looked up when a view is published"""
+    with db_session:
+        return _locales_of(game)
+
+
+@contextmanager
+def published_locales(view):
+    """
+    Translates into the locales a view was published with, below the
+    user's locale, like game_locales does with the live game
+    """
+    user = _.pop()
+    for loc in view.locales:
+        _.push(loc)
+    _.push(user)
+    try:
+        yield
+    finally:
+        for loc in view.locales:
+            _.pop()
+        _.pop()
+        _.push(user)
+
+
 def game_locales(func):
     @wraps(func)
     @db_session
     def wrapped(update, context, *pargs, **kwargs):
+        from shared_vars import gm
         user, chat = _user_chat_from_update(update)
         player = gm.player_for_user_in_chat(user, chat)
-        locales = list()
 
         if player:
-            for player in player.game.players:
-                us = UserSetting.get(id=player.user.id)
-
-                if us and us.lang != 'en':
-                    loc = us.lang
-                else:
-                    loc = 'en_US'
-
-                if loc in locales:
-                    continue
-
+            for loc in _locales_of(player.game):
                 _.push(loc)
-                locales.append(loc)
 
         result = func(update, context, *pargs, **kwargs)
 
@@ -151,6 +220,8 @@ def game_locales(func):
 
 
 def _user_chat_from_update(update):
+    # Imported on use, as building the bot's state needs a configured token
+    from shared_vars import gm
     user = update.effective_user
     chat = update.effective_chat
 
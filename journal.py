@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Append-only journal of all state-changing actions, see replay.recover
+
+Every entry is the chat id and seed of a game followed by either an action
+of its action log, see Game.record, or one of the manager events:
+
+    ('new', chat_type, chat_title)          a game was created
+    ('user', user_id, first_name, username) the next join is this user
+    ('end',)                                the game was ended
+
+Entries are buffered and written by a background thread in groups, one
+write and fsync per group, so recording one costs a marshal and a list
+append. A crash loses at most the last commit interval.
+
+The journal is a series of numbered segment files. At every snapshot it
+rotates to a new segment, and the older ones are dropped once the
+snapshot is on disk. Recovery loads the snapshot and replays the segments
+that are left.
+"""
+
+import glob
+import logging
+import marshal
+import os
+import struct
+import threading
+
+from config import JOURNAL_COMMIT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'UNOJ'
+VERSION = 1
+
+_HEADER = struct.Struct('<4sH')
+_LENGTH = struct.Struct('<I')
+
+
+class Journal(object):
+    """
+    Call sites check `journal.enabled` before building an entry, so a
+    closed journal costs a single attribute lookup.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.enabled = False
+        self.path = None
+        self.segment = None
+
+        self._buffer = list()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._file = None
+        self._closed = threading.Event()
+        self._thread = None
+
+    def record(self, game, *entry):
+        """Appends an entry for a game to the next group commit"""
+        data = marshal.dumps((game.chat.id, game.seed) + entry)
+        with self._lock:
+            self._buffer.append(_LENGTH.pack(len(data)))
+            self._buffer.append(data)
+
+    def open(self, path):
+        """Starts a new segment after all existing ones and starts writing"""
+        segments = segments_of(path)
+        self.path = path
+        self.segment = segments[-1] + 1 if segments else 0
+        self._file = self._create(self.segment)
+
+        self._closed.clear()
+        self._thread = threading.Thread(target=self._run, name='journal',
+                                        daemon=True)
+        self._thread.start()
+        self.enabled = True
+
+    def _create(self, segment):
+        f = open(segment_path(self.path, segment), 'wb')
+        f.write(_HEADER.pack(MAGIC, VERSION))
+        return f
+
+    def _run(self):
+        while not self._closed.wait(self.interval):
+            try:
+                self.commit()
+            except OSError:
+                logger.exception("Could not write the journal")
+
+    def commit(self):
+        """Writes and syncs all buffered entries"""
+        with self._write_lock:
+            self._commit()
+
+    def _commit(self):
+        with self._lock:
+            buffer, self._buffer = self._buffer, list()
+
+        if buffer:
+            self._file.write(b''.join(buffer))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def rotate(self):
+        """
+        Commits the current segment and continues in a new one. Returns the
+        number of the finished segment.
+        """
+        with self._write_lock:
+            self._commit()
+            self._file.close()
+            self.segment += 1
+            self._file = self._create(self.segment)
+            return self.segment - 1
+
+    def drop(self, segment):
+        """Deletes all segments up to this one"""
+        for number in segments_of(self.path):
+            if number <= segment:
+                os.remove(segment_path(self.path, number))
+
+    def close(self):
+        if not self.enabled:
+            return
+
+        self.enabled = False
+        self._closed.set()
+        self._thread.join()
+
+        with self._write_lock:
+            self._commit()
+            self._file.close()
+            self._file = None
+
+
+def segment_path(path, segment):
+    return '%s.%06d' % (path, segment)
+
+
+def segments_of(path):
+    """The numbers of all segments of a journal, in order"""
+    numbers = list()
+    for name in glob.glob(glob.escape(path) + '.*'):
+        suffix = name[len(path) + 1:]
+        if suffix.isdigit():
+            numbers.append(int(suffix))
+    return sorted(numbers)
+
+
+def read(path):
+    """
+    Yields all entries of a journal in order. A torn record at the end of a
+    segment, left by a crash during a write, ends that segment.
+    """
+    for segment in segments_of(path):
+        with open(segment_path(path, segment), 'rb') as f:
+            data = f.read()
+
+        if len(data) < _HEADER.size or \
+                _HEADER.unpack_from(data) != (MAGIC, VERSION):
+            raise ValueError('Not a journal segment: %s' %
+                             segment_path(path, segment))
+
+        offset = _HEADER.size
+        while offset + _LENGTH.size <= len(data):
+            size, = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            if offset + size > len(data):
+                logger.warning("Torn record in journal segment %d", segment)
+                break
+
+            yield marshal.loads(data[offset:offset + size])
+            offset += size
+
+
+journal = Journal(JOURNAL_COMMIT_INTERVAL)
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Assembles answerInlineQuery requests from pre-encoded JSON.
+
+python-telegram-bot converts every result to a dict and encodes the list on
+each answer. Here every result is encoded once into a fragment, with the
+part of a card sticker that never changes encoded only once per sticker,
+and a request body is the fragments joined together.
+
+Posting such a body takes private parts of python-telegram-bot 13, which
+are all kept in _post. With any other version the fragments are decoded
+again and answered through Bot.answer_inline_query.
+"""
+
+import json
+
+from telegram import __version__ as ptb_version, \
+    InlineQueryResultCachedSticker as Sticker
+from telegram.utils.helpers import DefaultValue
+
+try:
+    from telegram.utils.request import Request
+except ImportError:
+    Request = None
+
+# Telegram takes at most this many results per answer
+PAGE_SIZE = 50
+
+# Whether the private parts _post takes are there
+_PRIVATE = ptb_version.split('.')[0] == '13' and \
+    hasattr(Request, '_parse') and hasattr(Request, '_request_wrapper')
+
+_sticker_prefixes = dict()
+
+
+def dumps(obj):
+    return json.dumps(obj, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def plain(obj):
+    """
+    Returns the dict of a Telegram object without unset defaults. The bot
+    sets no defaults, so they are all left out.
+    """
+    if isinstance(obj, dict):
+        return {key: plain(value) for key, value in obj.items()
+                if DefaultValue.get_value(value) is not None}
+    if isinstance(obj, list):
+        return [plain(value) for value in obj]
+    return obj
+
+
+def sticker_prefix(file_id):
+    """The start of a sticker result up to its id, encoded once per sticker"""
+    prefix = _sticker_prefixes.get(file_id)
+    if prefix is None:
+        prefix = _sticker_prefixes[file_id] = \
+            b'{"type":"sticker","sticker_file_id":' + dumps(file_id) + \
+            b',"id":'
+    return prefix
+
+
+def fragments(results):
+    """Encodes each result of a list, returns a tuple of JSON fragments"""
+    # Cards that can not be played share one message content
+    contents = dict()
+    return tuple(fragment(result, contents) for result in results)
+
+
+def fragment(result, contents=None):
+    """Encodes a single result, message contents are looked up by identity"""
+    if type(result) is not Sticker or result.reply_markup is not None:
+        return dumps(plain(result.to_dict()))
+
+    parts = [sticker_prefix(result.sticker_file_id), dumps(result.id)]
+
+    content = result.input_message_content
+    if content is not None:
+        encoded = contents.get(id(content)) if contents is not None else None
+        if encoded is None:
+            encoded = dumps(plain(content.to_dict()))
+            if contents is not None:
+                contents[id(content)] = encoded
+        parts.append(b',"input_message_content":')
+        parts.append(encoded)
+
+    parts.append(b'}')
+    return b''.join(parts)
+
+
+def page(fragments, offset):
+    """
+    Returns the page of fragments starting at the offset of an inline query,
+    and the offset of the next page, which is empty after the last one.
+    """
+    start = int(offset) if offset.isdigit() else 0
+    end = start + PAGE_SIZE
+    return fragments[start:end], str(end) if end < len(fragments) else ''
+
+
+def body(inline_query_id, fragments, **fields):
+    """
+    Returns the JSON body of an answer to an inline query. Fields that are
+    None are left out, like python-telegram-bot does.
+    """
+    fields = {key: value for key, value in fields.items() if value is not None}
+    rest = dumps(fields)[1:] if fields else b'}'
+    return b''.join((b'{"inline_query_id":', dumps(str(inline_query_id)),
+                     b',"results":[', b','.join(fragments), b']',
+                     b',' if fields else b'', rest))
+
+
+class Decoded(dict):
+    """A result decoded from its fragment, for Bot.answer_inline_query"""
+
+    def to_dict(self):
+        return self
+
+
+def can_post(bot):
+    """Whether a prepared body can be posted for this bot, see _post"""
+    return (_PRIVATE and hasattr(bot, 'base_url') and
+            isinstance(getattr(bot, 'request', None), Request))
+
+
+def _post(bot, method, data, timeout=None):
+    """Posts a prepared JSON body as is, without going through Bot._post"""
+    kwargs = dict()
+    if timeout is not None:
+        kwargs['timeout'] = timeout
+
+    return Request._parse(bot.request._request_wrapper(
+        'POST', '%s/%s' % (bot.base_url, method), body=data,
+        headers={'Content-Type': 'application/json'}, **kwargs))
+
+
+def answer_inline_query(bot, inline_query_id, fragments, timeout=None,
+                        **fields):
+    """Posts an answer built from fragments, see Bot.answer_inline_query"""
+    if not can_post(bot):
+        return bot.answer_inline_query(
+            inline_query_id,
+            [Decoded(json.loads(fragment)) for fragment in fragments],
+            timeout=timeout, **fields)
+
+    return _post(bot, 'answerInlineQuery',
+                 body(inline_query_id, fragments, **fields), timeout)
@@ -19,37 +19,88 @@
 
 
 import logging
+import weakref
 from datetime import datetime
 
-import card as c
+import rules
 from errors import DeckEmptyError
 from config import WAITING_TIME
+from hand import Hand
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Number of cards in an opening hand
+HAND_SIZE = 7
+
+
+class UserRecord(object):
+    """
+    The parts of a Telegram user a player keeps. All players of a user
+    share one record, see user_record.
+    """
+
+    __slots__ = ('id', 'first_name', 'username', '__weakref__')
+
+    def __init__(self, id, first_name, username=None):
+        self.id = id
+        self.first_name = first_name
+        self.username = username
+
+    def __repr__(self):
+        return 'UserRecord(%r, %r, %r)' % (self.id, self.first_name,
+                                           self.username)
+
+    def __str__(self):
+        return self.first_name
+
+
+_users = weakref.WeakValueDictionary()
+
+
+def user_record(user):
+    """
+    Returns the shared record of a Telegram user, or anything with its
+    fields. A changed name gets a new record for players joining from then.
+    """
+    try:
+        user_id = user.id
+    except AttributeError:
+        # Stand-ins without an id are kept as they are
+        return user
+
+    record = _users.get(user_id)
+    if record is None or record.first_name != user.first_name or \
+            record.username != user.username:
+        if not isinstance(user, UserRecord):
+            user = UserRecord(user.id, user.first_name, user.username)
+        record = _users[user_id] = user
+    return record
 
 
 class Player(object):
     """
     This class represents a player.
-    It is basically a doubly-linked ring list with the option to reverse the
-    direction. On initialization, it will connect itself to a game and its
-    other players by placing itself behind the current player.
+    On initialization, it will take a seat in a game by placing itself behind
+    the current player. The next and previous players are looked up in the
+    seats of the game, following its direction of play.
     """
 
+    __slots__ = ('_cards', 'game', 'user', 'number', 'seat', 'bluffing',
+                 'drew', 'anti_cheat', 'turn_started', 'waiting_time')
+
     def __init__(self, game, user):
-        self.cards = list()
+        self._cards = Hand()
         self.game = game
-        self.user = user
-        self.logger = logging.getLogger(__name__)
-
-        # Check if this player is the first player in this game.
-        if game.current_player:
-            self.next = game.current_player
-            self.prev = game.current_player.prev
-            game.current_player.prev.next = self
-            game.current_player.prev = self
-        else:
-            self._next = self
-            self._prev = self
-            game.current_player = self
+        self.user = user_record(user)
+
+        # Players are referred to by their join order in the action log
+        self.number = game.joined
+        game.joined += 1
+        game.record('join')
+
+        self.seat = None
+        game.add_player(self)
 
         self.bluffing = False
         self.drew = False
@@ -57,69 +108,85 @@ class Player(object):
         self.turn_started = datetime.now()
         self.waiting_time = WAITING_TIME
 
-    def draw_first_hand(self):
-        try:
-            for _ in range(7):
-                self.cards.append(self.game.deck.draw())
-        except DeckEmptyError:
-            for card in self.cards:
-                self.game.deck.dismiss(card)
+    @classmethod
+    def restore(cls, game, user, number, codes=b''):
+        """
+        Creates a player of a restored game without joining it, the game
+        seats it afterwards, see snapshot.py
+        """
+        self = cls.__new__(cls)
+        self._cards = Hand()
+        self._cards.extend_codes(codes)
+        self.game = game
+        self.user = user_record(user)
+        self.number = number
+        self.seat = None
 
-            raise
+        self.bluffing = False
+        self.drew = False
+        self.anti_cheat = 0
+        self.turn_started = datetime.now()
+        self.waiting_time = WAITING_TIME
+        return self
+
+    def draw_first_hand(self):
+        """Draws the opening hand, either completely or not at all"""
+        self.game.record('first_hand', self.number)
+        self.cards.extend(self.game.deck.draw_many(HAND_SIZE))
 
     def leave(self):
         """Removes player from the game and closes the gap in the list"""
+        self.game.record('leave', self.number)
         if self.next is self:
             return
 
-        self.next.prev = self.prev
-        self.prev.next = self.next
-        self.next = None
-        self.prev = None
+        self.game.remove_player(self)
 
         for card in self.cards:
             self.game.deck.dismiss(card)
 
-        self.cards = list()
+        self.cards.clear()
 
     def __repr__(self):
         return repr(self.user)
 
+    @property
+    def cards(self):
+        """The cards in this player's hand"""
+        return self._cards
+
+    @cards.setter
+    def cards(self, cards):
+        self._cards = Hand(cards)
+
     def __str__(self):
         return str(self.user)
 
     @property
     def next(self):
-        return self._next if not self.game.reversed else self._prev
-
-    @next.setter
-    def next(self, player):
-        if not self.game.reversed:
-            self._next = player
-        else:
-            self._prev = player
+        if self.seat is None:
+            return None
+        return self.game.next_player(self)
 
     @property
     def prev(self):
-        return self._prev if not self.game.reversed else self._next
-
-    @prev.setter
-    def prev(self, player):
-        if not self.game.reversed:
-            self._prev = player
-        else:
-            self._next = player
+        if self.seat is None:
+            return None
+        return self.game.prev_player(self)
 
     def draw(self):
         """Draws 1+ cards from the deck, depending on the draw counter"""
         _amount = self.game.draw_counter or 1
+        deck = self.game.deck
+        self.game.record('draw', self.number, _amount)
 
         try:
-            for _ in range(_amount):
-                self.cards.append(self.game.deck.draw())
+            # Draw what is left if the deck can't cover the full amount
+            drawn, short = rules.draw_amount(_amount, len(deck))
+            self.cards.extend(deck.draw_many(drawn))
 
-        except DeckEmptyError:
-            raise
+            if short:
+                raise DeckEmptyError()
 
         finally:
             self.game.draw_counter = 0
@@ -128,59 +195,31 @@ class Player(object):
     def play(self, card):
         """Plays a card and removes it from hand"""
         self.cards.remove(card)
+        self.game.record('play', self.number, card.code)
         self.game.play_card(card)
 
     def playable_cards(self):
         """Returns a list of the cards this player can play right now"""
 
-        playable = list()
         last = self.game.last_card
 
-        self.logger.debug("Last card was " + str(last))
-
         cards = self.cards
+        hand_mask = cards.mask
         if self.drew:
             cards = self.cards[-1:]
+            hand_mask = rules.mask_of(cards)
+
+        mask = rules.playable_mask(last, self.game.draw_counter) & hand_mask
+        playable = [card for card in cards if mask >> card.code & 1]
 
         # You may only play a +4 if you have no cards of the correct color
-        self.bluffing = False
-        for card in cards:
-            if self._card_playable(card):
-                self.logger.debug("Matching!")
-                playable.append(card)
+        self.bluffing = rules.bluffing(mask, last)
 
-                self.bluffing = (self.bluffing or card.color == last.color)
+        if tracer.enabled:
+            tracer.emit(self.game, 'playable', self.number, len(playable))
 
         # You may not play a chooser or +4 as your last card
         if len(self.cards) == 1 and self.cards[0].special:
             return list()
 
         return playable
-
-    def _card_playable(self, card):
-        """Check a single card if it can be played"""
-
-        is_playable = True
-        last = self.game.last_card
-        self.logger.debug("Checking card " + str(card))
-
-        if (card.color != last.color and card.value != last.value and
-                not card.special):
-            self.logger.debug("Card's color or value doesn't match")
-            is_playable = False
-        elif last.value == c.DRAW_TWO and not \
-                card.value == c.DRAW_TWO and self.game.draw_counter:
-            self.logger.debug("Player has to draw and can't counter")
-            is_playable = False
-        elif last.special == c.DRAW_FOUR and self.game.draw_counter:
-            self.logger.debug("Player has to draw and can't counter")
-            is_playable = False
-        elif (last.special == c.CHOOSE or last.special == c.DRAW_FOUR) and \
-                (card.special == c.CHOOSE or card.special == c.DRAW_FOUR):
-            self.logger.debug("Can't play colorchooser on another one")
-            is_playable = False
-        elif not last.color:
-            self.logger.debug("Last card has no color")
-            is_playable = False
-
-        return is_playable
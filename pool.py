@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+A thread pool that sizes itself to the load.
+
+Most tasks are sends to Telegram that hold a thread for up to a network
+timeout, so a fixed pool is either too large at night or too small at peak.
+"""
+
+import logging
+import threading
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool(object):
+    """
+    Runs submitted callables on between min_workers and max_workers threads.
+
+    A thread is added when a task is submitted while more than grow_backlog
+    tasks wait for a thread, or more than grow_queued updates wait in front
+    of the dispatcher, as told by the queued callable. A thread that found no
+    work for idle_timeout seconds exits, unless only min_workers are left.
+    """
+
+    def __init__(self, min_workers, max_workers, grow_backlog=4,
+                 grow_queued=32, idle_timeout=60, queued=None,
+                 name='worker'):
+        self.min_workers = min_workers
+        self.max_workers = max(min_workers, max_workers)
+        self.grow_backlog = grow_backlog
+        self.grow_queued = grow_queued
+        self.idle_timeout = idle_timeout
+        self.queued = queued
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._tasks = deque()
+        self._threads = set()
+        self._shutdown = False
+        self.workers = 0
+        self.idle = 0
+        self.counts = Counter()
+
+        with self._lock:
+            for _ in range(min_workers):
+                self._spawn()
+
+    @property
+    def backlog(self):
+        """Number of tasks no idle thread is about to pick up"""
+        return max(len(self._tasks) - self.idle, 0)
+
+    def submit(self, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) on a pool thread"""
+        queued = self.queued() if self.queued is not None else 0
+
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('Cannot submit to a pool after shutdown')
+
+            self._tasks.append((func, args, kwargs))
+            self.counts['tasks'] += 1
+
+            backlog = self.backlog
+            if self.workers < self.max_workers and \
+                    (backlog > self.grow_backlog or
+                     queued > self.grow_queued):
+                self._spawn()
+                self.counts['grown'] += 1
+                logger.info("Growing to %d workers: %d tasks waiting, "
+                            "%d updates queued", self.workers, backlog,
+                            queued)
+
+            self._ready.notify()
+
+    def _spawn(self):
+        # Called with the lock held
+        self.workers += 1
+        thread = threading.Thread(target=self._work, daemon=True,
+                                  name='%s-%d' % (self.name,
+                                                  self.counts['spawned']))
+        self.counts['spawned'] += 1
+        self._threads.add(thread)
+        thread.start()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                self.idle += 1
+                while not self._tasks and not self._shutdown:
+                    if not self._ready.wait(self.idle_timeout) and \
+                            not self._tasks and \
+                            self.workers > self.min_workers:
+                        self.idle -= 1
+                        self._exit()
+                        self.counts['shrunk'] += 1
+                        logger.info("Shrinking to %d workers after %ss "
+                                    "idle: %d tasks waiting", self.workers,
+                                    self.idle_timeout, len(self._tasks))
+                        return
+                self.idle -= 1
+
+                if not self._tasks:
+                    # Shut down and nothing left to do
+                    self._exit()
+                    return
+                func, args, kwargs = self._tasks.popleft()
+
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception("Task %r failed", func)
+
+    def _exit(self):
+        # Called with the lock held by a thread leaving the pool
+        self.workers -= 1
+        self._threads.discard(threading.current_thread())
+
+    def shutdown(self, wait=True):
+        """Runs the pending tasks, then stops all threads"""
+        with self._lock:
+            self._shutdown = True
+            self._ready.notify_all()
+            threads = list(self._threads)
+
+        if wait:
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Ends games nobody has touched for a while.
+
+Every game notes the time of its last action, see Game.record. The reaper
+keeps one entry per game in a hierarchical timing wheel, due at the time
+the game would expire if it stays idle. When an entry comes due, the game
+either expired and is reaped, or saw activity and is put back with its new
+deadline. Activity itself never touches the wheel, and a tick only costs
+the entries that come due, not the number of games.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class TimingWheel(object):
+    """
+    A hierarchical timing wheel with `levels` wheels of `slots` slots each.
+    A slot of level n spans slots ** n ticks of `resolution` seconds. Items
+    move down a level whenever the wheel below has gone round once, and
+    come out of advance() in the tick they are due in.
+    """
+
+    def __init__(self, start, resolution=1.0, slots=64, levels=4):
+        self.resolution = resolution
+        self.slots = slots
+        self.wheels = [[list() for _ in range(slots)]
+                       for _ in range(levels)]
+        self.overflow = list()
+        self.tick = int(start // resolution)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def schedule(self, item, deadline):
+        """Adds an item that comes due at the deadline, in seconds"""
+        due = -int(-deadline // self.resolution)
+        self.size += 1
+        self._insert(due, item, None)
+
+    def _insert(self, due, item, expired):
+        tick = self.tick
+        if due <= tick:
+            if expired is None:
+                # Too late already, it comes out with the next tick
+                due = tick + 1
+            else:
+                expired.append(item)
+                return
+
+        # The lowest level whose span holds both ticks
+        span = 1
+        for wheel in self.wheels:
+            if due // (span * self.slots) == tick // (span * self.slots):
+                wheel[due // span % self.slots].append((due, item))
+                return
+            span *= self.slots
+
+        self.overflow.append((due, item))
+
+    def advance(self, now):
+        """Moves the wheel up to now and returns the items that came due"""
+        target = int(now // self.resolution)
+        expired = list()
+        slots = self.slots
+
+        while self.tick < target:
+            self.tick += 1
+            tick = self.tick
+
+            # Going round at a level cascades the upper levels down
+            span = slots ** len(self.wheels)
+            if tick % span == 0 and self.overflow:
+                entries, self.overflow = self.overflow, list()
+                for due, item in entries:
+                    self._insert(due, item, expired)
+
+            for level in range(len(self.wheels) - 1, 0, -1):
+                span = slots ** level
+                if tick % span == 0:
+                    slot = self.wheels[level][tick // span % slots]
+                    entries = list(slot)
+                    del slot[:]
+                    for due, item in entries:
+                        self._insert(due, item, expired)
+
+            slot = self.wheels[0][tick % slots]
+            expired.extend(item for _, item in slot)
+            del slot[:]
+
+        self.size -= len(expired)
+        return expired
+
+
+class Reaper(object):
+    """
+    Watches games and reaps them once they were idle for longer than the
+    timeout of their state: lobbies that were never started and started
+    games. Counts the reaped games per state.
+
+    New games are watched from the chats' queues and due() runs on the job
+    queue, so the wheel is only touched with the lock held.
+    """
+
+    def __init__(self, gm, lobby_timeout, game_timeout, clock=time.monotonic):
+        self.gm = gm
+        self.lobby_timeout = lobby_timeout
+        self.game_timeout = game_timeout
+        self.clock = clock
+        self.wheel = TimingWheel(clock())
+        self.reaped = Counter()
+        self._lock = threading.Lock()
+
+    def _deadline(self, game):
+        timeout = self.game_timeout if game.started else self.lobby_timeout
+        return game.last_active + timeout
+
+    def _running(self, game):
+        return game in self.gm.chatid_games.get(game.chat.id, ())
+
+    def watch(self, game):
+        """Starts watching a game"""
+        deadline = self._deadline(game)
+        with self._lock:
+            self.wheel.schedule(game, deadline)
+
+    def due(self):
+        """
+        Returns the games that might have expired. Games that saw activity
+        since they were scheduled are put back with their new deadline,
+        ended games are dropped.
+        """
+        now = self.clock()
+        games = list()
+
+        with self._lock:
+            for game in self.wheel.advance(now):
+                if not self._running(game):
+                    continue
+
+                deadline = self._deadline(game)
+                if deadline <= now:
+                    games.append(game)
+                else:
+                    self.wheel.schedule(game, deadline)
+
+        return games
+
+    def reap(self, game):
+        """
+        Ends a game returned by due() if it still expired, which it might
+        not have in the meantime. Returns if it did.
+        """
+        if not self._running(game):
+            return False
+
+        deadline = self._deadline(game)
+        if deadline > self.clock():
+            with self._lock:
+                self.wheel.schedule(game, deadline)
+            return False
+
+        self.gm.remove_game(game)
+        self.reaped['game' if game.started else 'lobby'] += 1
+        logger.info("Reaped idle game in chat %s", game.chat.id)
+        return True
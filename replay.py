@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Replays games from their seed and recorded actions"""
+
+import logging
+from collections import namedtuple
+
+import card as c
+from errors import DeckEmptyError
+from game import ChatRecord, Game
+from player import Player
+
+logger = logging.getLogger(__name__)
+
+# Stand-in for the Telegram user of a replayed player
+ReplayUser = namedtuple('ReplayUser', 'id first_name username')
+
+
+def apply(game, action):
+    """Applies a single recorded action to a game"""
+    name, args = action[0], action[1:]
+    players = {player.number: player for player in game.players}
+
+    if name == 'join':
+        number = game.joined
+        Player(game, ReplayUser(number, 'Player %d' % number, None))
+    elif name == 'leave':
+        players[args[0]].leave()
+    elif name == 'mode':
+        game.set_mode(args[0])
+    elif name == 'start':
+        game.start()
+    elif name == 'deal':
+        game.deal()
+    elif name == 'first_hand':
+        try:
+            players[args[0]].draw_first_hand()
+        except DeckEmptyError:
+            pass
+    elif name == 'draw':
+        # The recorded amount already includes a failed bluff call
+        game.draw_counter = args[1]
+        try:
+            players[args[0]].draw()
+        except DeckEmptyError:
+            pass
+    elif name == 'play':
+        players[args[0]].play(c.CARDS[args[1]])
+    elif name == 'turn':
+        game.turn()
+    elif name == 'color':
+        game.choose_color(args[0])
+    elif name == 'won':
+        game.add_winner()
+    elif name == 'reseed':
+        game.record('reseed', args[0])
+        game.rng.seed(args[0])
+    else:
+        raise ValueError('Unknown action: %r' % (action,))
+
+
+def replay(seed, actions, chat=None):
+    """
+    Creates a game and replays all recorded actions on it. The replayed game
+    keeps its own action log.
+    """
+    game = Game(chat, seed, log=True)
+    for action in actions:
+        apply(game, action)
+    return game
+
+
+def dump(game):
+    """
+    Returns the seed and the actions of a game as plain data. The game must
+    have been created with an action log.
+    """
+    if game.actions is None:
+        raise ValueError('Game has no action log')
+    return {'seed': game.seed, 'actions': [list(a) for a in game.actions]}
+
+
+def load(data, chat=None):
+    """Replays a game from the output of dump"""
+    return replay(data['seed'], [tuple(a) for a in data['actions']], chat)
+
+
+def recover(gm, entries):
+    """
+    Replays journal entries on top of a manager restored from a snapshot,
+    see journal.py. The games it restores or creates are published and
+    handed to the manager's hooks once all entries are applied, see
+    GameManager.hold. Returns the number of entries applied.
+
+    The journal rotates before a snapshot serializes the games, so the
+    entries of a game up to its reseed with the stream seed it was restored
+    from are in the snapshot already and skipped.
+    """
+    entries = list(entries)
+    with gm.hold():
+        return _recover(gm, gm.deferred, entries)
+
+
+def _recover(gm, deferred, entries):
+    games = dict()
+    users = dict()
+    reseeds = {(entry[:2], entry[3]) for entry in entries
+               if entry[2] == 'reseed'}
+    ended = {entry[:2] for entry in entries if entry[2] == 'end'}
+    # The stream seed each game of the snapshot skips to, None once it did
+    skipping = dict()
+
+    def find(key):
+        # Looks up only the chats in the journal, which keeps the others
+        # deferred, see GameManager.defer
+        if key not in games:
+            games[key] = next((game for game in gm.chatid_games.get(key[0], ())
+                               if game.seed == key[1]), None)
+        return games[key]
+
+    applied = 0
+
+    for entry in entries:
+        key, name, args = entry[:2], entry[2], entry[3:]
+
+        # Decided without restoring the game, as most games of the snapshot
+        # only have their reseed in the journal
+        if key not in skipping:
+            seed = deferred.seed(key) if deferred is not None else None
+            skipping[key] = seed if (key, seed) in reseeds else None
+        if skipping[key] is not None:
+            if name == 'reseed' and args[0] == skipping[key]:
+                skipping[key] = None
+            continue
+
+        if name == 'new':
+            chat = ChatRecord(key[0], *args[:2])
+            starter = ReplayUser(*args[2:]) if len(args) > 2 else None
+            games[key] = gm.new_game(chat, key[1], starter)
+            applied += 1
+            continue
+
+        game = find(key)
+        if game is None:
+            # Ended before the snapshot serialized its chat
+            if key not in ended:
+                logger.warning("Journal entry for an unknown game: %r",
+                               entry)
+            continue
+
+        if name == 'user':
+            users[key] = ReplayUser(*args)
+        elif name == 'end':
+            gm.remove_game(game)
+            games[key] = None
+        elif name == 'join':
+            gm.index_player(Player(game, users.pop(key)))
+        elif name == 'leave':
+            player = next(player for player in game.players
+                          if player.number == args[0])
+            apply(game, entry[2:])
+            if not game.has_player(player):
+                gm.forget_player(player)
+        else:
+            apply(game, entry[2:])
+        applied += 1
+
+    return applied
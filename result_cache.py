@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Caches the inline results of every user.
+
+A user sends an inline query for each keystroke, but the results only
+change with the game. They are kept with the stamp they were built for, the
+game's published view and the user's locales, and built again once the stamp
+changes, see views.py.
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+
+
+class ResultCache(object):
+    """Holds the latest results of up to `size` users"""
+
+    def __init__(self, size=10000):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.counts = Counter()
+        self.build_time = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, key, stamp, build, *args):
+        """
+        Returns the results cached for key if they were built for stamp,
+        otherwise calls build(*args) and caches what it returns.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                self.counts['hit'] += 1
+                return entry[1]
+
+        start = time.perf_counter()
+        results = build(*args)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.counts['miss'] += 1
+            self.build_time += elapsed
+            self._entries[key] = (stamp, results)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return results
+
+    def hit_rate(self):
+        lookups = self.counts['hit'] + self.counts['miss']
+        return self.counts['hit'] / lookups if lookups else 0.0
+
+    def mean_build_time(self):
+        misses = self.counts['miss']
+        return self.build_time / misses if misses else 0.0
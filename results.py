@@ -18,144 +18,257 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 
-"""Defines helper functions to build the inline result list"""
+"""
+Defines helper functions to build the inline result list.
 
-from uuid import uuid4
+Results and message contents that only depend on the locales are built on
+first use and shared by all queries from then on, so they must never be
+changed. Results a player acts with carry the player's anti cheat counter in
+their id, as '<name>:<counter>'.
+"""
+
+import threading
 
 from telegram import InlineQueryResultArticle, InputTextMessageContent, \
     InlineQueryResultCachedSticker as Sticker
 
 import card as c
-from utils import display_color, display_color_group, display_name
+import payload
+from utils import display_color, display_color_group, display_name, \
+    user_is_creator
 from internationalization import _, __
 
+_prebuilt = dict()
+_prebuilt_lock = threading.Lock()
 
-def add_choose_color(results, game):
-    """Add choose color options"""
-    for color in c.COLORS:
-        results.append(
-            InlineQueryResultArticle(
-                id=color,
-                title=_("选择颜色"),
-                description=display_color(color),
-                input_message_content=
-                InputTextMessageContent(display_color_group(color, game))
-            )
-        )
 
+def prebuilt(build, *args):
+    """Returns build(*args) for the current locales, built only once"""
+    key = (build, tuple(_.locale_stack)) + args
+    result = _prebuilt.get(key)
+    if result is None:
+        with _prebuilt_lock:
+            result = _prebuilt.setdefault(key, build(*args))
+    return result
 
-def add_other_cards(player, results, game):
-    """Add hand cards when choosing colors"""
 
-    results.append(
-        InlineQueryResultArticle(
-            "hand",
-            title=_("手牌 (点击查看游戏状况)：",
-                    "手牌 (点击查看游戏状况)：",
-                    len(player.cards)),
-            description=', '.join([repr(card) for card in player.cards]),
-            input_message_content=game_info(game)
-        )
-    )
+def result_id(name, player):
+    """The id of a result the player acts with"""
+    return '%s:%d' % (name, player.anti_cheat)
 
 
-def player_list(game):
-    """Generate list of player strings"""
-    return [_("{name} ({number} 张牌)",
-              "{name} ({number} 张牌)",
-              len(player.cards))
-            .format(name=player.user.first_name, number=len(player.cards))
-            for player in game.players]
+def parse_result_id(result_id):
+    """
+    Splits the id of a chosen result into its name and the anti cheat
+    counter, which is empty for results without one
+    """
+    return tuple(result_id.partition(':')[::2])
+
+
+def build_results(user, game, player):
+    """Builds the result list of a player from a view of the game"""
+    results = list()
+    user_id = user.id
+
+    # The game has not started.
+    # The creator may change the game mode, other users just get a "game has not started" message.
+    if not game.started:
+        if user_is_creator(user, game):
+            add_mode_classic(results)
+            add_mode_fast(results)
+            add_mode_wild(results)
+            add_mode_text(results)
+        else:
+            add_not_started(results)
+
+
+    elif user_id == game.current_player.user.id:
+        if game.choosing_color:
+            add_choose_color(player, results)
+            add_other_cards(player, results, game)
+        else:
+            if not player.drew:
+                add_draw(player, results)
+
+            else:
+                add_pass(player, results)
+
+            if game.last_card.special == c.DRAW_FOUR and game.draw_counter:
+                add_call_bluff(player, results)
+
+            playable = set(player.playable)
+
+            # Duplicates are not allowed, only one copy can be played
+            for card, count in player.groups:
+                add_card(player, card, results, can_play=card in playable)
+                for i in range(count - 1):
+                    add_card(player, card, results, can_play=False)
+
+            add_gameinfo(game, results)
+
+    elif user_id != game.current_player.user.id or not game.started:
+        for card, count in player.groups:
+            for i in range(count):
+                add_card(player, card, results, can_play=False)
+
+    else:
+        add_gameinfo(game, results)
+
+    if len(results) > payload.PAGE_SIZE:
+        # Options and playable cards go first, greyed-out cards are paged
+        results.sort(key=lambda result: result.id.startswith('~'))
+
+    return results
 
 
 def add_no_game(results):
     """Add text result if user is not playing"""
-    results.append(
-        InlineQueryResultArticle(
-            "nogame",
-            title=_("您并不在游戏中"),
-            input_message_content=
-            InputTextMessageContent(_('您并不在游戏中。请使用 /new 创建一个新游戏，或者使用 /join 加入一个现有的游戏'))
-        )
+    results.append(prebuilt(_no_game))
+
+
+def _no_game():
+    return InlineQueryResultArticle(
+        "nogame",
+        title=_("您并不在游戏中"),
+        input_message_content=
+        InputTextMessageContent(_('您并不在游戏中。请使用 /new 创建一个新游戏，或者使用 /join 加入一个现有的游戏'))
     )
 
 
 def add_not_started(results):
     """Add text result if the game has not yet started"""
-    results.append(
-        InlineQueryResultArticle(
-            "nogame",
-            title=_("游戏还没有开始"),
-            input_message_content=
-            InputTextMessageContent(_('请先使用 /start 开始游戏'))
-        )
+    results.append(prebuilt(_not_started))
+
+
+def _not_started():
+    return InlineQueryResultArticle(
+        "nogame",
+        title=_("游戏还没有开始"),
+        input_message_content=
+        InputTextMessageContent(_('请先使用 /start 开始游戏'))
     )
 
 
 def add_mode_classic(results):
     """Change mode to classic"""
-    results.append(
-        InlineQueryResultArticle(
-            "mode_classic",
-            title=_("🎻 经典模式"),
-            input_message_content=
-            InputTextMessageContent(_('经典 🎻'))
-        )
+    results.append(prebuilt(_mode_classic))
+
+
+def _mode_classic():
+    return InlineQueryResultArticle(
+        "mode_classic",
+        title=_("🎻 经典模式"),
+        input_message_content=
+        InputTextMessageContent(_('经典 🎻'))
     )
 
 
 def add_mode_fast(results):
     """Change mode to classic"""
-    results.append(
-        InlineQueryResultArticle(
-            "mode_fast",
-            title=_("🚀 Sanic 模式"),
-            input_message_content=
-            InputTextMessageContent(_('搞快点！ 🚀\"'))
-        )
+    results.append(prebuilt(_mode_fast))
+
+
+def _mode_fast():
+    return InlineQueryResultArticle(
+        "mode_fast",
+        title=_("🚀 Sanic 模式"),
+        input_message_content=
+        InputTextMessageContent(_('搞快点！ 🚀\"'))
     )
 
 
 def add_mode_wild(results):
     """Change mode to classic"""
-    results.append(
-        InlineQueryResultArticle(
-            "mode_wild",
-            title=_("🐉 野性模式"),
-            input_message_content=
-            InputTextMessageContent(_('进入旷野~ 🐉'))
-        )
+    results.append(prebuilt(_mode_wild))
+
+
+def _mode_wild():
+    return InlineQueryResultArticle(
+        "mode_wild",
+        title=_("🐉 野性模式"),
+        input_message_content=
+        InputTextMessageContent(_('进入旷野~ 🐉'))
     )
 
 
 def add_mode_text(results):
     """Change mode to text"""
+    results.append(prebuilt(_mode_text))
+
+
+def _mode_text():
+    return InlineQueryResultArticle(
+        "mode_text",
+        title=_("✍️ Text mode"),
+        input_message_content=
+        InputTextMessageContent(_('Text ✍️'))
+    )
+
+
+def add_choose_color(player, results):
+    """Add choose color options"""
+    translate = player.game.translate
+    for color in c.COLORS:
+        results.append(
+            InlineQueryResultArticle(
+                id=result_id(color, player),
+                title=_("选择颜色"),
+                description=display_color(color),
+                input_message_content=
+                prebuilt(_color_content, color, translate)
+            )
+        )
+
+
+def _color_content(color, translate):
+    return InputTextMessageContent(
+        display_color_group(color, translate))
+
+
+def add_other_cards(player, results, game):
+    """Add hand cards when choosing colors"""
+
     results.append(
         InlineQueryResultArticle(
-            "mode_text",
-            title=_("✍️ Text mode"),
-            input_message_content=
-            InputTextMessageContent(_('Text ✍️'))
+            "hand",
+            title=_("手牌 (点击查看游戏状况)：",
+                    "手牌 (点击查看游戏状况)：",
+                    len(player.cards)),
+            description=', '.join([repr(card) for card in player.cards]),
+            input_message_content=game_info(game)
         )
     )
-    
-    
+
+
+def player_list(game):
+    """Generate list of player strings"""
+    return [_("{name} ({number} 张牌)",
+              "{name} ({number} 张牌)",
+              len(player.cards))
+            .format(name=player.user.first_name, number=len(player.cards))
+            for player in game.players]
+
+
 def add_draw(player, results):
     """Add option to draw"""
     n = player.game.draw_counter or 1
 
     results.append(
         Sticker(
-            "draw", sticker_file_id=c.STICKERS['option_draw'],
+            result_id("draw", player), sticker_file_id=c.STICKERS['option_draw'],
             input_message_content=
-            InputTextMessageContent(__('抽取 {number} 张牌',
-                                       '抽取 {number} 张牌', n,
-                                       multi=player.game.translate)
-                                    .format(number=n))
+            prebuilt(_draw_content, n, player.game.translate)
         )
     )
 
 
+def _draw_content(n, translate):
+    return InputTextMessageContent(__('抽取 {number} 张牌',
+                                      '抽取 {number} 张牌', n,
+                                      multi=translate)
+                                   .format(number=n))
+
+
 def add_gameinfo(game, results):
     """Add option to show game info"""
 
@@ -168,51 +281,75 @@ def add_gameinfo(game, results):
     )
 
 
-def add_pass(results, game):
+def add_pass(player, results):
     """Add option to pass"""
     results.append(
         Sticker(
-            "pass", sticker_file_id=c.STICKERS['option_pass'],
-            input_message_content=InputTextMessageContent(
-                __('过牌', multi=game.translate)
-            )
+            result_id("pass", player), sticker_file_id=c.STICKERS['option_pass'],
+            input_message_content=
+            prebuilt(_pass_content, player.game.translate)
         )
     )
 
 
-def add_call_bluff(results, game):
+def _pass_content(translate):
+    return InputTextMessageContent(__('过牌', multi=translate))
+
+
+def add_call_bluff(player, results):
     """Add option to call a bluff"""
     results.append(
         Sticker(
-            "call_bluff",
+            result_id("call_bluff", player),
             sticker_file_id=c.STICKERS['option_bluff'],
             input_message_content=
-            InputTextMessageContent(__("我要质疑你！",
-                                       multi=game.translate))
+            prebuilt(_call_bluff_content, player.game.translate)
         )
     )
 
 
-def add_card(game, card, results, can_play):
-    """Add an option that represents a card"""
+def _call_bluff_content(translate):
+    return InputTextMessageContent(__("我要质疑你！", multi=translate))
+
+
+def add_card(player, card, results, can_play):
+    """
+    Add an option that represents a card. Cards that can not be played are
+    numbered by their place in the results, as '~<place>:<counter>'.
+    """
+    game = player.game
 
     if can_play:
         if game.mode != "text":
             results.append(
-                Sticker(str(card), sticker_file_id=c.STICKERS[str(card)])
+                Sticker(result_id(card, player), sticker_file_id=card.sticker)
         )
         if game.mode == "text":
             results.append(
-                Sticker(str(card), sticker_file_id=c.STICKERS[str(card)], input_message_content=InputTextMessageContent("Card Played: {card}".format(card=repr(card).replace('Draw Four', '+4').replace('Draw', '+2').replace('Colorchooser', 'Color Chooser')))
+                Sticker(result_id(card, player), sticker_file_id=card.sticker, input_message_content=prebuilt(_card_text, card)
         ))
     else:
         results.append(
-            Sticker(str(uuid4()), sticker_file_id=c.STICKERS_GREY[str(card)],
+            Sticker(result_id('~%d' % len(results), player),
+                    sticker_file_id=card.sticker_grey,
                     input_message_content=game_info(game))
         )
 
 
+def _card_text(card):
+    return InputTextMessageContent("Card Played: {card}".format(card=repr(card).replace('Draw Four', '+4').replace('Draw', '+2').replace('Colorchooser', 'Color Chooser')))
+
+
 def game_info(game):
+    """The game info message of a view, rendered once per locales"""
+    locales = tuple(_.locale_stack)
+    content = game.info.get(locales)
+    if content is None:
+        content = game.info[locales] = render_game_info(game)
+    return content
+
+
+def render_game_info(game):
     players = player_list(game)
     return InputTextMessageContent(
         _("轮到： {name}")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Precomputed lookup tables for the UNO rules, and the rule steps Game, Player
+and the simulation engine all apply, see engine.py
+"""
+
+from collections import namedtuple
+
+import card as c
+
+# Color index used for the table keys, None is an uncolored special card
+_COLOR_INDEX = {None: 0, c.RED: 1, c.BLUE: 2, c.GREEN: 3, c.YELLOW: 4}
+
+# Bit masks over card codes of all cards with a given color
+COLOR_MASKS = {color: sum(1 << card.code for card in c.CARDS
+                          if card.color == color)
+               for color in c.COLORS}
+
+SPECIAL_MASK = sum(1 << card.code for card in c.CARDS if card.special)
+
+
+def _card_playable(card, last, draw_pending):
+    """Check a single card if it can be played on the last card"""
+    if (card.color != last.color and card.value != last.value and
+            not card.special):
+        # Card's color or value doesn't match
+        return False
+    elif last.value == c.DRAW_TWO and card.value != c.DRAW_TWO and \
+            draw_pending:
+        # Player has to draw and can't counter
+        return False
+    elif last.special == c.DRAW_FOUR and draw_pending:
+        # Player has to draw and can't counter
+        return False
+    elif last.special and card.special:
+        # Can't play colorchooser on another one
+        return False
+    elif not last.color:
+        # Last card has no color
+        return False
+    return True
+
+
+def _table_index(last, draw_pending):
+    return (last.code * len(_COLOR_INDEX) + _COLOR_INDEX[last.color]) * 2 + \
+        bool(draw_pending)
+
+
+def _build_table():
+    table = [0] * (len(c.CARDS) * len(_COLOR_INDEX) * 2)
+
+    for base in c.CARDS:
+        if base.special:
+            lasts = [base] + [base.with_color(color) for color in c.COLORS]
+        else:
+            lasts = [base]
+
+        for last in lasts:
+            for draw_pending in (False, True):
+                table[_table_index(last, draw_pending)] = sum(
+                    1 << card.code for card in c.CARDS
+                    if _card_playable(card, last, draw_pending))
+
+    return tuple(table)
+
+
+# Bit mask of playable cards per (last card, chosen color, draw pending)
+PLAYABLE = _build_table()
+
+
+def playable_mask(last, draw_counter):
+    """Returns the bit mask of the cards that can be played on a card"""
+    return PLAYABLE[_table_index(last, draw_counter)]
+
+
+def mask_of(cards):
+    """Returns the bit mask of a collection of cards"""
+    mask = 0
+    for card in cards:
+        mask |= 1 << card.code
+    return mask
+
+
+Effect = namedtuple('Effect', 'draw reverse turns choose')
+Effect.__doc__ = """
+What playing a card does, in this order: draw is added to the draw counter,
+the direction is reversed if reverse is set, the turn passes turns times and
+the player has to choose a color if choose is set.
+"""
+
+
+def _effect(card, two_players):
+    if card.special == c.DRAW_FOUR:
+        return Effect(4, False, 0, True)
+    if card.special == c.CHOOSE:
+        return Effect(0, False, 0, True)
+    if card.value == c.SKIP:
+        return Effect(0, False, 2, False)
+    if card.value == c.DRAW_TWO:
+        return Effect(2, False, 1, False)
+    if card.value == c.REVERSE:
+        # Special rule for two players
+        if two_players:
+            return Effect(0, False, 2, False)
+        return Effect(0, True, 1, False)
+    return Effect(0, False, 1, False)
+
+
+# The effect of each card code, for more than two players and for two
+EFFECTS = tuple((_effect(card, False), _effect(card, True))
+                for card in c.CARDS)
+
+
+def effect(card, players):
+    """Returns the Effect of playing a card in a game of this many players"""
+    return EFFECTS[card.code][players <= 2]
+
+
+def draw_amount(draw_counter, available):
+    """
+    Returns how many cards a player draws with this draw counter when this
+    many are left, and whether that falls short of the full amount
+    """
+    amount = draw_counter or 1
+    return min(amount, available), available < amount
+
+
+def bluffing(mask, last):
+    """
+    Whether a +4 played now is a bluff: the playable cards, as a mask, hold
+    one of the last card's color
+    """
+    return bool(mask & COLOR_MASKS.get(last.color, 0))
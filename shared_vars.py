@@ -18,17 +18,34 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 
-from config import TOKEN, WORKERS
+from config import TOKEN, WORKERS, REAP_LOBBY_TIMEOUT, REAP_GAME_TIMEOUT, \
+    INLINE_QUERY_MAX_AGE, MIN_WORKERS, WORKER_GROW_BACKLOG, \
+    WORKER_GROW_QUEUED, WORKER_IDLE_TIMEOUT, RESULT_CACHE_SIZE
 import logging
 import os
 from telegram.ext import Updater
 
 from game_manager import GameManager
 from database import db
+from executor import ChatExecutor
+from intake import Intake
+from pool import WorkerPool
+from reaper import Reaper
+from result_cache import ResultCache
 
 db.bind('sqlite', os.getenv('UNO_DB', 'uno.sqlite3'), create_db=True)
 db.generate_mapping(create_tables=True)
 
 gm = GameManager()
-updater = Updater(token=TOKEN, workers=WORKERS, use_context=True)
+reaper = Reaper(gm, REAP_LOBBY_TIMEOUT, REAP_GAME_TIMEOUT)
+# Handlers run on the pool below, not asynchronously on the dispatcher's
+# threads, so it only needs the one PTB asks for
+updater = Updater(token=TOKEN, workers=1, use_context=True)
 dispatcher = updater.dispatcher
+# Updates reach the dispatcher ordered by the intake, see intake.py
+intake = Intake(INLINE_QUERY_MAX_AGE)
+updater.update_queue = dispatcher.update_queue = intake
+pool = WorkerPool(MIN_WORKERS, WORKERS, WORKER_GROW_BACKLOG,
+                  WORKER_GROW_QUEUED, WORKER_IDLE_TIMEOUT, queued=intake.__len__)
+executor = ChatExecutor(pool=pool)
+result_cache = ResultCache(RESULT_CACHE_SIZE)
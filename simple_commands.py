@@ -20,9 +20,12 @@
 from telegram import ParseMode, Update
 from telegram.ext import CommandHandler, CallbackContext
 
+from config import ADMIN_LIST
+from tracing import tracer, format_events
 from user_setting import UserSetting
 from utils import send_async
-from shared_vars import dispatcher
+from shared_vars import dispatcher, executor, intake, pool, reaper, \
+    result_cache
 from internationalization import _, user_locale
 
 @user_locale
@@ -129,9 +132,79 @@ def stats(update: Update, context: CallbackContext):
                    text='\n'.join(stats_text))
 
 
+def trace(update: Update, context: CallbackContext):
+    """Handler for the /trace command, dumps the engine trace of this chat"""
+    if update.message.from_user.id not in (ADMIN_LIST or ()):
+        return
+
+    if not tracer.enabled:
+        send_async(context.bot, update.message.chat_id,
+                   text="Tracing is disabled")
+        return
+
+    events = tracer.dump(update.message.chat_id)[-50:]
+    send_async(context.bot, update.message.chat_id,
+               text='<pre>%s</pre>' % (format_events(events) or 'No events'),
+               parse_mode=ParseMode.HTML)
+
+
+def queues(update: Update, context: CallbackContext):
+    """Handler for the /queues command, shows the deepest chat queues"""
+    if update.message.from_user.id not in (ADMIN_LIST or ()):
+        return
+
+    depths = sorted(executor.depths().items(), key=lambda item: -item[1])
+    lines = ['Workers: %d (%d idle), %d tasks waiting' %
+             (pool.workers, pool.idle, pool.backlog)]
+    lines += ['%s: %d' % item for item in depths[:20]]
+    send_async(context.bot, update.message.chat_id, text='\n'.join(lines))
+
+
+def reaped(update: Update, context: CallbackContext):
+    """Handler for the /reaped command, shows the idle game reaper's counters"""
+    if update.message.from_user.id not in (ADMIN_LIST or ()):
+        return
+
+    send_async(context.bot, update.message.chat_id,
+               text='Watched: %d\nReaped lobbies: %d\nReaped games: %d' %
+               (len(reaper.wheel), reaper.reaped['lobby'],
+                reaper.reaped['game']))
+
+
+def intake_stats(update: Update, context: CallbackContext):
+    """Handler for the /intake command, shows the update intake's counters"""
+    if update.message.from_user.id not in (ADMIN_LIST or ()):
+        return
+
+    counts = intake.counts
+    send_async(context.bot, update.message.chat_id,
+               text='Pending: %d\nActions: %d\nOther: %d\n'
+                    'Inline queries: %d\nSuperseded: %d\nStale: %d' %
+               (len(intake), counts['action'], counts['other'],
+                counts['inline'], counts['superseded'], counts['stale']))
+
+
+def cache_stats(update: Update, context: CallbackContext):
+    """Handler for the /cache command, shows the inline result cache's counters"""
+    if update.message.from_user.id not in (ADMIN_LIST or ()):
+        return
+
+    send_async(context.bot, update.message.chat_id,
+               text='Users: %d\nHits: %d\nMisses: %d\nHit rate: %.1f%%\n'
+                    'Mean build time: %.2fms' %
+               (len(result_cache), result_cache.counts['hit'],
+                result_cache.counts['miss'], 100 * result_cache.hit_rate(),
+                1000 * result_cache.mean_build_time()))
+
+
 def register():
     dispatcher.add_handler(CommandHandler('help', help_handler))
     dispatcher.add_handler(CommandHandler('source', source))
     dispatcher.add_handler(CommandHandler('news', news))
     dispatcher.add_handler(CommandHandler('stats', stats))
     dispatcher.add_handler(CommandHandler('modes', modes))
+    dispatcher.add_handler(CommandHandler('trace', trace))
+    dispatcher.add_handler(CommandHandler('queues', queues))
+    dispatcher.add_handler(CommandHandler('reaped', reaped))
+    dispatcher.add_handler(CommandHandler('intake', intake_stats))
+    dispatcher.add_handler(CommandHandler('cache', cache_stats))
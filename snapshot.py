@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Compact binary snapshots of all live games in a GameManager.
+
+The file is a header, a table of users, a table of chats, the /notify_me
+reminders and the games in chat order. Cards are stored as their codes, one
+byte each, and players refer to users by their id, so the games of a chat
+are serialized on their own, on the chat's queue, and the games of a chat
+that is still deferred are copied from the older snapshot. All integers are
+little endian.
+
+Restoring only reads the tables. The games of a chat are built when the
+chat or one of its users is first looked up, see GameManager.defer, so the
+bot answers right after a restart however many games there are.
+
+The random stream of a game is too large to store, so every game is
+reseeded when it is snapshotted and only the new 64 bit seed is written,
+see Game.reseed. The game keeps its original seed, which identifies it in
+the journal, and recovery skips its entries up to the reseed, see
+replay.recover. The action log is not stored; replays of a restored game
+start at the snapshot.
+"""
+
+import gc
+import logging
+import os
+import struct
+from array import array
+
+import card as c
+import replay
+from game import ChatRecord, Game
+from journal import read as read_journal
+from player import Player, UserRecord
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'UNOS'
+VERSION = 4
+
+# magic, version, users, chats of all users, chats, reminder chats
+_HEADER = struct.Struct('<4sHIIII')
+# length of first name, followed by the first name and the username
+_NAME = struct.Struct('<H')
+# chat id, game seed, stream seed, flags, draw counter, players won, joined,
+# current seat, last card code, last card color, seats, pile, graveyard,
+# owners, starter id, length of chat type, chat title and mode
+_GAME = struct.Struct('<qQQBHHHHBBHHHHqHHH')
+# user id, number, anti cheat, waiting time, flags, hand size
+_PLAYER = struct.Struct('<qHHiBB')
+# chat id, users
+_REMINDER = struct.Struct('<qI')
+
+_STARTED = 1
+_OPEN = 2
+_TRANSLATE = 4
+_CHOOSING_COLOR = 8
+_REVERSED = 16
+_STARTER = 32
+
+_BLUFFING = 1
+_DREW = 2
+_CURRENT = 4
+
+_NO_CARD = 255
+
+
+def _encode(text):
+    return (text or '').encode('utf-8')
+
+
+def _ints(typecode, data, offset, count):
+    """Reads count integers of an array type code at offset"""
+    ints = array(typecode)
+    ints.frombytes(data[offset:offset + ints.itemsize * count])
+    return ints
+
+
+def _int64s(view):
+    ints = array('q')
+    ints.frombytes(view)
+    return ints
+
+
+def dump_chat(gm, chat_id):
+    """
+    Serializes the games of a chat, reseeding each of them. Returns the
+    record, the number of games, the users it refers to by id and the ids
+    of those playing.
+    """
+    records = list()
+    users = dict()
+    players_of = list()
+    # Doesn't restore the deferred games of other chats of the users
+    current = dict.get
+    games = list(dict.get(gm.chatid_games, chat_id, ()))
+
+    for game in games:
+        seed = game.reseed()
+        players = game._seats
+        last = game.last_card
+
+        flags = ((game.started and _STARTED) | (game.open and _OPEN) |
+                 (game.translate and _TRANSLATE) |
+                 (game.choosing_color and _CHOOSING_COLOR) |
+                 (game.reversed and _REVERSED) |
+                 (game.starter is not None and _STARTER))
+
+        chat_type = _encode(game.chat.type)
+        title = _encode(game.chat.title)
+        mode = _encode(game.mode)
+        owners = game.owner or ()
+        starter = 0
+        if game.starter is not None:
+            starter = game.starter.id
+            users[starter] = game.starter
+
+        records.append(_GAME.pack(
+            chat_id, game.seed, seed, flags, game.draw_counter,
+            game.players_won, game.joined, game._current,
+            last.code if last else _NO_CARD,
+            c.COLORS.index(last.color)
+            if last and last.special and last.color else _NO_CARD,
+            len(players), len(game.deck.codes), len(game.deck.graveyard),
+            len(owners), starter, len(chat_type), len(title), len(mode)))
+        records.append(chat_type)
+        records.append(title)
+        records.append(mode)
+        records.append(game.deck.codes.tobytes())
+        records.append(game.deck.graveyard.tobytes())
+        records.append(array('q', owners).tobytes())
+
+        for player in players:
+            user = player.user
+            users[user.id] = user
+            players_of.append(user.id)
+            codes = player.cards.codes()
+            flags = ((player.bluffing and _BLUFFING) |
+                     (player.drew and _DREW) |
+                     (current(gm.userid_current, user.id) is player and
+                      _CURRENT))
+            records.append(_PLAYER.pack(
+                user.id, player.number, player.anti_cheat,
+                player.waiting_time, flags, len(codes)))
+            records.append(codes)
+
+    return b''.join(records), len(games), users, players_of
+
+
+def dumps(gm, submit=None):
+    """
+    Serializes all games of the manager. The games of each chat are dumped
+    by submit(chat_id, dump_chat, gm, chat_id), which returns a Future,
+    like ChatExecutor.call does for the chat's queue, or right away without
+    it. The games that are still deferred are copied as they are.
+    """
+    chat_ids, deferred, deferred_chats = gm.chats()
+    users = dict()
+    user_chats = dict()
+    written = array('q')
+    chat_offsets = array('Q')
+    chat_games = array('I')
+    game_records = list()
+    size = 0
+
+    def add(chat_id, record, count, players):
+        nonlocal size
+        written.append(chat_id)
+        chat_offsets.append(size)
+        chat_games.append(count)
+        game_records.append(record)
+        size += len(record)
+        for user_id in players:
+            chats = user_chats.setdefault(user_id, list())
+            if not chats or chats[-1] != chat_id:
+                chats.append(chat_id)
+
+    if submit is None:
+        dumped = [dump_chat(gm, chat_id) for chat_id in chat_ids]
+    else:
+        dumped = [future.result() for future in
+                  [submit(chat_id, dump_chat, gm, chat_id)
+                   for chat_id in chat_ids]]
+
+    for chat_id, dump in zip(chat_ids, dumped):
+        record, count, chat_users, players = dump
+        # The games may have ended since the chat was listed
+        if count:
+            users.update(chat_users)
+            add(chat_id, record, count, players)
+
+    if deferred_chats:
+        # Copies every user of the older snapshot, as the starters of its
+        # games are only known by parsing them
+        players = dict()
+        for index, user_id in enumerate(deferred.user_ids):
+            if user_id not in users:
+                users[user_id] = deferred.user(index)
+            for chat_id in deferred.chats_of(user_id):
+                if chat_id in deferred_chats:
+                    players.setdefault(chat_id, list()).append(user_id)
+
+        for chat_id, (start, end, count) in deferred_chats.items():
+            add(chat_id, deferred.data[start:end], count,
+                players.get(chat_id, ()))
+
+    user_ids = array('q', users)
+    chats_of_users = array('q')
+    chat_bounds = array('I', [0])
+    names = list()
+    name_bounds = array('I', [0])
+    for user_id, user in users.items():
+        chats_of_users.extend(user_chats.get(user_id, ()))
+        chat_bounds.append(len(chats_of_users))
+        first_name = _encode(user.first_name)
+        username = _encode(user.username)
+        names.append(_NAME.pack(len(first_name)) + first_name + username)
+        name_bounds.append(name_bounds[-1] + len(names[-1]))
+
+    reminder_records = list()
+    reminders = list(gm.remind_dict.items())
+    for chat_id, reminded in reminders:
+        reminded = list(reminded)
+        reminder_records.append(_REMINDER.pack(chat_id, len(reminded)))
+        reminder_records.append(array('q', reminded).tobytes())
+
+    header = _HEADER.pack(MAGIC, VERSION, len(users), len(chats_of_users),
+                          len(written), len(reminders))
+    return b''.join([header, user_ids.tobytes(), chat_bounds.tobytes(),
+                     chats_of_users.tobytes(), name_bounds.tobytes()] +
+                    names +
+                    [written.tobytes(), chat_offsets.tobytes(),
+                     chat_games.tobytes()] +
+                    reminder_records + game_records)
+
+
+class Deferred(object):
+    """
+    The games of a snapshot that are not restored yet, by chat. A
+    GameManager restores them on first use, see GameManager.defer.
+    """
+
+    def __init__(self, data):
+        magic, version, user_count, chat_total, chat_count, reminder_count = \
+            _HEADER.unpack_from(data)
+
+        if magic != MAGIC:
+            raise ValueError('Not a snapshot')
+        if version != VERSION:
+            raise ValueError('Unsupported snapshot version %d' % version)
+
+        offset = _HEADER.size
+        self.data = data
+        self.user_ids = _ints('q', data, offset, user_count)
+        offset += 8 * user_count
+        self.chat_bounds = _ints('I', data, offset, user_count + 1)
+        offset += 4 * (user_count + 1)
+        self.user_chats = _ints('q', data, offset, chat_total)
+        offset += 8 * chat_total
+        self.name_bounds = _ints('I', data, offset, user_count + 1)
+        offset += 4 * (user_count + 1)
+        self.names = offset
+        offset += self.name_bounds[-1]
+
+        chat_ids = _ints('q', data, offset, chat_count)
+        offset += 8 * chat_count
+        chat_offsets = _ints('Q', data, offset, chat_count)
+        offset += 8 * chat_count
+        chat_games = _ints('I', data, offset, chat_count)
+        offset += 4 * chat_count
+
+        self.reminders = dict()
+        for _ in range(reminder_count):
+            chat_id, size = _REMINDER.unpack_from(data, offset)
+            offset += _REMINDER.size
+            self.reminders[chat_id] = set(
+                _int64s(data[offset:offset + 8 * size]))
+            offset += 8 * size
+
+        # Chat id to the start and end of its games and their number, user
+        # id to its index
+        ends = chat_offsets[1:] + array('Q', [len(data) - offset])
+        self.chats = {
+            chat_id: (offset + start, offset + end, count)
+            for chat_id, start, end, count in zip(chat_ids, chat_offsets,
+                                                  ends, chat_games)}
+        self.users = dict(zip(self.user_ids, range(user_count)))
+        self._records = [None] * user_count
+        # The stream seed of each restored game by its journal key, see
+        # replay.recover
+        self.seeds = dict()
+
+    def __len__(self):
+        return len(self.chats)
+
+    def chats_of(self, user_id):
+        """The ids of the chats a user plays in"""
+        index = self.users[user_id]
+        return self.user_chats[self.chat_bounds[index]:
+                               self.chat_bounds[index + 1]]
+
+    def user(self, index):
+        record = self._records[index]
+        if record is None:
+            data = self.data
+            start = self.names + self.name_bounds[index]
+            end = self.names + self.name_bounds[index + 1]
+            first_name_size, = _NAME.unpack_from(data, start)
+            start += _NAME.size
+            first_name = str(data[start:start + first_name_size], 'utf-8')
+            username = str(data[start + first_name_size:end], 'utf-8')
+            record = self._records[index] = UserRecord(
+                self.user_ids[index], first_name, username or None)
+        return record
+
+    def seed(self, key):
+        """
+        The stream seed of the game with this journal key, or None if it
+        is not in the snapshot, without restoring it
+        """
+        seed = self.seeds.get(key)
+        if seed is not None or key[0] not in self.chats:
+            return seed
+
+        offset, _, count = self.chats[key[0]]
+        data = self.data
+        for _ in range(count):
+            header = _GAME.unpack_from(data, offset)
+            if header[1] == key[1]:
+                return header[2]
+            # Skips chat type, title, mode, pile, graveyard and owners
+            offset += _GAME.size + sum(header[-3:]) + header[11] + \
+                header[12] + 8 * header[13]
+            for _ in range(header[10]):
+                hand_size = _PLAYER.unpack_from(data, offset)[-1]
+                offset += _PLAYER.size + hand_size
+        return None
+
+    def restore(self, gm, chat_id):
+        """
+        Restores the games of a chat into the indexes of the manager and
+        returns them
+        """
+        offset, _, count = self.chats[chat_id]
+        data = self.data
+        cards = c.CARDS
+        chat = None
+        games = list()
+
+        for _ in range(count):
+            (chat_id, game_seed, seed, flags, draw_counter, players_won,
+             joined, current, last_code, last_color, seat_count, pile_size,
+             graveyard_size, owner_count, starter, chat_type_size,
+             title_size, mode_size) = _GAME.unpack_from(data, offset)
+            offset += _GAME.size
+
+            chat_type = str(data[offset:offset + chat_type_size], 'utf-8')
+            offset += chat_type_size
+            title = str(data[offset:offset + title_size], 'utf-8') or None
+            offset += title_size
+            mode = str(data[offset:offset + mode_size], 'utf-8')
+            offset += mode_size
+
+            if chat is None:
+                chat = ChatRecord(chat_id, chat_type, title)
+
+            game = Game(chat, seed)
+            # Keeps identifying the game in the journal, see journal.py
+            game.seed = game_seed
+            self.seeds[(chat_id, game_seed)] = seed
+            game.mode = mode
+            game.started = bool(flags & _STARTED)
+            game.open = bool(flags & _OPEN)
+            game.translate = bool(flags & _TRANSLATE)
+            game.choosing_color = bool(flags & _CHOOSING_COLOR)
+            game.draw_counter = draw_counter
+            game.players_won = players_won
+            if flags & _STARTER:
+                game.starter = self.user(self.users[starter])
+
+            if last_code != _NO_CARD:
+                last = cards[last_code]
+                if last_color != _NO_CARD:
+                    last = last.with_color(c.COLORS[last_color])
+                game.last_card = last
+
+            game.deck.codes = array('B', data[offset:offset + pile_size])
+            offset += pile_size
+            game.deck.graveyard = array('B',
+                                        data[offset:offset + graveyard_size])
+            offset += graveyard_size
+            game.owner = _int64s(
+                data[offset:offset + 8 * owner_count]).tolist()
+            offset += 8 * owner_count
+
+            players = list()
+            for _ in range(seat_count):
+                (user_id, number, anti_cheat, waiting_time, player_flags,
+                 hand_size) = _PLAYER.unpack_from(data, offset)
+                offset += _PLAYER.size
+
+                user = self.user(self.users[user_id])
+                player = Player.restore(game, user, number,
+                                        data[offset:offset + hand_size])
+                player.anti_cheat = anti_cheat
+                player.waiting_time = waiting_time
+                player.bluffing = bool(player_flags & _BLUFFING)
+                player.drew = bool(player_flags & _DREW)
+                offset += hand_size
+                players.append(player)
+
+                gm.userid_players.setdefault(user.id, list()).append(player)
+                if player_flags & _CURRENT or \
+                        user.id not in gm.userid_current:
+                    gm.userid_current[user.id] = player
+                gm.userchat_player[(user.id, chat_id)] = player
+
+            game.restore_seats(players, current,
+                               -1 if flags & _REVERSED else 1)
+            game.joined = joined
+
+            gm.chatid_games.setdefault(chat_id, list()).append(game)
+            gm.chatid_current[chat_id] = game
+            games.append(game)
+
+        return games
+
+
+def defer(gm, data):
+    """
+    Hands the games of a snapshot to an empty manager, which restores them
+    on first use. Loads the reminders and returns the number of chats.
+    """
+    deferred = Deferred(memoryview(data))
+    gm.remind_dict.update(deferred.reminders)
+    if deferred.chats:
+        gm.defer(deferred)
+    return len(deferred)
+
+
+def loads(gm, data):
+    """
+    Restores the games of a snapshot into an empty manager and returns them
+    """
+    # Restoring only allocates, so the cyclic collector would just rescan
+    # the growing heap over and over
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        defer(gm, data)
+        gm.thaw_all()
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return [game for games in gm.chatid_games.values() for game in games]
+
+
+def save(gm, path, journal=None, submit=None):
+    """
+    Writes a snapshot atomically, so a crash never leaves half a file. The
+    games are serialized by submit, see dumps.
+
+    With an open journal, it rotates before the games are serialized, so
+    the older segments hold nothing the snapshot misses, and drops them
+    once the snapshot is on disk. A crash in between recovers from the
+    previous snapshot and all segments.
+    """
+    segment = journal.rotate() if journal and journal.enabled else None
+    data = dumps(gm, submit)
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+    if segment is not None:
+        journal.drop(segment)
+    logger.info("Saved %d bytes snapshot to %s", len(data), path)
+
+
+def load(gm, path):
+    """
+    Defers the games of a snapshot file to the manager if there is one,
+    returns the number of chats
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return 0
+
+    chats = defer(gm, data)
+    logger.info("Deferred the games of %d chats from %s", chats, path)
+    return chats
+
+
+def restore(gm, path, journal_path=None):
+    """
+    Restores the last run into an empty manager: the snapshot, then the
+    journal written since. Returns the number of journal entries applied.
+    """
+    load(gm, path)
+    if not journal_path:
+        return 0
+    return replay.recover(gm, read_journal(journal_path))
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+import card as c
+
+
+class Test(unittest.TestCase):
+
+    def test_interned(self):
+        self.assertIs(c.Card(c.RED, '5'), c.Card(c.RED, '5'))
+        self.assertIs(c.from_str('r_5'), c.Card(c.RED, '5'))
+        self.assertIs(c.from_str('draw_four'),
+                      c.Card(None, None, c.DRAW_FOUR))
+
+    def test_codes(self):
+        self.assertEqual(len(c.CARDS), 54)
+
+        for code, card in enumerate(c.CARDS):
+            self.assertEqual(card.code, code)
+            self.assertIs(c.from_str(str(card)), card)
+
+        # Sorting by code keeps the old string order
+        self.assertListEqual([str(card) for card in sorted(c.CARDS)],
+                             sorted(str(card) for card in c.CARDS))
+
+    def test_immutable(self):
+        card = c.Card(c.RED, '5')
+        self.assertRaises(AttributeError, setattr, card, 'color', c.BLUE)
+
+    def test_with_color(self):
+        plain = c.Card(None, None, c.DRAW_FOUR)
+        colored = plain.with_color(c.GREEN)
+
+        self.assertIsNone(plain.color)
+        self.assertEqual(colored.color, c.GREEN)
+        self.assertEqual(colored, plain)
+        self.assertIs(colored.base, plain)
+        self.assertEqual(str(colored), c.DRAW_FOUR)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, c.from_str, 'r_draw_four')
+        self.assertRaises(ValueError, c.Card, c.BLACK, '5')
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+from deck import Deck, TEMPLATES
+from errors import DeckEmptyError
+from game import Game
+from player import Player
+import card as c
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.deck = Deck()
+        self.deck.fill('classic')
+
+    def test_draw_many(self):
+        expected = list(reversed(self.deck.cards[-5:]))
+
+        self.assertListEqual(self.deck.draw_many(5), expected)
+        self.assertEqual(len(self.deck), 108 - 5)
+
+    def test_recycle(self):
+        drawn = self.deck.draw_many(100)
+        for card in drawn[:50]:
+            self.deck.dismiss(card)
+
+        cards = self.deck.draw_many(20)
+        self.assertEqual(len(cards), 20)
+        self.assertEqual(len(self.deck.codes), 38)
+        self.assertEqual(len(self.deck.graveyard), 0)
+
+    def test_empty(self):
+        self.deck.draw_many(100)
+
+        self.assertRaises(DeckEmptyError, self.deck.draw_many, 9)
+        self.assertEqual(len(self.deck), 8)
+
+        self.deck.draw_many(8)
+        self.assertRaises(DeckEmptyError, self.deck.draw)
+
+    def test_templates(self):
+        self.assertEqual(len(TEMPLATES['classic']), 108)
+        self.assertEqual(len(TEMPLATES['wild']), 140)
+
+        self.deck.fill('fast')
+        self.assertListEqual(sorted(self.deck.codes),
+                             sorted(TEMPLATES['classic']))
+
+        self.deck.fill('wild')
+        self.assertEqual(self.deck.cards.count(c.Card(c.RED, c.SKIP)), 4)
+        self.assertEqual(self.deck.cards.count(c.Card(None, None, c.CHOOSE)),
+                         6)
+
+    def test_deal(self):
+        game = Game(None)
+        players = [Player(game, "Player %d" % i) for i in range(4)]
+        game.start()
+        game.deal()
+
+        for player in players:
+            self.assertEqual(len(player.cards), 7)
+
+        # No card gets lost or duplicated
+        cards = [card for player in players for card in player.cards]
+        cards += game.deck.cards + [game.last_card]
+        cards += [c.CARDS[code] for code in game.deck.graveyard]
+        self.assertEqual(len(cards), 108)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+import unittest
+
+from errors import DeckEmptyError, IllegalActionError
+from game import Game
+from player import Player
+import card as c
+import engine
+import replay
+
+
+def apply_to_game(game, action):
+    """Carries out an engine action on a Game, like the bot handlers do"""
+    player = game.current_player
+    name = action[0]
+
+    def draw(player):
+        try:
+            player.draw()
+        except DeckEmptyError:
+            pass
+
+    if name == 'color':
+        game.choose_color(action[1])
+    elif name == 'play':
+        player.play(c.CARDS[action[1]])
+        if not player.cards:
+            if len(game.players) < 3:
+                return False
+            player.leave()
+    elif name == 'draw':
+        draw_counter_before = game.draw_counter
+        draw(player)
+        if (game.last_card.value == c.DRAW_TWO or
+                game.last_card.special == c.DRAW_FOUR) and \
+                draw_counter_before:
+            game.turn()
+    elif name == 'pass':
+        game.turn()
+    elif name == 'bluff':
+        if player.prev.bluffing:
+            draw(player.prev)
+        else:
+            game.draw_counter += 2
+            draw(player)
+        game.turn()
+    elif name == 'skip':
+        draw(player)
+        game.turn()
+    elif name == 'leave':
+        if len(game.players) < 3:
+            return False
+        leaving = [p for p in game.players if p.number == action[1]][0]
+        if leaving is game.current_player:
+            game.turn()
+        leaving.leave()
+    return True
+
+
+def game_state(game):
+    return (game.deck.codes.tobytes(), game.deck.graveyard.tobytes(),
+            game.last_card, game.last_card.color, game.draw_counter,
+            game.current_player.number, -1 if game.reversed else 1,
+            sorted((player.number, bytes(card.code for card in player.cards))
+                   for player in game.players))
+
+
+def engine_state(state):
+    return (state.pile, state.graveyard, state.last, state.last.color,
+            state.draw_counter, state.seats[state.current], state.direction,
+            sorted(zip(state.seats, state.hands)))
+
+
+def choose(state, rnd):
+    actions = engine.legal_actions(state)
+    plays = [action for action in actions if action[0] == 'play']
+
+    roll = rnd.random()
+    if roll < 0.02 and len(state.seats) > 2:
+        return ('leave', rnd.choice(state.seats))
+    if roll < 0.05:
+        return ('skip',)
+    if plays and roll < 0.8:
+        return rnd.choice(plays)
+    return rnd.choice([action for action in actions
+                       if action[0] != 'play'] or actions)
+
+
+class Test(unittest.TestCase):
+
+    def start(self, seed, players, mode):
+        game = Game(None, seed)
+        game.set_mode(mode)
+        for i in range(players):
+            Player(game, replay.ReplayUser(i, 'Player %d' % i, None))
+        game.start()
+        game.deal()
+
+        state, _ = engine.new_state(seed, players, mode)
+        return game, state
+
+    def test_equivalence(self):
+        for seed in range(60):
+            rnd = random.Random(seed)
+            mode = ('classic', 'wild')[seed % 2]
+            game, state = self.start(seed, 2 + seed % 5, mode)
+            self.assertEqual(engine_state(state), game_state(game))
+
+            for _ in range(300):
+                if not state.choosing:
+                    playable = game.current_player.playable_cards()
+                    self.assertListEqual(engine.playable(state),
+                                         [card.code for card in playable])
+
+                action = choose(state, rnd)
+                state, events = engine.step(state, action)
+                running = apply_to_game(game, action)
+
+                self.assertEqual(state.finished, not running)
+                if state.finished:
+                    self.assertIn(('game_over',), events)
+                    break
+
+                self.assertEqual(engine_state(state), game_state(game),
+                                 (seed, action))
+
+    def test_events(self):
+        state, _ = engine.new_state(0, 3)
+        r_5 = c.from_str('r_5').code
+        hands = list(state.hands)
+        hands[state.current] = bytes([r_5, r_5])
+        state = state._replace(hands=tuple(hands), last=c.from_str('r_1'),
+                               draw_counter=0)
+        player = state.seats[state.current]
+
+        state, events = engine.step(state, ('play', r_5))
+        self.assertIn(('played', player, r_5), events)
+        self.assertIn(('uno', player), events)
+        self.assertEqual(events[-1], ('turn', state.seats[state.current]))
+
+        # Winning with two players left ends the game
+        other = [seat for seat in state.seats if seat != player][0]
+        state, events = engine.step(state, ('leave', other))
+        state = state._replace(current=state.seats.index(player),
+                               last=c.from_str('r_1'), draw_counter=0)
+        state, events = engine.step(state, ('play', r_5))
+        self.assertIn(('won', player), events)
+        self.assertEqual(events[-1], ('game_over',))
+        self.assertTrue(state.finished)
+
+    def test_illegal(self):
+        state, _ = engine.new_state(0, 2)
+
+        self.assertRaises(IllegalActionError, engine.step, state, ('pass',))
+        self.assertRaises(IllegalActionError, engine.step, state,
+                          ('color', c.RED))
+
+        state, _ = engine.step(state, ('draw',))
+        self.assertRaises(IllegalActionError, engine.step, state, ('draw',))
+
+    def test_deck_empty(self):
+        # 16 hands of 7 need more cards than the deck holds
+        self.assertRaises(DeckEmptyError, engine.new_state, 0, 16)
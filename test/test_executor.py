@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import threading
+import time
+import unittest
+
+from executor import ChatExecutor
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = ChatExecutor(4, batch=3)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_order(self):
+        seen = {key: list() for key in range(5)}
+
+        for i in range(100):
+            for key in seen:
+                self.executor.submit(key, seen[key].append, i)
+
+        self.assertTrue(self.executor.join(5))
+        for key in seen:
+            self.assertListEqual(seen[key], list(range(100)))
+
+    def test_exclusive(self):
+        running = list()
+        overlaps = list()
+
+        def task():
+            if running:
+                overlaps.append(True)
+            running.append(True)
+            time.sleep(0.001)
+            running.pop()
+
+        for _ in range(20):
+            self.executor.submit('chat', task)
+
+        self.assertTrue(self.executor.join(5))
+        self.assertListEqual(overlaps, [])
+
+    def test_parallel(self):
+        barrier = threading.Barrier(2, timeout=5)
+        done = list()
+
+        def task():
+            barrier.wait()
+            done.append(True)
+
+        # Both tasks only finish if they run at the same time
+        self.executor.submit(1, task)
+        self.executor.submit(2, task)
+
+        self.assertTrue(self.executor.join(5))
+        self.assertEqual(len(done), 2)
+
+    def test_depth(self):
+        gate = threading.Event()
+
+        self.executor.submit(1, gate.wait)
+        self.executor.submit(1, lambda: None)
+        self.executor.submit(2, lambda: None)
+        self.executor.submit(2, gate.wait)
+
+        self.assertEqual(self.executor.depth(1), 2)
+        self.assertEqual(self.executor.depth(3), 0)
+        self.assertEqual(self.executor.depths().get(1), 2)
+
+        gate.set()
+        self.assertTrue(self.executor.join(5))
+        self.assertDictEqual(self.executor.depths(), {})
+
+    def test_error(self):
+        seen = list()
+
+        def fail():
+            raise ValueError()
+
+        self.executor.submit(1, fail)
+        self.executor.submit(1, seen.append, 1)
+
+        self.assertTrue(self.executor.join(5))
+        self.assertListEqual(seen, [1])
+
+    def test_call(self):
+        seen = list()
+
+        self.executor.submit(1, seen.append, 1)
+        future = self.executor.call(1, lambda: list(seen))
+        failed = self.executor.call(2, int, 'x')
+
+        self.assertListEqual(future.result(5), [1])
+        self.assertIsInstance(failed.exception(5), ValueError)
+
+    def test_quiesce(self):
+        gate = threading.Event()
+        seen = list()
+
+        self.executor.submit(1, gate.wait)
+        self.executor.submit(1, seen.append, 1)
+        threading.Timer(0.05, gate.set).start()
+
+        with self.executor.quiesce():
+            # The running task finished, nothing new started
+            self.assertTrue(gate.is_set())
+            self.executor.submit(2, seen.append, 2)
+            time.sleep(0.05)
+            self.assertListEqual(seen, [])
+            self.assertEqual(self.executor.depth(1), 1)
+
+        self.assertTrue(self.executor.join(5))
+        self.assertListEqual(sorted(seen), [1, 2])
@@ -18,6 +18,7 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 
+import random
 import unittest
 
 from telegram import User, Chat
@@ -38,9 +39,9 @@ class Test(unittest.TestCase):
         self.chat1 = Chat(1, 'group')
         self.chat2 = Chat(2, 'group')
 
-        self.user0 = User(0, 'user0')
-        self.user1 = User(1, 'user1')
-        self.user2 = User(2, 'user2')
+        self.user0 = User(0, 'user0', False)
+        self.user1 = User(1, 'user1', False)
+        self.user2 = User(2, 'user2', False)
 
     def test_new_game(self):
         g0 = self.gm.new_game(self.chat0)
@@ -109,3 +110,63 @@ class Test(unittest.TestCase):
         self.assertFalse(0 in self.gm.userid_players)
         self.assertFalse(1 in self.gm.userid_players)
         self.assertFalse(2 in self.gm.userid_players)
+        self.assertFalse(0 in self.gm.chatid_current)
+        self.assertDictEqual(self.gm.userchat_player, {})
+
+    def test_records(self):
+        g0 = self.gm.new_game(self.chat0)
+        g1 = self.gm.new_game(self.chat1)
+        g0.owner.append(self.user1.id)
+        self.assertNotIn(self.user1.id, g1.owner)
+
+        self.gm.join_game(self.user0, self.chat0)
+        self.gm.join_game(User(0, 'user0', False), self.chat1)
+        p0 = self.gm.player_for_user_in_chat(self.user0, self.chat0)
+        p1 = self.gm.player_for_user_in_chat(self.user0, self.chat1)
+
+        self.assertIs(p0.user, p1.user)
+        self.assertEqual(p0.user.first_name, 'user0')
+        self.assertEqual(g0.chat.id, self.chat0.id)
+
+    def test_player_for_user_in_chat(self):
+        self.gm.new_game(self.chat0)
+        self.gm.new_game(self.chat1)
+
+        self.gm.join_game(self.user0, self.chat0)
+        self.gm.join_game(self.user0, self.chat1)
+
+        p0 = self.gm.player_for_user_in_chat(self.user0, self.chat0)
+        p1 = self.gm.player_for_user_in_chat(self.user0, self.chat1)
+
+        self.assertIs(p0.game, self.gm.chatid_current[0])
+        self.assertIs(p1.game, self.gm.chatid_current[1])
+        self.assertIsNone(
+            self.gm.player_for_user_in_chat(self.user1, self.chat0))
+        self.assertIsNone(self.gm.player_for_user_in_chat(self.user0, None))
+
+    def test_consistency(self):
+        chats = (self.chat0, self.chat1, self.chat2)
+        users = [User(i, 'user%d' % i, False) for i in range(6)]
+        rng = random.Random(11)
+
+        for _ in range(500):
+            chat = rng.choice(chats)
+            user = rng.choice(users)
+            op = rng.random()
+
+            try:
+                if op < 0.1:
+                    self.gm.new_game(chat)
+                elif op < 0.6:
+                    self.gm.join_game(user, chat)
+                elif op < 0.9:
+                    self.gm.leave_game(user, chat)
+                else:
+                    self.gm.end_game(chat, user)
+            except (AlreadyJoinedError, LobbyClosedError,
+                    NoGameInChatError):
+                pass
+            except NotEnoughPlayersError:
+                self.gm.end_game(chat, user)
+
+            self.assertListEqual(self.gm.check_consistency(), [])
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+import card as c
+from hand import Hand
+
+
+class Test(unittest.TestCase):
+
+    def test_add_remove(self):
+        hand = Hand([c.Card(c.RED, '5'), c.Card(c.BLUE, '0')])
+        hand.append(c.Card(c.RED, '5'))
+
+        self.assertEqual(len(hand), 3)
+        self.assertEqual(hand.count(c.Card(c.RED, '5')), 2)
+        self.assertIn(c.Card(c.BLUE, '0'), hand)
+
+        hand.remove(c.Card(c.RED, '5'))
+        self.assertEqual(hand.count(c.Card(c.RED, '5')), 1)
+        self.assertListEqual(list(hand),
+                             [c.Card(c.BLUE, '0'), c.Card(c.RED, '5')])
+
+        self.assertRaises(ValueError, hand.remove, c.Card(c.GREEN, '1'))
+
+    def test_order(self):
+        cards = [c.Card(c.YELLOW, '1'), c.Card(None, None, c.CHOOSE),
+                 c.Card(c.BLUE, c.SKIP), c.Card(c.YELLOW, '1')]
+        hand = Hand(cards)
+
+        self.assertListEqual(list(hand), cards)
+        self.assertEqual(hand[-1], c.Card(c.YELLOW, '1'))
+        self.assertListEqual(hand[-1:], [c.Card(c.YELLOW, '1')])
+        self.assertListEqual(hand.sorted(), sorted(cards))
+
+    def test_colors(self):
+        hand = Hand([c.Card(c.RED, '5'), c.Card(None, None, c.DRAW_FOUR)])
+
+        self.assertTrue(hand.has_color(c.RED))
+        self.assertFalse(hand.has_color(c.GREEN))
+
+        hand.remove(c.Card(c.RED, '5'))
+        self.assertFalse(hand.has_color(c.RED))
+
+        # A wild card with a chosen color still counts as a plain wild card
+        hand.append(c.Card(c.GREEN, None, c.CHOOSE))
+        self.assertFalse(hand.has_color(c.GREEN))
+        self.assertIn(c.Card(None, None, c.CHOOSE), hand)
+
+        hand.clear()
+        self.assertEqual(len(hand), 0)
+        self.assertFalse(hand.has_color(c.RED))
+
+    def test_groups(self):
+        hand = Hand([c.Card(c.YELLOW, '1'), c.Card(c.BLUE, '0'),
+                     c.Card(c.YELLOW, '1')])
+
+        self.assertEqual(hand.groups(), ((c.Card(c.BLUE, '0'), 1),
+                                         (c.Card(c.YELLOW, '1'), 2)))
+        self.assertIs(hand.groups(), hand.groups())
+
+        hand.remove(c.Card(c.BLUE, '0'))
+        self.assertEqual(hand.groups(), ((c.Card(c.YELLOW, '1'), 2),))
+
+        hand.append(c.Card(None, None, c.CHOOSE))
+        self.assertEqual(hand.groups(), ((c.Card(None, None, c.CHOOSE), 1),
+                                         (c.Card(c.YELLOW, '1'), 2)))
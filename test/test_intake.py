@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import threading
+import time
+import unittest
+from datetime import datetime
+from queue import Empty
+from types import SimpleNamespace
+
+from telegram import Chat, ChosenInlineResult, InlineQuery, Message, \
+    Update, User
+from telegram.ext import Dispatcher, InlineQueryHandler
+
+from intake import Intake
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.intake = Intake(max_age=5, clock=self.clock)
+        self.user0 = User(0, 'user0', False)
+        self.user1 = User(1, 'user1', False)
+        self.chat = Chat(-1, 'group')
+        self.update_id = 0
+
+    def update(self, **kwargs):
+        self.update_id += 1
+        return Update(self.update_id, **kwargs)
+
+    def query(self, user, text):
+        return self.update(inline_query=InlineQuery(
+            str(self.update_id), user, text, ''))
+
+    def message(self, text):
+        return self.update(message=Message(
+            self.update_id, datetime.now(), self.chat, from_user=self.user0,
+            text=text))
+
+    def test_priority(self):
+        query = self.query(self.user0, '')
+        chat = self.message('hello')
+        command = self.message('/join')
+        chosen = self.update(chosen_inline_result=ChosenInlineResult(
+            'draw', self.user1, ''))
+
+        for update in (query, chat, command, chosen):
+            self.intake.put(update)
+
+        order = [self.intake.get(False) for _ in range(4)]
+        self.assertEqual(order, [command, chosen, chat, query])
+        self.assertRaises(Empty, self.intake.get, True, 0.01)
+
+    def test_newest_query(self):
+        old = self.query(self.user0, 'a')
+        other = self.query(self.user1, 'a')
+        new = self.query(self.user0, 'ab')
+
+        for update in (old, other, new):
+            self.intake.put(update)
+
+        self.assertEqual(len(self.intake), 2)
+        self.assertIs(self.intake.get(False), other)
+        self.assertIs(self.intake.get(False), new)
+        self.assertEqual(self.intake.counts['superseded'], 1)
+
+    def test_stale(self):
+        self.intake.put(self.query(self.user0, ''))
+        self.clock.now = 4
+        fresh = self.query(self.user1, '')
+        self.intake.put(fresh)
+        self.clock.now = 6
+
+        self.assertIs(self.intake.get(False), fresh)
+        self.assertRaises(Empty, self.intake.get, False)
+        self.assertEqual(self.intake.counts['stale'], 1)
+        self.assertEqual(self.intake.counts['inline'], 2)
+
+    def test_current(self):
+        old = self.query(self.user0, 'a')
+        self.intake.put(old)
+        self.assertIs(self.intake.get(False), old)
+        self.assertTrue(self.intake.current(old))
+
+        new = self.query(self.user0, 'ab')
+        self.intake.put(new)
+        self.assertIs(self.intake.get(False), new)
+        self.assertFalse(self.intake.current(old))
+        self.assertTrue(self.intake.current(new))
+
+        self.clock.now = 6
+        self.assertFalse(self.intake.current(new))
+        # Another user's query forgets the stale one
+        self.intake.put(self.query(self.user1, ''))
+        self.assertFalse(self.intake.current(new))
+        self.assertEqual(self.intake.counts['superseded'], 1)
+        self.assertEqual(self.intake.counts['stale'], 2)
+
+    def test_dispatcher(self):
+        """Queries that wait on the dispatcher's threads are checked too"""
+        # No requests are made, the worker threads only name themselves
+        # after the bot
+        dispatcher = Dispatcher(SimpleNamespace(id=0, defaults=None),
+                                self.intake, workers=1)
+        busy = threading.Event()
+        release = threading.Event()
+        answered = list()
+
+        def reply(update, context):
+            if update.inline_query.from_user is self.user1:
+                busy.set()
+                release.wait(5)
+            elif self.intake.current(update):
+                answered.append(update.inline_query.query)
+
+        dispatcher.add_handler(InlineQueryHandler(reply, run_async=True))
+        thread = threading.Thread(target=dispatcher.start)
+        thread.start()
+
+        def drained():
+            while len(self.intake):
+                time.sleep(0.01)
+
+        try:
+            # Holds the only worker thread, so the next queries wait behind it
+            self.intake.put(self.query(self.user1, ''))
+            self.assertTrue(busy.wait(5))
+            for text in ('a', 'ab', 'abc'):
+                self.intake.put(self.query(self.user0, text))
+                drained()
+            self.clock.now = 1
+            release.set()
+
+            deadline = time.monotonic() + 5
+            while self.intake.counts['superseded'] < 2 and \
+                    time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertListEqual(answered, ['abc'])
+            self.assertEqual(self.intake.counts['superseded'], 2)
+
+            # One that waited past max_age is dropped as well
+            release.clear()
+            busy.clear()
+            self.intake.put(self.query(self.user1, ''))
+            self.assertTrue(busy.wait(5))
+            self.intake.put(self.query(self.user0, 'abcd'))
+            drained()
+            self.clock.now = 10
+            release.set()
+
+            deadline = time.monotonic() + 5
+            while self.intake.counts['stale'] < 1 and \
+                    time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertListEqual(answered, ['abc'])
+            self.assertEqual(self.intake.counts['stale'], 1)
+        finally:
+            release.set()
+            dispatcher.stop()
+            thread.join()
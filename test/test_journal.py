@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import Future
+
+from telegram import Chat, User
+
+from errors import DeckEmptyError, NotEnoughPlayersError
+from game_manager import GameManager
+from journal import journal, read, segments_of, segment_path
+import card as c
+import replay
+import snapshot
+
+
+def play(game, rnd, turns):
+    """Plays simple random turns"""
+    for _ in range(turns):
+        player = game.current_player
+
+        if game.choosing_color:
+            game.choose_color(rnd.choice(c.COLORS))
+            continue
+
+        playable = player.playable_cards()
+        if playable:
+            player.play(rnd.choice(playable))
+            if not player.cards:
+                return
+        else:
+            try:
+                player.draw()
+            except DeckEmptyError:
+                pass
+            game.turn()
+
+
+def state(gm):
+    return sorted(
+        (chat_id, game.seed, game.started, game.draw_counter,
+         game.deck.codes.tobytes(), game.deck.graveyard.tobytes(),
+         game.last_card and game.last_card.code,
+         game.last_card and game.last_card.color,
+         game.reversed, game.choosing_color,
+         [(player.user.id, player.number, player.cards.codes())
+          for player in game.players])
+        for chat_id, games in gm.chatid_games.items() for game in games)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'uno.journal')
+        self.snapshot = os.path.join(self.dir, 'uno.snapshot')
+        self.rnd = random.Random(5)
+        self.users = [User(i, 'User %d' % i, False) for i in range(10)]
+        self.gm = GameManager()
+        journal.open(self.path)
+
+    def tearDown(self):
+        journal.close()
+        shutil.rmtree(self.dir)
+
+    def run_games(self, chat_ids):
+        for chat_id in chat_ids:
+            chat = Chat(chat_id, 'group', title='Chat %d' % chat_id)
+            game = self.gm.new_game(chat)
+            for user in self.rnd.sample(self.users, 3):
+                self.gm.join_game(user, chat)
+            game.start()
+            game.deal()
+            play(game, self.rnd, self.rnd.randrange(30))
+
+    def recover(self):
+        journal.close()
+        gm = GameManager()
+        snapshot.load(gm, self.snapshot)
+        replay.recover(gm, read(self.path))
+        return gm
+
+    def test_recover(self):
+        self.run_games((-1, -2, -3))
+        snapshot.save(self.gm, self.snapshot, journal)
+        self.assertEqual(segments_of(self.path), [1])
+
+        self.run_games((-4, -5))
+        for game in self.gm.chatid_current.values():
+            play(game, self.rnd, 10)
+
+        player = self.gm.chatid_current[-1].current_player
+        try:
+            self.gm.leave_game(player.user, player.game.chat)
+        except NotEnoughPlayersError:
+            pass
+        game = self.gm.chatid_current[-2]
+        self.gm.end_game(game.chat, game.current_player.user)
+
+        gm = self.recover()
+        self.assertEqual(state(gm), state(self.gm))
+        self.assertListEqual(gm.check_consistency(), [])
+
+    def test_hooks(self):
+        self.run_games((-1,))
+        snapshot.save(self.gm, self.snapshot, journal)
+        # Created and dealt after the snapshot, and played on in the journal
+        self.run_games((-2,))
+        play(self.gm.chatid_current[-1], self.rnd, 10)
+
+        journal.close()
+        gm = GameManager()
+        armed = dict()
+        gm.on_thaw = lambda game: armed.setdefault(
+            game.chat.id, (game.view.version, game.current_player))
+        snapshot.load(gm, self.snapshot)
+        replay.recover(gm, read(self.path))
+
+        self.assertSetEqual(set(armed), {-1, -2})
+        for chat_id in (-1, -2):
+            game = gm.chatid_current[chat_id]
+            expected = self.gm.chatid_current[chat_id]
+            self.assertTupleEqual(armed[chat_id],
+                                  (game.view.version, game.current_player))
+            self.assertTrue(game.view.started)
+            self.assertListEqual(
+                [player.user.id for player in game.view.players],
+                [player.user.id for player in expected.players])
+            self.assertEqual(game.view.current_player.user.id,
+                             expected.current_player.user.id)
+
+    def test_owner(self):
+        snapshot.save(self.gm, self.snapshot, journal)
+        chat = Chat(-1, 'group', title='Chat -1')
+        starter = User(7, 'User 7', False, username='user7')
+        game = self.gm.new_game(chat, starter=starter)
+        game.add_winner()
+
+        game = self.recover().chatid_current[-1]
+        self.assertEqual((game.starter.id, game.starter.first_name,
+                          game.starter.username), (7, 'User 7', 'user7'))
+        self.assertIn(7, game.owner)
+        self.assertEqual(game.players_won, 1)
+
+    def test_crash_before_snapshot(self):
+        self.run_games((-1, -2))
+        snapshot.save(self.gm, self.snapshot, journal)
+        play(self.gm.chatid_current[-1], self.rnd, 10)
+
+        # The next snapshot rotated the journal, but never made it to disk
+        journal.rotate()
+        snapshot.dumps(self.gm)
+        play(self.gm.chatid_current[-2], self.rnd, 10)
+
+        gm = self.recover()
+        self.assertEqual(state(gm), state(self.gm))
+
+    def test_interleaved(self):
+        self.run_games((-1, -2, -3))
+
+        # Handlers keep running between the rotation and each chat's dump
+        def submit(chat_id, func, *args):
+            if chat_id == -1:
+                play(self.gm.chatid_current[-1], self.rnd, 10)
+                self.run_games((-4,))
+            elif chat_id == -2:
+                game = self.gm.chatid_current[-2]
+                self.gm.end_game(game.chat, game.current_player.user)
+            elif chat_id == -3:
+                self.run_games((-3,))
+            future = Future()
+            future.set_result(func(*args))
+            return future
+
+        snapshot.save(self.gm, self.snapshot, journal, submit)
+        play(self.gm.chatid_current[-1], self.rnd, 10)
+        play(self.gm.chatid_current[-4], self.rnd, 10)
+
+        with self.assertNoLogs('replay'):
+            gm = self.recover()
+        self.assertEqual(state(gm), state(self.gm))
+        self.assertListEqual(gm.check_consistency(), [])
+
+    def test_torn(self):
+        self.run_games((-1,))
+        journal.close()
+
+        segment = segment_path(self.path, segments_of(self.path)[-1])
+        entries = list(read(self.path))
+        with open(segment, 'ab') as f:
+            f.write(b'\x10\x00\x00\x00\x01')
+
+        self.assertListEqual(list(read(self.path)), entries)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import json
+import unittest
+
+from telegram import Bot, InlineQueryResultArticle, InputTextMessageContent, \
+    InlineQueryResultCachedSticker as Sticker
+from telegram.utils.request import Request
+
+import card as c
+import payload
+
+
+class Recorder(Request):
+    """Records the requests of a bot instead of sending them"""
+
+    __slots__ = ('sent',)
+
+    def __init__(self):
+        Request.__init__(self)
+        self.sent = list()
+
+    def _request_wrapper(self, method, url, *args, **kwargs):
+        self.sent.append((url, json.loads(kwargs['body'])))
+        return b'{"ok":true,"result":true}'
+
+
+class Test(unittest.TestCase):
+
+    def results(self):
+        info = InputTextMessageContent('轮到： user0\n上一张牌： ❤️5')
+        results = [InlineQueryResultArticle(
+            'nogame', title='title',
+            input_message_content=InputTextMessageContent('text'))]
+        for i, card in enumerate(c.CARDS[:10]):
+            results.append(Sticker('%s:3' % card, card.sticker))
+            results.append(Sticker('~%d:3' % i, card.sticker_grey,
+                                   input_message_content=info))
+        return results
+
+    def test_fragments(self):
+        results = self.results()
+        encoded = [json.loads(fragment)
+                   for fragment in payload.fragments(results)]
+
+        self.assertEqual(encoded, [payload.plain(result.to_dict())
+                                   for result in results])
+        self.assertNotIn('parse_mode', encoded[2]['input_message_content'])
+
+    def test_body(self):
+        results = self.results()
+        data = json.loads(payload.body(42, payload.fragments(results),
+                                       cache_time=0, switch_pm_text=None,
+                                       switch_pm_parameter='select'))
+
+        self.assertEqual(data['inline_query_id'], '42')
+        self.assertEqual(len(data['results']), len(results))
+        self.assertEqual(data['cache_time'], 0)
+        self.assertEqual(data['switch_pm_parameter'], 'select')
+        self.assertNotIn('switch_pm_text', data)
+
+        self.assertEqual(json.loads(payload.body(1, ())),
+                         {'inline_query_id': '1', 'results': []})
+
+    def test_page(self):
+        fragments = tuple(b'%d' % i for i in range(120))
+
+        first, offset = payload.page(fragments, '')
+        self.assertEqual(first, fragments[:payload.PAGE_SIZE])
+        self.assertEqual(offset, str(payload.PAGE_SIZE))
+
+        pages = [first]
+        while offset:
+            fragments_page, offset = payload.page(fragments, offset)
+            pages.append(fragments_page)
+        self.assertEqual(sum(pages, ()), fragments)
+
+        self.assertEqual(payload.page(fragments[:3], ''), (fragments[:3], ''))
+
+    def test_answer(self):
+        request = Recorder()
+        bot = Bot('123456:token', request=request)
+        fragments = payload.fragments(self.results())
+        self.assertTrue(payload.can_post(bot))
+
+        self.assertTrue(payload.answer_inline_query(
+            bot, 42, fragments, cache_time=0, next_offset=''))
+
+        # Without the private parts the bot encodes the same answer
+        payload._PRIVATE = False
+        try:
+            self.assertFalse(payload.can_post(bot))
+            self.assertTrue(payload.answer_inline_query(
+                bot, 42, fragments, cache_time=0, next_offset=''))
+        finally:
+            payload._PRIVATE = True
+
+        (url, posted), (other_url, answered) = request.sent
+        # Request.post encodes the results once more and numbers as strings
+        answered['results'] = json.loads(answered['results'])
+        answered['cache_time'] = int(answered['cache_time'])
+        self.assertTrue(url.endswith('/answerInlineQuery'))
+        self.assertEqual(other_url, url)
+        self.assertEqual(posted, answered)
+        self.assertEqual(len(posted['results']), len(fragments))
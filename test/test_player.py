@@ -72,6 +72,27 @@ class Test(unittest.TestCase):
         self.assertEqual(p0, p2.next)
         self.assertEqual(p2, p0.next)
 
+    def test_players(self):
+        p0 = Player(self.game, "Player 0")
+        p1 = Player(self.game, "Player 1")
+        p2 = Player(self.game, "Player 2")
+
+        self.assertEqual(self.game.players, (p0, p1, p2))
+        self.assertIs(self.game.players, self.game.players)
+        self.assertEqual(self.game.player_count, 3)
+
+        self.game.turn()
+        self.assertEqual(self.game.players, (p1, p2, p0))
+
+        self.game.reverse()
+        self.assertEqual(self.game.players, (p1, p0, p2))
+
+        p2.leave()
+        self.assertEqual(self.game.players, (p1, p0))
+        self.assertFalse(self.game.has_player(p2))
+        self.assertTrue(self.game.has_player(p0))
+        self.assertIsNone(p2.next)
+
     def test_draw(self):
         p = Player(self.game, "Player 0")
         self.game.start()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from telegram import InlineQuery, Update, User
+from telegram.ext import Dispatcher, InlineQueryHandler
+
+from executor import ChatExecutor
+from intake import Intake
+from pool import WorkerPool
+
+
+class Test(unittest.TestCase):
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def test_grow_and_shrink(self):
+        pool = WorkerPool(1, 4, grow_backlog=1, idle_timeout=0.1)
+        release = threading.Event()
+        self.assertEqual(pool.workers, 1)
+
+        for _ in range(10):
+            pool.submit(release.wait)
+        self.assertEqual(pool.workers, 4)
+        self.assertEqual(pool.counts['grown'], 3)
+
+        release.set()
+        self.wait_for(lambda: pool.workers == 1)
+        self.assertEqual(pool.counts['shrunk'], 3)
+        pool.shutdown()
+        self.assertEqual(pool.workers, 0)
+
+    def test_queued(self):
+        queued = [0]
+        pool = WorkerPool(1, 2, grow_backlog=100, grow_queued=5,
+                          queued=lambda: queued[0])
+        release = threading.Event()
+
+        pool.submit(release.wait)
+        self.assertEqual(pool.workers, 1)
+        queued[0] = 10
+        pool.submit(release.wait)
+        self.assertEqual(pool.workers, 2)
+
+        release.set()
+        pool.shutdown()
+
+    def test_executor(self):
+        pool = WorkerPool(1, 8, grow_backlog=0)
+        executor = ChatExecutor(pool=pool)
+        seen = {key: list() for key in range(4)}
+
+        for i in range(50):
+            for key in seen:
+                executor.submit(key, seen[key].append, i)
+
+        self.assertTrue(executor.join(5))
+        for order in seen.values():
+            self.assertEqual(order, list(range(50)))
+        pool.shutdown()
+
+    def test_dispatcher(self):
+        """Inline queries handed to the pool make it grow"""
+        intake = Intake()
+        pool = WorkerPool(1, 4, grow_backlog=1, queued=intake.__len__)
+        release = threading.Event()
+        dispatcher = Dispatcher(SimpleNamespace(id=0, defaults=None), intake,
+                                workers=1)
+        dispatcher.add_handler(InlineQueryHandler(
+            lambda update, context: pool.submit(release.wait)))
+        thread = threading.Thread(target=dispatcher.start)
+        thread.start()
+
+        try:
+            for i in range(10):
+                intake.put(Update(i, inline_query=InlineQuery(
+                    str(i), User(i, 'user%d' % i, False), '', '')))
+            self.wait_for(lambda: pool.workers == 4)
+            self.assertEqual(pool.counts['grown'], 3)
+        finally:
+            release.set()
+            dispatcher.stop()
+            thread.join()
+            pool.shutdown()
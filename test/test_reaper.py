@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+import threading
+import time
+import unittest
+
+from telegram import Chat, User
+
+from game_manager import GameManager
+from reaper import Reaper, TimingWheel
+
+
+class Clock(object):
+
+    def __init__(self):
+        # Games note their activity in monotonic time
+        self.now = time.monotonic()
+
+    def __call__(self):
+        return self.now
+
+
+class Test(unittest.TestCase):
+
+    def test_wheel(self):
+        rnd = random.Random(1)
+        wheel = TimingWheel(0, slots=4, levels=3)
+        deadlines = {i: rnd.uniform(0, 300) for i in range(500)}
+
+        for item, deadline in deadlines.items():
+            wheel.schedule(item, deadline)
+        self.assertEqual(len(wheel), 500)
+
+        now = 0
+        while now < 310:
+            now += rnd.choice((0.5, 1, 3))
+            for item in wheel.advance(now):
+                deadline = deadlines.pop(item)
+                self.assertLessEqual(deadline, now)
+                self.assertGreater(deadline, now - 4)
+
+        self.assertDictEqual(deadlines, {})
+        self.assertEqual(len(wheel), 0)
+
+    def test_wheel_past(self):
+        wheel = TimingWheel(100)
+        wheel.schedule('late', 50)
+        self.assertListEqual(wheel.advance(100), [])
+        self.assertListEqual(wheel.advance(101), ['late'])
+
+    def test_reap(self):
+        clock = Clock()
+        gm = GameManager()
+        gm.reaper = reaper = Reaper(gm, 60, 600, clock)
+        chats = [Chat(-i, 'group') for i in range(1, 4)]
+        games = [gm.new_game(chat) for chat in chats]
+        for game in games:
+            game.last_active = clock.now
+
+        for i, chat in enumerate(chats[1:]):
+            gm.join_game(User(2 * i, 'a', False), chat)
+            gm.join_game(User(2 * i + 1, 'b', False), chat)
+            games[i + 1].last_active = clock.now
+        games[2].start()
+
+        clock.now += 30
+        games[1].last_active = clock.now
+        self.assertListEqual(reaper.due(), [])
+
+        # Lobby 0 expired, lobby 1 had activity, game 2 is started
+        clock.now += 31
+        due = reaper.due()
+        self.assertListEqual(due, [games[0]])
+        self.assertTrue(reaper.reap(games[0]))
+        self.assertNotIn(-1, gm.chatid_games)
+
+        # Activity between due() and reap() saves the game
+        clock.now += 60
+        due = reaper.due()
+        self.assertListEqual(due, [games[1]])
+        games[1].last_active = clock.now
+        self.assertFalse(reaper.reap(games[1]))
+
+        clock.now += 600
+        due = reaper.due()
+        self.assertCountEqual(due, games[1:])
+        for game in due:
+            self.assertTrue(reaper.reap(game))
+
+        self.assertDictEqual(gm.chatid_games, {})
+        self.assertDictEqual(gm.userid_players, {})
+        self.assertDictEqual(dict(reaper.reaped), {'lobby': 2, 'game': 1})
+        self.assertListEqual(gm.check_consistency(), [])
+
+    def test_concurrent(self):
+        clock = Clock()
+        gm = GameManager()
+        reaper = Reaper(gm, 1, 600, clock)
+        game = gm.new_game(Chat(-1, 'group'))
+        draining, appended = threading.Event(), threading.Event()
+
+        class Slot(list):
+            """Lets a watch run between draining a slot and clearing it"""
+
+            def append(self, entry):
+                # The watch read the tick before the wheel moved on
+                draining.wait(1)
+                list.append(self, entry)
+                appended.set()
+
+            def __iter__(self):
+                entries = list(list.__iter__(self))
+                draining.set()
+                appended.wait(0.5)
+                return iter(entries)
+
+        tick = reaper.wheel.tick
+        reaper.wheel.wheels[0][(tick + 1) % 64] = Slot()
+        clock.now = tick + 0.5
+        game.last_active = clock.now - 1
+
+        watcher = threading.Thread(target=reaper.watch, args=(game,))
+        watcher.start()
+        clock.now = tick + 1
+        due = reaper.due()
+        watcher.join()
+
+        clock.now += 1
+        due += reaper.due()
+        self.assertListEqual(due, [game])
+        self.assertEqual(len(reaper.wheel), 0)
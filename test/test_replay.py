@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+import unittest
+
+from errors import DeckEmptyError
+from game import Game
+from player import Player
+import card as c
+import replay
+
+
+def play_turn(game, rnd):
+    """Makes a random move for the current player, like the bot handlers"""
+    player = game.current_player
+
+    if game.choosing_color:
+        game.choose_color(rnd.choice(c.COLORS))
+        return
+
+    playable = player.playable_cards()
+
+    try:
+        if playable and rnd.random() < 0.8:
+            player.play(rnd.choice(playable))
+        elif game.last_card.special == c.DRAW_FOUR and game.draw_counter \
+                and rnd.random() < 0.5:
+            if player.prev.bluffing:
+                player.prev.draw()
+            else:
+                game.draw_counter += 2
+                player.draw()
+            game.turn()
+        elif not player.drew:
+            draw_counter_before = game.draw_counter
+            player.draw()
+            if (game.last_card.value == c.DRAW_TWO or
+                    game.last_card.special == c.DRAW_FOUR) and \
+                    draw_counter_before:
+                game.turn()
+        else:
+            game.turn()
+    except DeckEmptyError:
+        game.turn()
+
+
+def simulate(seed, players=4, turns=200, mode='classic'):
+    rnd = random.Random(seed)
+    game = Game(None, seed, log=True)
+    game.set_mode(mode)
+    for i in range(players):
+        Player(game, replay.ReplayUser(i, 'Player %d' % i, None))
+    game.start()
+    game.deal()
+
+    for _ in range(turns):
+        play_turn(game, rnd)
+        if any(not player.cards for player in game.players):
+            break
+
+    return game
+
+
+def state(game):
+    return (game.deck.codes.tobytes(), game.deck.graveyard.tobytes(),
+            game.last_card, game.last_card.color, game.draw_counter,
+            game.current_player.number, game.reversed,
+            [(player.number, list(player.cards)) for player in game.players])
+
+
+class Test(unittest.TestCase):
+
+    def test_seeded(self):
+        self.assertEqual(state(simulate(1)), state(simulate(1)))
+        self.assertNotEqual(state(simulate(1)), state(simulate(2)))
+
+    def test_replay(self):
+        for seed in range(20):
+            mode = 'wild' if seed % 2 else 'classic'
+            game = simulate(seed, players=2 + seed % 4, mode=mode)
+            replayed = replay.replay(game.seed, game.actions)
+
+            self.assertListEqual(replayed.actions, game.actions)
+            self.assertEqual(state(replayed), state(game))
+
+    def test_dump(self):
+        game = simulate(7)
+        replayed = replay.load(replay.dump(game))
+
+        self.assertEqual(state(replayed), state(game))
+
+    def test_no_log(self):
+        game = Game(None, 7, log=False)
+        Player(game, replay.ReplayUser(0, 'Player 0', None))
+        game.reseed()
+
+        self.assertIsNone(game.actions)
+        self.assertRaises(ValueError, replay.dump, game)
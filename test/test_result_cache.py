@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import unittest
+
+from result_cache import ResultCache
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResultCache(size=2)
+        self.builds = 0
+
+    def build(self, value):
+        self.builds += 1
+        return [value]
+
+    def test_stamp(self):
+        first = self.cache.lookup(0, ('view', 1), self.build, 'a')
+        self.assertIs(self.cache.lookup(0, ('view', 1), self.build, 'b'),
+                      first)
+        self.assertEqual(self.cache.lookup(0, ('view', 2), self.build, 'b'),
+                         ['b'])
+
+        self.assertEqual(self.builds, 2)
+        self.assertEqual(self.cache.counts['hit'], 1)
+        self.assertEqual(self.cache.counts['miss'], 2)
+        self.assertAlmostEqual(self.cache.hit_rate(), 1 / 3)
+
+    def test_size(self):
+        for key in range(3):
+            self.cache.lookup(key, 1, self.build, key)
+        self.cache.lookup(2, 1, self.build, 2)
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertEqual(self.builds, 3)
+        self.cache.lookup(0, 1, self.build, 0)
+        self.assertEqual(self.builds, 4)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import json
+import unittest
+
+from telegram import User
+
+from game import Game
+from player import Player
+from internationalization import _
+import card as c
+import payload
+import results
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        _.push('en_US')
+        self.game = Game(None, seed=7)
+        self.p0 = Player(self.game, User(0, 'user0', False))
+        self.p1 = Player(self.game, User(1, 'user1', False))
+        self.game.start()
+        self.game.current_player = self.p0
+        self.game.last_card = c.Card(c.RED, '5')
+        self.p0.cards = [c.Card(c.RED, '3'), c.Card(c.BLUE, '4'),
+                         c.Card(c.BLUE, '4'), c.Card(c.GREEN, '7')]
+        self.p0.anti_cheat = 3
+
+    def tearDown(self):
+        _.pop()
+
+    def test_result_id(self):
+        player = self.game.publish().player(0)
+
+        self.assertEqual(results.result_id('draw', player), 'draw:3')
+        self.assertEqual(results.parse_result_id('draw:3'), ('draw', '3'))
+        self.assertEqual(results.parse_result_id('~4:3'), ('~4', '3'))
+        self.assertEqual(results.parse_result_id('gameinfo'),
+                         ('gameinfo', ''))
+        self.assertEqual(results.parse_result_id('mode_fast'),
+                         ('mode_fast', ''))
+
+    def test_greyed_out(self):
+        player = self.game.publish().player(0)
+        added = list()
+        for card in player.cards:
+            results.add_card(player, card, added,
+                             can_play=card in player.playable)
+
+        ids = [result.id for result in added]
+        self.assertEqual(ids, [str(c.Card(c.RED, '3')) + ':3',
+                               '~1:3', '~2:3', '~3:3'])
+        for result_id in ids[1:]:
+            name, anti_cheat = results.parse_result_id(result_id)
+            self.assertTrue(name.startswith('~'))
+            self.assertEqual(int(anti_cheat), 3)
+
+    def test_prebuilt(self):
+        first = list()
+        results.add_draw(self.game.publish().player(0), first)
+        self.p0.anti_cheat += 1
+        second = list()
+        results.add_draw(self.game.publish().player(0), second)
+
+        # Another query shares the message content, not the result
+        self.assertNotEqual(first[0].id, second[0].id)
+        self.assertIs(first[0].input_message_content,
+                      second[0].input_message_content)
+
+        self.game.draw_counter = 2
+        third = list()
+        results.add_draw(self.game.publish().player(0), third)
+        self.assertIsNot(third[0].input_message_content,
+                         first[0].input_message_content)
+
+        _.push('de_DE')
+        try:
+            other = results.prebuilt(results._pass_content, False)
+        finally:
+            _.pop()
+        self.assertIsNot(other, results.prebuilt(results._pass_content, False))
+        self.assertIs(results.prebuilt(results._pass_content, False),
+                      results.prebuilt(results._pass_content, False))
+
+    def test_game_info(self):
+        view = self.game.publish()
+        info = results.game_info(view)
+        self.assertIs(results.game_info(view), info)
+
+        _.push('de_DE')
+        try:
+            other = results.game_info(view)
+        finally:
+            _.pop()
+        self.assertIsNot(other, info)
+        self.assertIs(results.game_info(view), info)
+
+        # A new view renders anew
+        self.assertIsNot(results.game_info(self.game.publish()), info)
+
+    def test_first_page(self):
+        playable = [c.Card(c.RED, '3'), c.Card(c.RED, '8'),
+                    c.Card(c.BLUE, '5')]
+        self.p0.cards = [card for card in playable for i in range(10)] + \
+            [c.Card(c.GREEN, '7')] * 15 + [c.Card(c.YELLOW, '9')] * 15
+        view = self.game.publish()
+        player = view.player(0)
+
+        built = results.build_results(self.p0.user, view, player)
+        self.assertGreater(len(built), payload.PAGE_SIZE)
+        fragments = payload.fragments(built)
+
+        first, next_offset = payload.page(fragments, '')
+        rest, last_offset = payload.page(fragments, next_offset)
+        self.assertEqual(len(first), payload.PAGE_SIZE)
+        self.assertEqual(last_offset, '')
+
+        first = [json.loads(fragment)['id'] for fragment in first]
+        rest = [json.loads(fragment)['id'] for fragment in rest]
+        for result_id in ['draw:3', 'gameinfo'] + \
+                [str(card) + ':3' for card in playable]:
+            self.assertIn(result_id, first)
+        self.assertEqual(len(set(first + rest)), len(built))
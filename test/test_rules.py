@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+import unittest
+
+from game import Game
+from player import Player
+import card as c
+import rules
+
+
+def legacy_card_playable(card, last, draw_counter):
+    """The rules as they were implemented in Player._card_playable"""
+    is_playable = True
+
+    if (card.color != last.color and card.value != last.value and
+            not card.special):
+        is_playable = False
+    elif last.value == c.DRAW_TWO and not \
+            card.value == c.DRAW_TWO and draw_counter:
+        is_playable = False
+    elif last.special == c.DRAW_FOUR and draw_counter:
+        is_playable = False
+    elif (last.special == c.CHOOSE or last.special == c.DRAW_FOUR) and \
+            (card.special == c.CHOOSE or card.special == c.DRAW_FOUR):
+        is_playable = False
+    elif not last.color:
+        is_playable = False
+
+    return is_playable
+
+
+def legacy_playable_cards(hand, last, draw_counter, drew):
+    """The rules as they were implemented in Player.playable_cards"""
+    playable = list()
+    cards = hand[-1:] if drew else hand
+
+    bluffing = False
+    for card in cards:
+        if legacy_card_playable(card, last, draw_counter):
+            playable.append(card)
+            bluffing = bluffing or card.color == last.color
+
+    if len(hand) == 1 and hand[0].special:
+        return list(), bluffing
+
+    return playable, bluffing
+
+
+def all_last_cards():
+    for card in c.CARDS:
+        yield card
+        if card.special:
+            for color in c.COLORS:
+                yield card.with_color(color)
+
+
+class Test(unittest.TestCase):
+
+    def test_table(self):
+        for last in all_last_cards():
+            for draw_counter in (0, 2, 4):
+                mask = rules.playable_mask(last, draw_counter)
+
+                for card in c.CARDS:
+                    self.assertEqual(
+                        bool(mask >> card.code & 1),
+                        legacy_card_playable(card, last, draw_counter),
+                        (card, last, draw_counter))
+
+    def test_playable_cards(self):
+        rnd = random.Random(0)
+        game = Game(None)
+        player = Player(game, "Player 0")
+
+        for last in all_last_cards():
+            for draw_counter in (0, 2, 4):
+                for drew in (False, True):
+                    for size in (1, 2, 7, 20):
+                        hand = rnd.choices(c.CARDS, k=size)
+
+                        game.last_card = last
+                        game.draw_counter = draw_counter
+                        player.drew = drew
+                        player.cards = hand
+
+                        playable, bluffing = legacy_playable_cards(
+                            hand, last, draw_counter, drew)
+
+                        self.assertListEqual(player.playable_cards(),
+                                             playable)
+                        self.assertEqual(player.bluffing, bluffing)
+
+    def test_effects(self):
+        for card in c.CARDS:
+            for players in (2, 3, 5):
+                game = Game(None)
+                for i in range(players):
+                    Player(game, "Player %d" % i)
+                first = game.current_player
+
+                # The effects as they were implemented in Game.play_card
+                if card.special:
+                    expected = first
+                elif card.value == c.SKIP or \
+                        card.value == c.REVERSE and players == 2:
+                    expected = first.next.next
+                elif card.value == c.REVERSE:
+                    expected = first.prev
+                else:
+                    expected = first.next
+                draw = {c.DRAW_FOUR: 4}.get(card.special) or \
+                    {c.DRAW_TWO: 2}.get(card.value, 0)
+
+                game.play_card(card)
+
+                self.assertIs(game.current_player, expected)
+                self.assertEqual(game.draw_counter, draw)
+                self.assertEqual(game.choosing_color, bool(card.special))
+                self.assertEqual(game.reversed, card.value == c.REVERSE
+                                 and players > 2)
+
+    def test_draw_amount(self):
+        self.assertEqual(rules.draw_amount(0, 10), (1, False))
+        self.assertEqual(rules.draw_amount(4, 10), (4, False))
+        self.assertEqual(rules.draw_amount(4, 3), (3, True))
+        self.assertEqual(rules.draw_amount(0, 0), (0, True))
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+import threading
+import unittest
+from concurrent.futures import Future
+
+from telegram import Chat, User
+
+from errors import DeckEmptyError
+from game_manager import GameManager
+import card as c
+import snapshot
+
+
+def play(game, rnd, turns):
+    """Plays simple random turns"""
+    for _ in range(turns):
+        player = game.current_player
+
+        if game.choosing_color:
+            game.choose_color(rnd.choice(c.COLORS))
+            continue
+
+        playable = player.playable_cards()
+        if playable:
+            player.play(rnd.choice(playable))
+            if not player.cards:
+                return
+        else:
+            try:
+                player.draw()
+            except DeckEmptyError:
+                pass
+            game.turn()
+
+
+def state(game):
+    return (game.chat.id, game.seed, game.chat.title, game.mode, game.started,
+            game.open, game.choosing_color, game.draw_counter, game.joined,
+            game.deck.codes.tobytes(), game.deck.graveyard.tobytes(),
+            game.last_card, game.last_card and game.last_card.color,
+            game.reversed, list(game.owner),
+            game.starter and (game.starter.id, game.starter.first_name,
+                              game.starter.username),
+            [(player.user.id, player.user.first_name, player.user.username,
+              player.number, player.cards.codes(), player.drew,
+              player.bluffing, player.anti_cheat, player.waiting_time)
+             for player in game.players])
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.gm = GameManager()
+        rnd = random.Random(3)
+        users = [User(i, 'User %d' % i, False,
+                      username='user%d' % i if i % 2 else None)
+                 for i in range(12)]
+
+        for chat_id in range(-1, -9, -1):
+            chat = Chat(chat_id, 'group', title='Chat %d' % chat_id)
+            starter = users[-chat_id] if chat_id % 2 else None
+            game = self.gm.new_game(chat, starter=starter)
+            game.owner.append(chat_id * 10)
+            game.set_mode(rnd.choice(('classic', 'wild', 'fast')))
+
+            for user in rnd.sample(users, 2 + -chat_id % 4):
+                self.gm.join_game(user, chat)
+
+            if chat_id % 3:
+                game.start()
+                game.deal()
+                play(game, rnd, rnd.randrange(40))
+            game.current_player.anti_cheat = -chat_id
+
+        self.gm.remind_dict[-1] = {1, 2}
+
+        # As the bot does after every update, restoring publishes as well
+        for chat_id in self.gm.chatid_games:
+            self.gm.publish(chat_id)
+
+    def test_restore(self):
+        data = snapshot.dumps(self.gm)
+        restored = GameManager()
+        games = snapshot.loads(restored, data)
+
+        self.assertListEqual(restored.check_consistency(), [])
+        self.assertDictEqual(restored.remind_dict, self.gm.remind_dict)
+        self.assertEqual(len(games), 8)
+
+        for chat_id, game in self.gm.chatid_current.items():
+            other = restored.chatid_current[chat_id]
+            self.assertEqual(state(other), state(game))
+
+            # Both continue with the same random stream
+            if game.started:
+                play(game, random.Random(chat_id), 20)
+                play(other, random.Random(chat_id), 20)
+                self.assertEqual(state(other), state(game))
+
+        for user_id, player in self.gm.userid_current.items():
+            self.assertEqual(restored.userid_current[user_id].game.chat.id,
+                             player.game.chat.id)
+
+    def test_defer(self):
+        data = snapshot.dumps(self.gm)
+        restored = GameManager()
+        thawed = list()
+        restored.on_thaw = thawed.append
+        self.assertEqual(snapshot.defer(restored, data), 8)
+        self.assertDictEqual(restored.remind_dict, self.gm.remind_dict)
+        self.assertEqual(len(restored.deferred_chats()), 8)
+        self.assertListEqual(thawed, [])
+
+        # A lookup by chat restores only the games of that chat
+        game = restored.chatid_current[-2]
+        self.assertEqual(state(game), state(self.gm.chatid_current[-2]))
+        self.assertListEqual(thawed, [game])
+        self.assertEqual(game.view.version, 1)
+        self.assertNotIn(-2, restored.deferred_chats())
+
+        # A lookup by user restores all chats the user plays in
+        user_id, player = next(iter(self.gm.userid_current.items()))
+        chats = {player.game.chat.id for player in
+                 self.gm.userid_players[user_id]}
+        restored.userid_players.get(user_id)
+        self.assertFalse(chats & set(restored.deferred_chats()))
+        self.assertEqual(restored.userid_current[user_id].game.chat.id,
+                         player.game.chat.id)
+
+        # Iterating an index restores everything
+        self.assertListEqual(restored.check_consistency(), [])
+        self.assertListEqual(restored.deferred_chats(), [])
+        self.assertEqual(len(thawed), 8)
+        self.assertIsNone(restored.deferred)
+        self.assertTrue(all(game.view is not None for game in thawed))
+
+    def test_dump_deferred(self):
+        restored = GameManager()
+        snapshot.defer(restored, snapshot.dumps(self.gm))
+        game = restored.chatid_current[-2]
+        play(game, random.Random(2), 10)
+        restored.publish(-2)
+
+        # Dumped on their chat's queue, the still deferred ones are copied
+        submitted = list()
+
+        def submit(chat_id, func, *args):
+            submitted.append(chat_id)
+            future = Future()
+            future.set_result(func(*args))
+            return future
+
+        data = snapshot.dumps(restored, submit)
+        self.assertListEqual(submitted, [-2])
+        self.assertEqual(len(restored.deferred_chats()), 7)
+
+        again = GameManager()
+        snapshot.loads(again, data)
+        self.assertListEqual(again.check_consistency(), [])
+        for chat_id, game in self.gm.chatid_current.items():
+            if chat_id == -2:
+                game = restored.chatid_current[-2]
+            self.assertEqual(state(again.chatid_current[chat_id]),
+                             state(game))
+
+    def test_defer_threads(self):
+        data = snapshot.dumps(self.gm)
+        restored = GameManager()
+        thawed = list()
+        restored.on_thaw = thawed.append
+        snapshot.defer(restored, data)
+
+        def look_up(user_id):
+            for chat_id in range(-1, -9, -1):
+                restored.userchat_player.get((user_id, chat_id))
+                restored.userid_current.get(user_id)
+
+        threads = [threading.Thread(target=look_up, args=(user_id,))
+                   for user_id in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIsNone(restored.deferred)
+        self.assertEqual(len(thawed), 8)
+        self.assertListEqual(restored.check_consistency(), [])
+
+    def test_version(self):
+        data = bytearray(snapshot.dumps(self.gm))
+        data[4] += 1
+        self.assertRaises(ValueError, snapshot.loads, GameManager(), data)
+        self.assertRaises(ValueError, snapshot.loads, GameManager(),
+                          b'XXXX' + bytes(data[4:]))
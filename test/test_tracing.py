@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+from collections import namedtuple
+
+from game import Game
+from player import Player
+from tracing import tracer, format_events
+
+Chat = namedtuple('Chat', 'id')
+
+
+class Test(unittest.TestCase):
+
+    def tearDown(self):
+        tracer.enabled = False
+        tracer.clear()
+
+    def play(self, chat_id):
+        game = Game(Chat(chat_id), seed=chat_id, log=True)
+        Player(game, "Player 0")
+        Player(game, "Player 1")
+        game.start()
+        game.deal()
+        game.current_player.playable_cards()
+        return game
+
+    def test_disabled(self):
+        self.play(1)
+        self.assertEqual(len(tracer.events), 0)
+
+    def test_dump(self):
+        tracer.enabled = True
+        game = self.play(1)
+        self.play(2)
+
+        events = tracer.dump(1)
+        self.assertListEqual([event.action for event in events],
+                             [action[0] for action in game.actions] +
+                             ['playable'])
+        self.assertTrue(all(event.chat_id == 1 for event in events))
+        self.assertIn('deal', format_events(events))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import unittest
+
+from telegram import User
+
+from game import Game
+from game_manager import GameManager
+from player import Player
+import card as c
+
+
+class Test(unittest.TestCase):
+
+    game = None
+
+    def setUp(self):
+        self.game = Game(None, seed=7)
+        self.p0 = Player(self.game, User(0, 'user0', False))
+        self.p1 = Player(self.game, User(1, 'user1', False))
+
+    def test_version(self):
+        first = self.game.publish()
+        second = self.game.publish()
+
+        self.assertEqual(first.version + 1, second.version)
+        self.assertIs(self.game.view, second)
+
+    def test_lobby(self):
+        view = self.game.publish()
+
+        self.assertFalse(view.started)
+        self.assertEqual(view.current_player.user.id, 0)
+        self.assertEqual(view.current_player.playable, ())
+        self.assertIsNone(view.player(2))
+
+    def test_snapshot(self):
+        self.game.start()
+        self.game.current_player = self.p0
+        self.game.last_card = c.Card(c.RED, '5')
+        self.p0.cards = [c.Card(c.RED, '3'), c.Card(c.BLUE, '4')]
+        self.p1.cards = [c.Card(c.GREEN, '3')]
+        view = self.game.publish()
+
+        self.p0.play(self.p0.cards[0])
+
+        # The published view is unaffected by later changes
+        player = view.player(0)
+        self.assertIs(view.current_player, player)
+        self.assertEqual(len(player.cards), 2)
+        self.assertEqual(player.playable, (c.Card(c.RED, '3'),))
+        self.assertEqual(view.last_card, c.Card(c.RED, '5'))
+        self.assertEqual(view.player(1).playable, ())
+
+        view = self.game.publish()
+        self.assertEqual(view.current_player.user.id, 1)
+        self.assertEqual(view.current_player.playable,
+                         (c.Card(c.GREEN, '3'),))
+        self.assertEqual(len(view.player(0).cards), 1)
+
+    def test_locales(self):
+        self.assertEqual(self.game.publish().locales, ())
+
+        gm = GameManager()
+        gm.locales_of = lambda game: [str(player.user.id)
+                                      for player in game.players]
+        self.game.current_player = self.p1
+        view = gm.publish_game(self.game)
+
+        # Looked up once by the writer, the readers take them from the view
+        self.assertEqual(view.locales, ('1', '0'))
+        self.assertIs(self.game.view, view)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Low-overhead tracing of game engine events"""
+
+from collections import deque, namedtuple
+from time import perf_counter_ns
+
+from config import TRACE, TRACE_BUFFER_SIZE
+
+TraceEvent = namedtuple('TraceEvent', 'time chat_id action args')
+
+
+class Tracer(object):
+    """
+    Collects structured game engine events in an in-memory ring buffer.
+    Call sites check `tracer.enabled` before building an event, so a
+    disabled tracer costs a single attribute lookup.
+    """
+
+    def __init__(self, size, enabled=False):
+        self.events = deque(maxlen=size)
+        self.enabled = enabled
+
+    def emit(self, game, action, *args):
+        """Records an event for a game"""
+        chat = game.chat
+        self.events.append(TraceEvent(perf_counter_ns(),
+                                      chat.id if chat is not None else None,
+                                      action, args))
+
+    def dump(self, chat_id):
+        """Returns the buffered events of a single chat, oldest first"""
+        return [event for event in list(self.events)
+                if event.chat_id == chat_id]
+
+    def clear(self):
+        self.events.clear()
+
+
+def format_events(events):
+    """Formats events as text lines with milliseconds since the first one"""
+    if not events:
+        return ''
+
+    start = events[0].time
+    return '\n'.join('+%.3fms %s %s' % ((event.time - start) / 1e6,
+                                        event.action,
+                                        ' '.join(map(str, event.args)))
+                     for event in events)
+
+
+tracer = Tracer(TRACE_BUFFER_SIZE, TRACE)
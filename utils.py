@@ -19,15 +19,20 @@
 
 
 import logging
+from functools import wraps
+
 from telegram import Update
 from telegram.ext import CallbackContext
 
 from internationalization import _, __
 from mwt import MWT
-from shared_vars import gm, dispatcher
+import payload
 
 logger = logging.getLogger(__name__)
 
+# The bot's shared state is imported where it is used, as building it needs a
+# configured token, so these helpers load without one, as in the tests
+
 TIMEOUT = 2.5
 
 
@@ -61,19 +66,19 @@ def display_color(color):
         return _("{emoji} 黄色").format(emoji='💛')
 
 
-def display_color_group(color, game):
+def display_color_group(color, translate):
     """ Convert a color code to actual color name """
     if color == "r":
-        return __("{emoji} 红色", game.translate).format(
+        return __("{emoji} 红色", translate).format(
             emoji='❤️')
     if color == "b":
-        return __("{emoji} 蓝色", game.translate).format(
+        return __("{emoji} 蓝色", translate).format(
             emoji='💙')
     if color == "g":
-        return __("{emoji} 绿色", game.translate).format(
+        return __("{emoji} 绿色", translate).format(
             emoji='💚')
     if color == "y":
-        return __("{emoji} 黄色", game.translate).format(
+        return __("{emoji} 黄色", translate).format(
             emoji='💛')
 
 
@@ -87,24 +92,101 @@ def send_async(bot, *args, **kwargs):
     if 'timeout' not in kwargs:
         kwargs['timeout'] = TIMEOUT
 
+    from shared_vars import dispatcher, pool
     try:
-        dispatcher.run_async(bot.sendMessage, *args, **kwargs)
+        pool.submit(_reported, bot.sendMessage, *args, **kwargs)
     except Exception as e:
-        error(None, None, e)
+        dispatcher.dispatch_error(None, e)
 
 
 def answer_async(bot, *args, **kwargs):
-    """Answer an inline query asynchronously"""
+    """Answer an inline query with encoded results asynchronously"""
     if 'timeout' not in kwargs:
         kwargs['timeout'] = TIMEOUT
 
+    from shared_vars import dispatcher, pool
+    try:
+        pool.submit(_reported, payload.answer_inline_query, bot, *args,
+                    **kwargs)
+    except Exception as e:
+        dispatcher.dispatch_error(None, e)
+
+
+def _reported(func, *args, **kwargs):
+    """Runs func, its errors go to the dispatcher's error handlers"""
+    from shared_vars import dispatcher
+    try:
+        func(*args, **kwargs)
+    except Exception as e:
+        dispatcher.dispatch_error(None, e)
+
+
+def chat_key(update):
+    """
+    The chat whose game an update acts on. Inline queries and results carry
+    no chat, so they are keyed by the user's selected game, or the user.
+    """
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+
+    from shared_vars import gm
+    user = update.effective_user
+    player = gm.userid_current.get(user.id) if user is not None else None
+
+    if player is not None:
+        return player.game.chat.id
+    return user.id if user is not None else None
+
+
+def serialized(func):
+    """
+    Runs a handler on the chat's queue of the executor, so updates of one
+    chat are handled in order and never concurrently.
+    """
+    from shared_vars import executor
+
+    @wraps(func)
+    def wrapped(update, context, *pargs, **kwargs):
+        key = chat_key(update)
+        executor.submit(key, _run_handler,
+                        key, func, update, context, *pargs, **kwargs)
+    return wrapped
+
+
+def pooled(func):
+    """
+    Runs a handler on the worker pool instead of the dispatcher's threads,
+    so the pool grows with the handlers waiting for a thread
+    """
+    from shared_vars import pool
+
+    @wraps(func)
+    def wrapped(update, context, *pargs, **kwargs):
+        pool.submit(_run_pooled, func, update, context, *pargs, **kwargs)
+    return wrapped
+
+
+def _run_pooled(func, update, context, *pargs, **kwargs):
+    from shared_vars import dispatcher
+    try:
+        func(update, context, *pargs, **kwargs)
+    except Exception as e:
+        dispatcher.dispatch_error(update, e)
+
+
+def _run_handler(key, func, update, context, *pargs, **kwargs):
+    from shared_vars import dispatcher, gm
     try:
-        dispatcher.run_async(bot.answerInlineQuery, *args, **kwargs)
+        func(update, context, *pargs, **kwargs)
     except Exception as e:
-        error(None, None, e)
+        dispatcher.dispatch_error(update, e)
+    finally:
+        # Inline queries read the published views, see views.py
+        gm.publish(key)
 
 
 def game_is_running(game):
+    from shared_vars import gm
     return game in gm.chatid_games.get(game.chat.id, list())
 
 
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Telegram bot to play UNO in group chats
+# Copyright (c) 2016 Jannes Höke <uno@jhoeke.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Immutable views of games for the inline query readers. The writer publishes a
+new view after every handler that may have changed the game, readers take the
+latest one with a single attribute read and never wait on the chat's queue.
+"""
+
+
+class PlayerView(object):
+    """The state of a player as seen in a published view"""
+
+    __slots__ = ('game', 'user', 'number', 'cards', 'groups', 'drew',
+                 'anti_cheat', 'playable')
+
+    def __init__(self, game, player, current):
+        self.game = game
+        self.user = player.user
+        self.number = player.number
+        self.cards = tuple(player.cards)
+        self.groups = player.cards.groups()
+        self.drew = player.drew
+        self.anti_cheat = player.anti_cheat
+        # Only the current player is offered cards to play
+        self.playable = tuple(player.playable_cards()) if current else ()
+
+
+class GameView(object):
+    """
+    The state of a game at one version. Views are never changed once they
+    are published, so a reader always sees a consistent game. Only `info`
+    fills up with the game info messages rendered from the view, by locales.
+    """
+
+    __slots__ = ('version', 'chat', 'started', 'mode', 'translate',
+                 'choosing_color', 'last_card', 'draw_counter', 'owner',
+                 'players', 'current_player', 'locales', 'info')
+
+    def __init__(self, game, version, locales=()):
+        self.version = version
+        self.chat = game.chat
+        self.started = game.started
+        self.mode = game.mode
+        self.translate = game.translate
+        self.choosing_color = game.choosing_color
+        self.last_card = game.last_card
+        self.draw_counter = game.draw_counter
+        self.owner = tuple(game.owner)
+
+        current = game.current_player
+        playing = game.started and not game.choosing_color
+        self.players = tuple(
+            PlayerView(self, player, playing and player is current)
+            for player in game.players)
+        self.current_player = self.players[0] if self.players else None
+        # The locales of the players, so readers never look them up
+        self.locales = tuple(locales)
+        self.info = dict()
+
+    def player(self, user_id):
+        """Returns the view of the player with this user id, or None"""
+        for player in self.players:
+            if player.user.id == user_id:
+                return player
+        return None